@@ -1,6 +1,10 @@
 from fastapi import APIRouter, Depends
 from app.api import deps
+from app.core.cache import cache
 from app.models.user import User
+from app.services.dorra_emr import dorra_emr
+from app.services.emr_outbox import emr_outbox
+from app.services.llm import llm_stats
 
 router = APIRouter()
 
@@ -22,3 +26,31 @@ async def get_high_risk_cases(
         {"drug": "Thalidomide", "count": 5, "risk": "Category X"},
         {"drug": "Warfarin", "count": 12, "risk": "Category X"},
     ]
+
+@router.get("/analytics/cache")
+async def get_cache_stats(
+    current_user: User = Depends(deps.get_current_active_superuser)
+):
+    """Per-tier cache hit/miss/eviction counters, sizes and fill latency."""
+    return cache.stats()
+
+@router.get("/analytics/dorra")
+async def get_dorra_stats(
+    current_user: User = Depends(deps.get_current_active_superuser)
+):
+    """Dorra circuit breaker state per endpoint and retry/hedge counts."""
+    return dorra_emr.resilience_stats()
+
+@router.get("/analytics/outbox")
+async def get_outbox_stats(
+    current_user: User = Depends(deps.get_current_active_superuser)
+):
+    """EMR outbox rows per status (pending, done, dead)."""
+    return await emr_outbox.stats()
+
+@router.get("/analytics/llm")
+async def get_llm_stats(
+    current_user: User = Depends(deps.get_current_active_superuser)
+):
+    """Gemini calls made, in flight, timed out and failed."""
+    return llm_stats()
@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
+from app.db.session import get_db
 from app.models.user import User
 from app.schemas.encounter import EncounterUpdateRequest, EncounterUpdateResponse
 from app.services.dorra_emr import dorra_emr
+from app.services.emr_outbox import emr_outbox
 
 router = APIRouter()
 
 @router.post("/update", response_model=EncounterUpdateResponse)
 async def update_encounter(
     request: EncounterUpdateRequest,
-    current_user: User = Depends(deps.get_current_active_user)
+    current_user: User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update encounter with detailed medical information for AI risk scoring"""
     
@@ -41,9 +45,16 @@ async def update_encounter(
     prompt = " ".join(prompt_parts)
     
     try:
-        result = await dorra_emr.create_ai_emr(request.patient_id, prompt)
+        submitted = await emr_outbox.submit(db, request.patient_id, prompt, "encounter_update")
+        result = submitted["result"]
         
-        if result:
+        if submitted["queued"]:
+            return EncounterUpdateResponse(
+                success=True,
+                outbox_id=submitted["outbox_id"],
+                message="Encounter update queued for the EMR"
+            )
+        elif result:
             return EncounterUpdateResponse(
                 success=True,
                 encounter_id=result.get("id"),
@@ -1,117 +1,192 @@
+import asyncio
+import json
+import logging
 from datetime import date
+from typing import Any, Dict, Optional
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
+from app.db.session import SessionLocal, get_db
 from app.models.user import User
 from app.schemas.medication import MedicationCheckRequest, MedicationCheckResponse
 from app.services.dorra_emr import dorra_emr
+from app.services.emr_outbox import emr_outbox
 from app.services.pharmavigilance import pharma_service
+from app.core import deadline
+from app.core.config import settings
+from app.core.deadline import with_deadline
 from app.core.logic import calculate_gestational_week
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-@router.post("/check", response_model=MedicationCheckResponse)
-async def check_medication(
-    request: MedicationCheckRequest,
-    current_user: User = Depends(deps.get_current_active_user)
-):
+def _patient_id(request: MedicationCheckRequest) -> Optional[int]:
+    if not request.patient_id:
+        return None
+    try:
+        return int(request.patient_id) if isinstance(request.patient_id, str) else request.patient_id
+    except ValueError:
+        return None
+
+async def _resolve_gestational_week(request: MedicationCheckRequest) -> int:
+    """
+    Gestational week for a check: the LMP override, then the manual week,
+    then the patient's record (cached). 0 if unknown.
+    """
     from app.core.cache import cache
     
-    # 1. Determine Gestational Week
-    gestational_week = 0
-    
     # Priority 1: Manual Override (LMP)
     if request.override_lmp:
         try:
             lmp_date = date.fromisoformat(request.override_lmp)
-            gestational_week = calculate_gestational_week(lmp_date)
+            return calculate_gestational_week(lmp_date)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid override_lmp format. Use YYYY-MM-DD")
             
     # Priority 2: Manual Gestational Week
-    elif request.manual_gestational_week is not None:
-        gestational_week = request.manual_gestational_week
+    if request.manual_gestational_week is not None:
+        return request.manual_gestational_week
         
     # Priority 3: Patient Data (with Caching)
-    elif request.patient_id:
-        try:
-            patient_id_int = int(request.patient_id) if isinstance(request.patient_id, str) else request.patient_id
+    patient_id_int = _patient_id(request)
+    if patient_id_int is None:
+        return 0
+    try:
+        async def load_pregnancy_status():
+            # Fetch from API
+            patient = await dorra_emr.get_patient(patient_id_int)
             
-            # Check Cache First
-            cached_preg = cache.get_pregnancy_status(patient_id_int)
-            if cached_preg:
-                gestational_week = cached_preg.get("gestational_week", 0)
-            else:
-                # Fetch from API
-                patient = await dorra_emr.get_patient(patient_id_int)
+            if patient:
+                # Try to extract LMP/Pregnancy data
+                # Note: Using DOB as placeholder in mock, real app would use specific field
+                lmp_str = patient.get("last_menstrual_period") 
                 
-                if patient:
-                    # Try to extract LMP/Pregnancy data
-                    # Note: Using DOB as placeholder in mock, real app would use specific field
-                    lmp_str = patient.get("last_menstrual_period") 
-                    
-                    if lmp_str:
-                        lmp_date = date.fromisoformat(lmp_str)
-                        gestational_week = calculate_gestational_week(lmp_date)
-                        
-                        # Cache the result
-                        cache.set_pregnancy_status(patient_id_int, {"gestational_week": gestational_week})
-        except (ValueError, TypeError):
-            pass
+                if lmp_str:
+                    lmp_date = date.fromisoformat(lmp_str)
+                    return {"gestational_week": calculate_gestational_week(lmp_date)}
+            return None
+        
+        # Check Cache First; concurrent misses for the same patient share one fetch
+        cached_preg, _ = await cache.fetch_pregnancy_status(patient_id_int, load_pregnancy_status)
+        if cached_preg:
+            return cached_preg.get("gestational_week", 0)
+    except (ValueError, TypeError, asyncio.TimeoutError):
+        pass
+    return 0
+
+async def _log_check(db: AsyncSession, request: MedicationCheckRequest, ai_analysis: Dict[str, Any]):
+    """Log the visit as an encounter in Dorra EMR (queued, sent by the outbox workers)"""
+    patient_id_int = _patient_id(request)
+    if patient_id_int is None:
+        return
+    try:
+        # Construct a prompt that clearly indicates an Encounter
+        prompt = (
+            f"Create an encounter for patient {patient_id_int}. "
+            f"Diagnosis: Medication Safety Check - {ai_analysis.get('name')}. "
+            f"Symptoms: {', '.join(request.symptoms) if request.symptoms else 'None'}. "
+            f"Note: Risk Category {ai_analysis.get('risk_category')}. "
+            f"Result: {ai_analysis.get('message')}. "
+            f"Alternatives: {', '.join(ai_analysis.get('alternatives', [])) or 'None'}."
+        )
+        
+        await emr_outbox.submit(db, patient_id_int, prompt, "medication_check")
+        
+    except Exception as e:
+        logger.error(f"Failed to log encounter to Dorra EMR: {e}")
+
+def _to_response(request: MedicationCheckRequest, gestational_week: int, ai_analysis: Dict[str, Any]) -> MedicationCheckResponse:
+    return MedicationCheckResponse(
+        drug_name=ai_analysis.get("name"),
+        additional_drugs=ai_analysis.get("additional_drugs", []),
+        risk_category=ai_analysis.get("risk_category"),
+        message=ai_analysis.get("message"),
+        alternative_drug=", ".join(ai_analysis.get("alternatives", [])), # Schema expects string, join list
+        is_safe=ai_analysis.get("is_safe", False),
+        gestational_week=gestational_week,
+        patient_id=request.patient_id,
+        personalized_notes=ai_analysis.get("personalized_notes"),
+        risk_score=ai_analysis.get("risk_score"),
+        analysis_type=ai_analysis.get("analysis_type", "single-drug"),
+        cache_status=ai_analysis.get("cache_status"),
+        language=ai_analysis.get("language", request.language or "en"),
+        timings=ai_analysis.get("timings")
+    )
+
+@router.post("/check", response_model=MedicationCheckResponse)
+@with_deadline(settings.MEDICATION_CHECK_DEADLINE)
+async def check_medication(
+    request: MedicationCheckRequest,
+    current_user: User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # 1. Determine Gestational Week
+    gestational_week = await _resolve_gestational_week(request)
     
-    # 2. Detect language if not specified
+    # 2. Language: "auto" is detected by the safety check itself
     language = request.language or "en"
-    if language == "auto":
-        from app.services.language import language_service
-        language = language_service.detect_language(request.drug_name)
     
     # 3. Fetch Drug Safety Analysis from Gemini (AI) with Enhanced Features
-    patient_id_int = None
-    if request.patient_id:
-        try:
-            patient_id_int = int(request.patient_id) if isinstance(request.patient_id, str) else request.patient_id
-        except ValueError:
-            pass
-    
     ai_analysis = await pharma_service.check_medication(
         drug_name=request.drug_name, 
         gestational_week=gestational_week,
         symptoms=request.symptoms,
-        patient_id=patient_id_int,
+        patient_id=_patient_id(request),
         language=language,
         additional_drugs=getattr(request, 'additional_drugs', None)
     )
     
     # 4. Log Visit as Encounter in Dorra EMR
-    if request.patient_id:
-        try:
-            patient_id_int = int(request.patient_id) if isinstance(request.patient_id, str) else request.patient_id
-            
-            # Construct a prompt that clearly indicates an Encounter
-            prompt = (
-                f"Create an encounter for patient {patient_id_int}. "
-                f"Diagnosis: Medication Safety Check - {ai_analysis.get('name')}. "
-                f"Symptoms: {', '.join(request.symptoms) if request.symptoms else 'None'}. "
-                f"Note: Risk Category {ai_analysis.get('risk_category')}. "
-                f"Result: {ai_analysis.get('message')}. "
-                f"Alternatives: {', '.join(ai_analysis.get('alternatives', [])) or 'None'}."
-            )
-            
-            # Fire and forget (awaiting to ensure log)
-            await dorra_emr.create_ai_emr(patient_id_int, prompt)
-            
-        except Exception as e:
-            print(f"Failed to log encounter to Dorra EMR: {e}")
+    await _log_check(db, request, ai_analysis)
 
-    return MedicationCheckResponse(
-        drug_name=ai_analysis.get("name"),
-        additional_drugs=ai_analysis.get("additional_drugs", []),
-        risk_category=ai_analysis.get("risk_category"),
-        message=ai_analysis.get("message"),
-        alternative_drug=", ".join(ai_analysis.get("alternatives", [])), # Schema expects string, join list
-        is_safe=ai_analysis.get("is_safe", False),
+    return _to_response(request, gestational_week, ai_analysis)
+
+@router.post("/check/stream")
+@with_deadline(settings.MEDICATION_CHECK_DEADLINE)
+async def check_medication_stream(
+    request: MedicationCheckRequest,
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    /check as NDJSON, one {"event", "result"} line each time the answer
+    improves: "preliminary" (rule-based) straight away, "refined" when the
+    interaction and AI analysis is done and, with a patient, "personalized".
+    The last line is the answer /check would give. A failure mid-stream
+    ends it with an {"error": ...} line.
+    """
+    gestational_week = await _resolve_gestational_week(request)
+    patient_id_int = _patient_id(request)
+    events = pharma_service.check_medication_stream(
+        drug_name=request.drug_name,
         gestational_week=gestational_week,
-        patient_id=request.patient_id,
-        personalized_notes=ai_analysis.get("personalized_notes"),
-        risk_score=ai_analysis.get("risk_score"),
-        analysis_type=ai_analysis.get("analysis_type", "single-drug")
+        symptoms=request.symptoms,
+        patient_id=patient_id_int,
+        language=request.language or "en",
+        additional_drugs=getattr(request, 'additional_drugs', None),
+        # The stream runs after this returns, on what is left of the budget
+        budget=max(deadline.remaining(), 0)
     )
+
+    async def lines():
+        final = None
+        try:
+            async for event, ai_analysis in events:
+                final = ai_analysis
+                yield json.dumps({"event": event, "result": _to_response(request, gestational_week, ai_analysis).model_dump()}) + "\n"
+        except Exception as e:
+            logger.error(f"Medication check stream aborted: {e}")
+            yield json.dumps({"error": "Medication check incomplete"}) + "\n"
+            return
+        if patient_id_int is not None and final is not None:
+            # The request's session is closed once the response starts, so
+            # use our own; the answers are already sent, so a failure here
+            # must not break the stream
+            try:
+                async with SessionLocal() as db:
+                    await _log_check(db, request, final)
+            except Exception as e:
+                logger.warning(f"Could not log streamed medication check for patient {patient_id_int}: {e}")
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
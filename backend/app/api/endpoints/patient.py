@@ -1,6 +1,9 @@
+import json
+import logging
 from datetime import timedelta
-from typing import Any
+from typing import Any, Callable, List
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -12,6 +15,9 @@ from app.db.session import get_db
 from app.models.user import User
 from app.schemas.user import Token
 from app.services.dorra_emr import dorra_emr
+from app.services.patient_replica import patient_replica
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -28,6 +34,9 @@ class PatientCreate(BaseModel):
     email: str = ""
     allergies: list = []
 
+class PatientBulkRequest(BaseModel):
+    patient_ids: List[int]
+
 class PatientCreateResponse(BaseModel):
     status: bool
     status_code: int
@@ -49,8 +58,8 @@ async def patient_login(
     except ValueError:
         raise HTTPException(status_code=400, detail="Patient ID must be a number")
     
-    # 1. Verify patient exists in Dorra EMR
-    patient_data = await dorra_emr.get_patient(patient_id_int)
+    # 1. Verify patient exists in Dorra EMR (or our replica of it)
+    patient_data = await patient_replica.lookup_patient(patient_id_int)
     if not patient_data:
         raise HTTPException(status_code=404, detail="Patient not found in EMR")
     
@@ -95,7 +104,7 @@ async def read_users_me(
     # The email field stores the patient ID
     try:
         patient_id = int(current_user.email)
-        patient_data = await dorra_emr.get_patient(patient_id)
+        patient_data = await patient_replica.lookup_patient(patient_id)
         if not patient_data:
             raise HTTPException(status_code=404, detail="Patient data not found in EMR")
         return patient_data
@@ -227,9 +236,9 @@ async def get_patient_appointments(
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """
-    Get all appointments for a patient.
+    Get a patient's appointments (from their most recent encounters).
     """
-    encounters = await dorra_emr.get_patient_encounters(patient_id)
+    encounters = await dorra_emr.get_recent_encounters(patient_id, limit=None)
     
     # Filter for appointment-type encounters
     appointments = []
@@ -246,69 +255,109 @@ async def get_patient_appointments(
     
     return {"appointments": appointments}
 
+def _roster_entry(p: dict) -> dict:
+    return {
+        "id": p.get("id"),
+        "first_name": p.get("first_name", ""),
+        "last_name": p.get("last_name", ""),
+        "full_name": f"{p.get('first_name', '')} {p.get('last_name', '')}".strip(),
+        "phone_number": p.get("phone_number", ""),
+        "email": p.get("email", ""),
+        "date_of_birth": p.get("date_of_birth"),
+        "gender": p.get("gender"),
+        "address": p.get("address", ""),
+        "created_at": p.get("created_at"),
+        "updated_at": p.get("updated_at")
+    }
+
+def _search_entry(p: dict) -> dict:
+    return {
+        "id": p.get("id"),
+        "name": f"{p.get('first_name', '')} {p.get('last_name', '')}".strip(),
+        "phone": p.get("phone_number", ""),
+        "gestational_week": 0, # Default as EMR might not return this directly in list
+        "risk_level": "safe" # Default
+    }
+
+async def _collect_patients(shape: Callable[[dict], dict], search: str = None) -> list:
+    """Read every page into a list; a Dorra failure part way through is a 502, never a short list."""
+    patients_list = []
+    try:
+        async for p in patient_replica.iter_roster(search=search):
+            patients_list.append(shape(p))
+    except Exception as e:
+        logger.error(f"Patient list failed after {len(patients_list)} patients: {e}")
+        raise HTTPException(status_code=502, detail="Patient list incomplete, EMR unavailable")
+    return patients_list
+
+def _stream_patients(shape: Callable[[dict], dict], search: str = None) -> StreamingResponse:
+    """
+    NDJSON response, one patient per line, written as Dorra pages arrive.
+    A failure mid-stream ends it with an {"error": ...} line.
+    """
+    async def lines():
+        try:
+            async for p in patient_replica.iter_roster(search=search):
+                yield json.dumps(shape(p)) + "\n"
+        except Exception as e:
+            logger.error(f"Patient stream aborted: {e}")
+            yield json.dumps({"error": "Patient list incomplete, EMR unavailable"}) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/all")
 async def list_all_patients(
+    stream: bool = False,
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """
     List all patients in the team.
+    With ?stream=true the roster is streamed as NDJSON, one patient per line.
     """
     print(f"Patient list endpoint called by user: {current_user.email}, role: {current_user.role}")
     
     if current_user.role not in ["provider", "admin"]:
         raise HTTPException(status_code=403, detail="Provider access required")
     
-    # Call Dorra EMR API to get all patients
-    result = await dorra_emr.get_patients()
-    print(f"EMR result: {result}")
+    # Every patient, from the local replica or every page of the Dorra EMR list
+    if stream:
+        return _stream_patients(_roster_entry)
+    return await _collect_patients(_roster_entry)
+
+@router.post("/bulk")
+async def get_patients_bulk(
+    request: PatientBulkRequest,
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    Fetch up to 200 patients in one call. Returns the patients found plus an
+    error per id that could not be fetched.
+    """
+    if current_user.role not in ["provider", "admin"]:
+        raise HTTPException(status_code=403, detail="Provider access required")
     
-    # Extract patients list from result
-    patients_list = []
-    if result and "results" in result:
-        for p in result["results"]:
-            patients_list.append({
-                "id": p.get("id"),
-                "first_name": p.get("first_name", ""),
-                "last_name": p.get("last_name", ""),
-                "full_name": f"{p.get('first_name', '')} {p.get('last_name', '')}".strip(),
-                "phone_number": p.get("phone_number", ""),
-                "email": p.get("email", ""),
-                "date_of_birth": p.get("date_of_birth"),
-                "gender": p.get("gender"),
-                "address": p.get("address", ""),
-                "created_at": p.get("created_at"),
-                "updated_at": p.get("updated_at")
-            })
-            
-    return patients_list
+    if len(request.patient_ids) > 200:
+        raise HTTPException(status_code=400, detail="At most 200 patient ids per request")
+    
+    return await dorra_emr.get_patients_bulk(request.patient_ids)
 
 @router.get("/search")
 async def search_patients(
     query: str,
+    stream: bool = False,
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """
     Search patients by name or phone number.
+    With ?stream=true matches are streamed as NDJSON, one patient per line.
     """
     if current_user.role not in ["provider", "admin"]:
         raise HTTPException(status_code=403, detail="Provider access required")
     
-    # Call Dorra EMR API to search patients
-    result = await dorra_emr.get_patients(search=query)
-    
-    # Extract patients list from result
-    patients_list = []
-    if result and "results" in result:
-        for p in result["results"]:
-            patients_list.append({
-                "id": p.get("id"),
-                "name": f"{p.get('first_name', '')} {p.get('last_name', '')}".strip(),
-                "phone": p.get("phone_number", ""),
-                "gestational_week": 0, # Default as EMR might not return this directly in list
-                "risk_level": "safe" # Default
-            })
-            
-    return {"patients": patients_list}
+    # Search the local replica, or the Dorra EMR API
+    if stream:
+        return _stream_patients(_search_entry, search=query)
+    return {"patients": await _collect_patients(_search_entry, search=query)}
 
 @router.post("/invite")
 async def invite_patient(
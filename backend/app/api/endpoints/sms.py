@@ -3,9 +3,9 @@ from pydantic import BaseModel
 from typing import Optional
 from app.services.dorra_emr import dorra_emr
 from app.services.pharmavigilance import pharma_service
-from app.services.language import language_service
 from app.core.logic import calculate_gestational_week
 from app.core.config import settings
+from app.core.deadline import with_deadline
 from datetime import date, datetime
 import logging
 import re
@@ -23,7 +23,10 @@ logger = logging.getLogger(__name__)
 
 # Initialize Twilio client
 twilio_client = None
-if settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN:
+if settings.SMS_BACKEND == "fake":
+    from app.standin.fakes import FakeTwilioClient
+    twilio_client = FakeTwilioClient()
+elif settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN:
     twilio_client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
 
 def send_sms(to: str, message: str) -> bool:
@@ -54,17 +57,12 @@ def parse_command(text: str) -> tuple:
     args = parts[1:]
     return (command, args)
 
-def format_risk_response(risk_data: dict, language: str = "en") -> str:
-    """Format risk assessment response with emojis"""
+def format_risk_response(risk_data: dict) -> str:
+    """Format risk assessment response with emojis (already in the patient's language)"""
     risk = risk_data.get("risk_category", "Unknown")
     message = risk_data.get("message", "")
     alternatives = risk_data.get("alternatives", [])
 
-    # Translate if needed
-    if language != "en":
-        message = language_service.translate_from_english(message, language)
-        alternatives = [language_service.translate_from_english(alt, language) for alt in alternatives]
-
     emoji_map = {
         "Safe": "✅ SAFE",
         "Caution": "⚠️ CAUTION",
@@ -105,9 +103,11 @@ async def test_sms_json(sms_data: SMSTestRequest):
     }
 
 @router.post("/webhook")
+@with_deadline(settings.SMS_WEBHOOK_DEADLINE)
 async def sms_webhook(request: Request):
     """
-    Comprehensive SMS webhook handling all MamaSafe commands
+    Comprehensive SMS webhook handling all MamaSafe commands.
+    Runs under SMS_WEBHOOK_DEADLINE so Twilio always gets an answer in time.
     """
     try:
         form_data = await request.form()
@@ -141,9 +141,6 @@ async def sms_webhook(request: Request):
 
     resp = MessagingResponse()
 
-    # Detect language
-    detected_lang = language_service.detect_language(text)
-
     # Parse command
     command, args = parse_command(text)
 
@@ -219,13 +216,13 @@ async def sms_webhook(request: Request):
                     lmp_date = date.fromisoformat(patient["lmp"])
                     gestational_week = calculate_gestational_week(lmp_date)
 
-                # Check medication safety
+                # Check medication safety; the language is detected from the drug and symptoms
                 result = await pharma_service.check_medication(
                     drugs[0], gestational_week, [symptoms] if symptoms else None,
-                    int(patient_id), detected_lang, additional_drugs
+                    int(patient_id), "auto", additional_drugs
                 )
 
-                response = format_risk_response(result, detected_lang)
+                response = format_risk_response(result)
                 resp.message(response)
 
         elif command == "DRUG":
@@ -239,9 +236,9 @@ async def sms_webhook(request: Request):
                 # Assume current pregnancy week (would need to store patient context)
                 gestational_week = 24  # Default, should be retrieved from patient data
 
-                result = await pharma_service.check_medication(drug, gestational_week, [symptoms] if symptoms else None, language=detected_lang)
+                result = await pharma_service.check_medication(drug, gestational_week, [symptoms] if symptoms else None, language="auto")
 
-                response = format_risk_response(result, detected_lang)
+                response = format_risk_response(result)
                 resp.message(response)
 
         elif command == "APPT":
@@ -276,10 +273,10 @@ async def sms_webhook(request: Request):
                 resp.message("Invalid format. Use: HISTORY [PatientID]")
             else:
                 patient_id = args[0]
-                encounters = await dorra_emr.get_patient_encounters(int(patient_id))
+                encounters = await dorra_emr.get_recent_encounters(int(patient_id), limit=5)
 
                 if encounters:
-                    history = "\n".join([f"{e.get('date')}: {e.get('notes', 'N/A')}" for e in encounters[:5]])
+                    history = "\n".join([f"{e.get('date')}: {e.get('notes', 'N/A')}" for e in encounters])
                     response = f"Recent history for patient {patient_id}:\n{history}"
                 else:
                     response = f"No history found for patient {patient_id}"
@@ -1,20 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
+from app.db.session import get_db
 from app.models.user import User
 from app.schemas.medication import VisitLogRequest
-from app.services.dorra_emr import dorra_emr
+from app.services.emr_outbox import emr_outbox
 
 router = APIRouter()
 
 @router.post("/log")
 async def log_visit(
     visit_data: VisitLogRequest,
-    current_user: User = Depends(deps.get_current_active_user)
+    current_user: User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Log a consultation summary back to the Dorra EMR.
+    The record is queued and sent to Dorra in the background.
     """
-    success = await dorra_emr.log_visit(visit_data.dict())
-    if not success:
+    try:
+        patient_id = int(visit_data.patient_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Patient ID must be a number")
+    
+    prompt = f"Visit for medication check: {visit_data.drug_checked}. Result: {visit_data.risk_result}."
+    if visit_data.notes:
+        prompt += f" Notes: {visit_data.notes}"
+    
+    submitted = await emr_outbox.submit(db, patient_id, prompt, "visit_log")
+    if not submitted["queued"] and submitted["result"] is None:
         raise HTTPException(status_code=500, detail="Failed to log visit to EMR")
     return {"status": "success", "message": "Visit logged successfully"}
@@ -1,5 +1,8 @@
 from fastapi import APIRouter, Request, HTTPException
 import logging
+from typing import Any, Dict, List, Optional
+from app.core.invalidation import invalidation_bus
+from app.services.normalization import drug_normalization
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -7,6 +10,27 @@ logger = logging.getLogger(__name__)
 # Store webhook events for processing
 webhook_events = []
 
+def _extract_invalidation(payload: Dict[str, Any]) -> tuple:
+    """Find the patient id and (normalized) drug names mentioned in a webhook payload"""
+    sources = [payload]
+    if isinstance(payload.get("details"), dict):
+        sources.append(payload["details"])
+    
+    patient_id: Optional[int] = None
+    drugs: List[str] = []
+    for source in sources:
+        for field in ("patient_id", "patient"):
+            value = source.get(field)
+            if patient_id is None and isinstance(value, (int, str)) and str(value).isdigit():
+                patient_id = int(value)
+        for field in ("drug_a", "drug_b", "drug"):
+            if isinstance(source.get(field), str):
+                drugs.append(source[field])
+        if isinstance(source.get("drugs"), list):
+            drugs.extend(d for d in source["drugs"] if isinstance(d, str))
+    
+    return patient_id, [drug_normalization.normalize(d) for d in drugs if d.strip()]
+
 @router.post("/pharmavigilance")
 async def receive_pharmavigilance_webhook(request: Request):
     """Receive PharmaVigilance webhook events"""
@@ -27,6 +51,10 @@ async def receive_pharmavigilance_webhook(request: Request):
         if event_type == "DrugInteraction":
             logger.warning(f"Drug interaction detected - Severity: {severity}, Resource ID: {resource_id}")
             logger.info(f"Details: {details}")
+            
+            # Drop cached answers this interaction may have made stale
+            patient_id, drugs = _extract_invalidation(payload)
+            await invalidation_bus.publish(patient_id=patient_id, drugs=drugs, reason="pharmavigilance_webhook")
         
         return {"status": "received", "message": "Webhook processed successfully"}
         
@@ -1,37 +1,528 @@
 """
-Simple in-memory cache with Time-To-Live (TTL) support.
+Bounded in-memory cache with Time-To-Live (TTL) support.
 Implements Tiered Caching:
 - Pregnancy Status: 24 hours
 - Drug Safety: 1 week (168 hours)
+
+Every tier is its own LRU store with a maximum number of entries and a
+maximum estimated size in bytes. Expiry times are kept in a min-heap so
+expired entries are swept in bulk instead of waiting for the same key to
+be read again.
+
+An optional shared backend (see app.core.cache_backends) sits behind the
+tiers so that workers share each other's results. fetch() reads and
+writes it on a thread so a slow backend doesn't stall the event loop.
+
+Misses are filled through a single-flight layer: concurrent misses for
+the same key wait on one loader call instead of each calling upstream.
+Tiers may opt into stale-while-revalidate: after expiry an entry is kept
+for a grace window and served while a background task refreshes it.
+
+Each tier keeps counters (hits, misses, evictions, ...) and a histogram of
+how long misses took to fill; see TieredCache.stats().
+
+Unexpired entries can be snapshotted to a file and reloaded after a
+restart with their remaining TTLs; values are only decoded when first read.
+Tiers holding patient records are left out of snapshots.
+
+The cache subscribes to app.core.invalidation, so webhook events and EMR
+writes drop the affected pregnancy and drug-safety entries.
 """
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
 import time
-from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core import deadline
+from app.core.config import settings
+from app.core.cache_backends import CacheBackend, create_backend
+from app.core.invalidation import BackendInvalidationLog, invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+def estimate_size(value: Any) -> int:
+    """Rough size of a cached value in bytes (its JSON encoding)."""
+    try:
+        return len(json.dumps(value, default=str, separators=(",", ":")))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class CachePolicy:
+    """
+    Limits, default TTL and fill timeout for a single cache tier.
+    stale_grace > 0 enables stale-while-revalidate for that many seconds
+    past expiry. snapshot=False keeps the tier out of snapshot files, for
+    tiers holding personal data.
+    """
+
+    def __init__(self, name: str, ttl: int, max_entries: int, max_bytes: int, fill_timeout: Optional[float] = None, stale_grace: int = 0, snapshot: bool = True):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.fill_timeout = fill_timeout
+        self.stale_grace = stale_grace
+        self.snapshot = snapshot
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed buckets (seconds)."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
 
-class TieredCache:
     def __init__(self):
-        self._cache: Dict[str, Tuple[Any, float]] = {}
-        
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        index = len(self.BUCKETS)
+        for i, bound in enumerate(self.BUCKETS):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {}
+        running = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            running += count
+            buckets[str(bound)] = running
+        buckets["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else None,
+            "buckets": buckets,
+        }
+
+
+class TierStats:
+    """Counters for a single cache tier."""
+
+    COUNTERS = ("hits", "stale_hits", "shared_hits", "misses", "coalesced", "evictions", "expirations", "fill_errors")
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.fill_latency = LatencyHistogram()
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in self.COUNTERS}
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        data["hit_rate"] = round((self.hits + self.stale_hits) / lookups, 4) if lookups else None
+        data["fill_latency_seconds"] = self.fill_latency.to_dict()
+        return data
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "drop_at", "size")
+
+    def __init__(self, value: Any, expires_at: float, drop_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.drop_at = drop_at
+        self.size = size
+
+
+class LRUTTLStore:
+    """
+    LRU store with per-entry expiry and entry/byte limits.
+    Reads and writes are O(1); expired entries are removed by popping a
+    heap of expiry times, a bounded number per write.
+    """
+
+    # Max expired entries removed per write, keeps writes cheap
+    SWEEP_BUDGET = 64
+
+    def __init__(self, policy: CachePolicy, clock=time.time):
+        self.policy = policy
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.stats = TierStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> Optional[Any]:
+        """Fresh value for key, or None."""
+        found = self.lookup(key)
+        if found is None or found[1]:
+            return None
+        return found[0]
+
+    def lookup(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """(value, is_stale) for key, or None once it is past its grace window."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            now = self._clock()
+            if now >= entry.drop_at:
+                self._remove(key)
+                self.stats.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry.value, now >= entry.expires_at
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, size: Optional[int] = None):
+        """Store value for ttl seconds; a negative ttl stores an already stale value."""
+        ttl = self.policy.ttl if ttl is None else ttl
+        size = estimate_size(value) + len(key) if size is None else size
+        with self._lock:
+            now = self._clock()
+            self.sweep(now, self.SWEEP_BUDGET)
+            if key in self._entries:
+                self._remove(key)
+            expires_at = now + ttl
+            drop_at = expires_at + self.policy.stale_grace
+            # A single value larger than the whole tier is never stored
+            if drop_at <= now or size > self.policy.max_bytes:
+                return
+            self._entries[key] = _Entry(value, expires_at, drop_at, size)
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (drop_at, next(self._seq), key))
+            self._evict()
+            self._compact_heap()
+
+    def items(self) -> List[Tuple[str, Any, float]]:
+        """(key, value, expires_at) for every entry still inside its grace window."""
+        with self._lock:
+            now = self._clock()
+            return [
+                (key, entry.value, entry.expires_at)
+                for key, entry in self._entries.items()
+                if entry.drop_at > now
+            ]
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expiry_heap.clear()
+            self._bytes = 0
+
+    def sweep(self, now: Optional[float] = None, budget: Optional[int] = None) -> int:
+        """Remove expired entries; returns how many were removed."""
+        now = self._clock() if now is None else now
+        removed = 0
+        with self._lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= now:
+                if budget is not None and removed >= budget:
+                    break
+                drop_at, _, key = heapq.heappop(heap)
+                entry = self._entries.get(key)
+                # Skip heap records left behind by overwrites and deletes
+                if entry is not None and entry.drop_at == drop_at:
+                    self._remove(key)
+                    removed += 1
+        self.stats.expirations += removed
+        return removed
+
+    def _remove(self, key: str) -> _Entry:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        return entry
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.policy.max_entries or self._bytes > self.policy.max_bytes
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.stats.evictions += 1
+
+    def _compact_heap(self):
+        # Overwritten keys leave dead heap records; rebuild when they dominate
+        if len(self._expiry_heap) > 2 * len(self._entries) + 64:
+            self._expiry_heap = [
+                (entry.drop_at, next(self._seq), key) for key, entry in self._entries.items()
+            ]
+            heapq.heapify(self._expiry_heap)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one in-flight task.
+    Every caller gets the task's result or exception; a timeout bounds the
+    shared call itself, so a hung upstream can't pin the key forever.
+    The task runs without any request deadline; each caller waits for it
+    only as long as its own deadline allows.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, loader: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """Returns (result, shared) where shared is True for callers that joined an existing call."""
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            coro = loader() if timeout is None else asyncio.wait_for(loader(), timeout)
+            with deadline.detached():
+                task = asyncio.ensure_future(coro)
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shield so one caller being cancelled or timing out doesn't cancel everyone's call
+        left = deadline.remaining()
+        if left is None:
+            return await asyncio.shield(task), shared
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(left, 0)), shared
+        except asyncio.TimeoutError:
+            if task.done():
+                raise
+            raise deadline.DeadlineExceeded(f"Request deadline exceeded waiting for {key}")
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller went away
+            task.exception()
+
+
+class TieredCache:
+    # Key prefix -> tier name; keys without a known prefix use the default tier
+    TIER_PREFIXES = {
+        "preg_": "pregnancy",
+        "drug_": "drug_safety",
+        "patient_": "patient",
+    }
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, policies: Optional[Dict[str, CachePolicy]] = None, backend: Optional[CacheBackend] = None):
         # TTL Constants (in seconds)
         self.TTL_PREGNANCY = 24 * 60 * 60  # 24 hours
         self.TTL_DRUG_SAFETY = 7 * 24 * 60 * 60  # 1 week
+        self.TTL_PATIENT = 10 * 60  # 10 minutes
+
+        if policies is None:
+            policies = {
+                "pregnancy": CachePolicy(
+                    "pregnancy", self.TTL_PREGNANCY,
+                    settings.CACHE_PREGNANCY_MAX_ENTRIES, settings.CACHE_PREGNANCY_MAX_BYTES,
+                    fill_timeout=settings.CACHE_PREGNANCY_FILL_TIMEOUT,
+                    stale_grace=settings.CACHE_PREGNANCY_STALE_GRACE
+                ),
+                "drug_safety": CachePolicy(
+                    "drug_safety", self.TTL_DRUG_SAFETY,
+                    settings.CACHE_DRUG_SAFETY_MAX_ENTRIES, settings.CACHE_DRUG_SAFETY_MAX_BYTES,
+                    fill_timeout=settings.CACHE_DRUG_SAFETY_FILL_TIMEOUT,
+                    stale_grace=settings.CACHE_DRUG_SAFETY_STALE_GRACE
+                ),
+                "patient": CachePolicy(
+                    "patient", self.TTL_PATIENT,
+                    settings.CACHE_PATIENT_MAX_ENTRIES, settings.CACHE_PATIENT_MAX_BYTES,
+                    fill_timeout=settings.CACHE_PREGNANCY_FILL_TIMEOUT,
+                    # Full Dorra patient records never go to disk
+                    snapshot=False
+                ),
+                "default": CachePolicy(
+                    "default", 60 * 60,
+                    settings.CACHE_DEFAULT_MAX_ENTRIES, settings.CACHE_DEFAULT_MAX_BYTES
+                ),
+            }
+        self._tiers: Dict[str, LRUTTLStore] = {name: LRUTTLStore(policy) for name, policy in policies.items()}
+        self.backend = backend
+        self._flights = SingleFlight()
+        self.refresh_concurrency = settings.CACHE_REFRESH_CONCURRENCY
+        self._refreshes: Dict[str, asyncio.Task] = {}
+        # Snapshot entries not read yet: key -> (raw JSON value, expires_at)
+        self._warm: Dict[str, Tuple[str, float]] = {}
+
+    def tier(self, name: str) -> LRUTTLStore:
+        return self._tiers[name]
+
+    def _tier_for(self, key: str) -> LRUTTLStore:
+        for prefix, name in self.TIER_PREFIXES.items():
+            if key.startswith(prefix) and name in self._tiers:
+                return self._tiers[name]
+        return self._tiers["default"]
 
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache if it exists and hasn't expired."""
-        if key not in self._cache:
-            return None
-            
-        value, expiry = self._cache[key]
-        
-        if time.time() > expiry:
-            del self._cache[key]
+        tier = self._tier_for(key)
+        found = self._lookup(key, tier)
+        if found is None or found[1]:
+            tier.stats.misses += 1
             return None
-            
-        return value
+        tier.stats.hits += 1
+        return found[0]
+
+    def _lookup(self, key: str, tier: LRUTTLStore) -> Optional[Tuple[Any, bool]]:
+        found = self._lookup_local(key, tier)
+        if (found is not None and not found[1]) or self.backend is None:
+            return found
+        return self._note_shared(self._get_shared(key, tier), tier) or found
+
+    async def _lookup_async(self, key: str, tier: LRUTTLStore) -> Optional[Tuple[Any, bool]]:
+        """_lookup with the shared backend read done on a thread, off the event loop."""
+        found = self._lookup_local(key, tier)
+        if (found is not None and not found[1]) or self.backend is None:
+            return found
+        return self._note_shared(await asyncio.to_thread(self._get_shared, key, tier), tier) or found
+
+    def _lookup_local(self, key: str, tier: LRUTTLStore) -> Optional[Tuple[Any, bool]]:
+        if self._warm:
+            self._promote_warm(key, tier)
+        return tier.lookup(key)
+
+    @staticmethod
+    def _note_shared(shared: Optional[Tuple[Any, bool]], tier: LRUTTLStore) -> Optional[Tuple[Any, bool]]:
+        if shared is not None and not shared[1]:
+            tier.stats.shared_hits += 1
+        return shared
 
     def set(self, key: str, value: Any, ttl: int):
         """Set value in cache with specific TTL."""
-        expiry = time.time() + ttl
-        self._cache[key] = (value, expiry)
+        tier = self._tier_for(key)
+        tier.set(key, value, ttl)
+        if self.backend is not None:
+            self._set_shared(key, value, ttl, tier)
+
+    async def _set_async(self, key: str, value: Any, ttl: int):
+        """set with the shared backend write done on a thread, off the event loop."""
+        tier = self._tier_for(key)
+        tier.set(key, value, ttl)
+        if self.backend is not None:
+            await asyncio.to_thread(self._set_shared, key, value, ttl, tier)
+
+    def _set_shared(self, key: str, value: Any, ttl: int, tier: LRUTTLStore):
+        try:
+            # The backend keeps the entry through the grace window too
+            payload = json.dumps({"v": value, "e": time.time() + ttl}, default=str).encode()
+            self.backend.set(key, payload, ttl + tier.policy.stale_grace)
+        except Exception as e:
+            logger.warning(f"Shared cache write failed for {key}: {e}")
+
+    def delete(self, key: str) -> bool:
+        deleted = self._tier_for(key).delete(key)
+        deleted = self._warm.pop(key, None) is not None or deleted
+        if self.backend is not None:
+            try:
+                deleted = self.backend.delete(key) or deleted
+            except Exception as e:
+                logger.warning(f"Shared cache delete failed for {key}: {e}")
+        return deleted
+
+    def _get_shared(self, key: str, tier: LRUTTLStore) -> Optional[Tuple[Any, bool]]:
+        """Read through to the shared backend and keep a local copy."""
+        try:
+            found = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Shared cache read failed for {key}: {e}")
+            return None
+        if found is None:
+            return None
+        try:
+            payload = json.loads(found[0])
+            value = payload["v"]
+            ttl = min(float(payload["e"]) - time.time(), tier.policy.ttl)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable shared cache entry {key}: {e}")
+            return None
+        tier.set(key, value, ttl)
+        return value, ttl <= 0
+
+    async def fetch(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        timeout: Optional[float] = None,
+        should_cache: Optional[Callable[[Any], bool]] = None,
+    ) -> Tuple[Any, str]:
+        """
+        Get a value, calling loader on a miss. Concurrent misses for the same
+        key share one loader call. Returns (value, status) where status is
+        "hit", "miss" (this call ran the loader), "coalesced" (joined
+        another caller's load) or "stale" (served past expiry while a
+        background refresh runs). None results are never cached.
+        """
+        tier = self._tier_for(key)
+        stats = tier.stats
+        found = await self._lookup_async(key, tier)
+
+        async def fill():
+            # An earlier flight may have filled the key since our lookup
+            found = await self._lookup_async(key, tier)
+            if found is not None and not found[1]:
+                return found[0]
+            started = time.perf_counter()
+            try:
+                value = await loader()
+            except BaseException:
+                stats.fill_errors += 1
+                raise
+            finally:
+                stats.fill_latency.observe(time.perf_counter() - started)
+            if value is not None and (should_cache is None or should_cache(value)):
+                await self._set_async(key, value, tier.policy.ttl if ttl is None else ttl)
+            return value
+
+        timeout = tier.policy.fill_timeout if timeout is None else timeout
+        if found is not None:
+            value, stale = found
+            if not stale:
+                stats.hits += 1
+                return value, "hit"
+            stats.stale_hits += 1
+            self._schedule_refresh(key, fill, timeout)
+            return value, "stale"
+
+        value, shared = await self._flights.do(key, fill, timeout)
+        if shared:
+            stats.coalesced += 1
+            return value, "coalesced"
+        stats.misses += 1
+        return value, "miss"
+
+    def _schedule_refresh(self, key: str, fill: Callable[[], Awaitable[Any]], timeout: Optional[float]):
+        """Start a background refresh unless one is running or all refresh slots are busy."""
+        if key in self._refreshes or len(self._refreshes) >= self.refresh_concurrency:
+            return
+
+        async def refresh():
+            try:
+                await self._flights.do(key, fill, timeout)
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {key}, still serving stale value: {e}")
+            finally:
+                self._refreshes.pop(key, None)
+
+        # The refresh outlives the request that noticed the stale entry
+        with deadline.detached():
+            self._refreshes[key] = asyncio.ensure_future(refresh())
 
     def get_pregnancy_status(self, patient_id: int) -> Optional[Dict]:
         return self.get(f"preg_{patient_id}")
@@ -39,14 +530,253 @@ class TieredCache:
     def set_pregnancy_status(self, patient_id: int, data: Dict):
         self.set(f"preg_{patient_id}", data, self.TTL_PREGNANCY)
 
+    async def fetch_pregnancy_status(self, patient_id: int, loader: Callable[[], Awaitable[Optional[Dict]]]) -> Tuple[Optional[Dict], str]:
+        return await self.fetch(f"preg_{patient_id}", loader, self.TTL_PREGNANCY)
+
     def get_drug_safety(self, drug_name: str) -> Optional[Dict]:
         return self.get(f"drug_{drug_name.lower()}")
 
     def set_drug_safety(self, drug_name: str, data: Dict):
         self.set(f"drug_{drug_name.lower()}", data, self.TTL_DRUG_SAFETY)
-        
+
+    async def fetch_drug_safety(
+        self,
+        drug_name: str,
+        loader: Callable[[], Awaitable[Optional[Dict]]],
+        should_cache: Optional[Callable[[Dict], bool]] = None,
+    ) -> Tuple[Optional[Dict], str]:
+        return await self.fetch(f"drug_{drug_name.lower()}", loader, self.TTL_DRUG_SAFETY, should_cache=should_cache)
+
+    async def fetch_patient(self, patient_id: int, loader: Callable[[], Awaitable[Optional[Dict]]]) -> Tuple[Optional[Dict], str]:
+        return await self.fetch(f"patient_{patient_id}", loader, self.TTL_PATIENT)
+
+    async def peek_patient(self, patient_id: int) -> Optional[Dict]:
+        """The cached patient if fresh, else None; never loads."""
+        key = f"patient_{patient_id}"
+        tier = self._tier_for(key)
+        found = await self._lookup_async(key, tier)
+        if found is None or found[1]:
+            return None
+        tier.stats.hits += 1
+        return found[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-tier counters, sizes and fill latency."""
+        tiers = {}
+        for name, tier in self._tiers.items():
+            data = tier.stats.to_dict()
+            data.update({
+                "entries": len(tier),
+                "bytes": tier.bytes,
+                "max_entries": tier.policy.max_entries,
+                "max_bytes": tier.policy.max_bytes,
+                "ttl_seconds": tier.policy.ttl,
+                "stale_grace_seconds": tier.policy.stale_grace,
+            })
+            tiers[name] = data
+        return {
+            "backend": self.backend.name if self.backend is not None else "memory",
+            "in_flight_fills": len(self._flights),
+            "background_refreshes": len(self._refreshes),
+            "tiers": tiers,
+        }
+
+    def _promote_warm(self, key: str, tier: LRUTTLStore):
+        """Decode a snapshot entry into its tier the first time it is read."""
+        warm = self._warm.pop(key, None)
+        if warm is None:
+            return
+        raw, expires_at = warm
+        try:
+            tier.set(key, json.loads(raw), expires_at - time.time())
+        except ValueError:
+            logger.warning(f"Dropping unreadable snapshot entry {key}")
+
+    def save_snapshot(self, path: str) -> int:
+        """
+        Write every unexpired entry of the snapshot tiers to path (one
+        tab-separated line per entry: JSON key, expiry as a unix timestamp,
+        JSON value). The file is replaced atomically. Returns the number of
+        entries written.
+        """
+        now = time.time()
+        lines = [json.dumps({"version": self.SNAPSHOT_VERSION, "saved_at": now})]
+        for tier in self._tiers.values():
+            if not tier.policy.snapshot:
+                continue
+            for key, value, expires_at in tier.items():
+                try:
+                    raw = json.dumps(value, default=str, separators=(",", ":"))
+                except (TypeError, ValueError):
+                    continue
+                lines.append(f"{json.dumps(key)}\t{expires_at!r}\t{raw}")
+        # Entries loaded from the last snapshot but never read are kept too
+        for key, (raw, expires_at) in list(self._warm.items()):
+            if expires_at + self._tier_for(key).policy.stale_grace > now:
+                lines.append(f"{json.dumps(key)}\t{expires_at!r}\t{raw}")
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        return len(lines) - 1
+
+    def load_snapshot(self, path: str) -> int:
+        """
+        Read a snapshot written by save_snapshot. Values stay encoded until
+        the key is first read. Returns the number of entries still usable.
+        """
+        try:
+            f = open(path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return 0
+        now = time.time()
+        loaded = 0
+        with f:
+            header = f.readline()
+            try:
+                if json.loads(header).get("version") != self.SNAPSHOT_VERSION:
+                    logger.warning(f"Ignoring cache snapshot {path} with unknown version")
+                    return 0
+            except (ValueError, AttributeError):
+                logger.warning(f"Ignoring unreadable cache snapshot {path}")
+                return 0
+            for line in f:
+                try:
+                    raw_key, raw_expiry, raw = line.rstrip("\n").split("\t", 2)
+                    key, expires_at = json.loads(raw_key), float(raw_expiry)
+                except ValueError:
+                    continue
+                policy = self._tier_for(key).policy
+                # Older snapshots may hold entries of tiers that are no longer saved
+                if not policy.snapshot or expires_at + policy.stale_grace <= now:
+                    continue
+                self._warm[key] = (raw, expires_at)
+                loaded += 1
+        logger.info(f"Loaded {loaded} cache entries from snapshot {path}")
+        return loaded
+
+    async def run_snapshots(self, path: str, interval: float):
+        """Save a snapshot every interval seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                count = await asyncio.to_thread(self.save_snapshot, path)
+                logger.info(f"Saved {count} cache entries to snapshot {path}")
+            except OSError as e:
+                logger.error(f"Cache snapshot to {path} failed: {e}")
+
+    @staticmethod
+    def _drugs_in_key(key: str) -> List[str]:
+        # Drug-safety keys start with the "+"-joined drug set, see
+        # HybridSafetyService._safety_cache_key
+        return key[len("drug_"):].split("|", 1)[0].split("+")
+
+    @classmethod
+    def _mentions(cls, key: str, value: Callable[[], Any], wanted: Set[str]) -> bool:
+        """
+        Whether a drug-safety entry is about one of wanted. Entries keyed on
+        the request as given (the fused check) name the generic drug they
+        turned out to be about in value()["name"]; value is only read if
+        the key doesn't match.
+        """
+        if wanted.intersection(cls._drugs_in_key(key)):
+            return True
+        found = value()
+        return isinstance(found, dict) and str(found.get("name") or "").lower() in wanted
+
+    @staticmethod
+    def _decode(raw: Any) -> Any:
+        try:
+            return json.loads(raw)
+        except (TypeError, ValueError):
+            return None
+
+    def _invalidation_keys(self, patient_id: Optional[int], drugs: Optional[List[str]]) -> Set[str]:
+        keys = set()
+        if patient_id is not None:
+            keys.add(f"preg_{patient_id}")
+            keys.add(f"patient_{patient_id}")
+        if drugs:
+            wanted = set(drugs)
+            keys.update(
+                key for key, value, _ in self._tiers["drug_safety"].items()
+                if self._mentions(key, lambda: value, wanted)
+            )
+            keys.update(
+                key for key, (raw, _) in self._warm.items()
+                if key.startswith("drug_") and self._mentions(key, lambda: self._decode(raw), wanted)
+            )
+        return keys
+
+    def invalidate(self, patient_id: Optional[int] = None, drugs: Optional[List[str]] = None) -> int:
+        """
+        Drop locally cached entries for a patient and/or any drug-safety
+        entry that mentions one of drugs (lower-case generic names).
+        Returns how many entries were dropped.
+        """
+        dropped = 0
+        for key in self._invalidation_keys(patient_id, drugs):
+            dropped += self._tier_for(key).delete(key)
+            dropped += self._warm.pop(key, None) is not None
+        return dropped
+
+    def invalidate_shared(self, patient_id: Optional[int] = None, drugs: Optional[List[str]] = None):
+        """
+        invalidate() for the shared backend. This blocks on backend I/O
+        (a key scan for drugs, plus a read of each entry whose key doesn't
+        name one), so run it off the event loop.
+        """
+        if self.backend is None:
+            return
+        try:
+            keys = set()
+            if patient_id is not None:
+                keys.update((f"preg_{patient_id}", f"patient_{patient_id}"))
+            if drugs:
+                wanted = set(drugs)
+                keys.update(
+                    key for key in self.backend.keys("drug_")
+                    if self._mentions(key, lambda: self._shared_value(key), wanted)
+                )
+            for key in keys:
+                self.backend.delete(key)
+        except Exception as e:
+            logger.warning(f"Shared cache invalidation failed: {e}")
+
+    def _shared_value(self, key: str) -> Any:
+        found = self.backend.get(key)
+        payload = self._decode(found[0]) if found is not None else None
+        return payload.get("v") if isinstance(payload, dict) else None
+
+    def handle_invalidation(self, event: Dict[str, Any], local: bool):
+        self.invalidate(event.get("patient_id"), event.get("drugs"))
+
+    def handle_shared_invalidation(self, event: Dict[str, Any]):
+        # Only the publishing worker cleans the shared backend
+        self.invalidate_shared(event.get("patient_id"), event.get("drugs"))
+
+    def sweep(self) -> int:
+        """Remove every expired entry from every tier."""
+        now = time.time()
+        for key, (_, expires_at) in list(self._warm.items()):
+            if expires_at + self._tier_for(key).policy.stale_grace <= now:
+                del self._warm[key]
+        return sum(tier.sweep() for tier in self._tiers.values())
+
     def clear(self):
-        self._cache.clear()
+        self._warm.clear()
+        for tier in self._tiers.values():
+            tier.clear()
+        if self.backend is not None:
+            try:
+                self.backend.clear()
+            except Exception as e:
+                logger.warning(f"Shared cache clear failed: {e}")
 
 # Global cache instance
-cache = TieredCache()
+cache = TieredCache(backend=create_backend())
+invalidation_bus.subscribe(cache.handle_invalidation)
+if cache.backend is not None:
+    invalidation_bus.subscribe_shared(cache.handle_shared_invalidation)
+    invalidation_bus.transport = BackendInvalidationLog(cache.backend)
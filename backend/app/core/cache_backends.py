@@ -0,0 +1,428 @@
+"""
+Shared cache backends for TieredCache.
+The per-worker LRU tiers act as a first level; a backend is a second level
+shared by every worker so that one worker's Dorra/Gemini result is a hit
+for all the others.
+
+- RedisBackend: minimal RESP client for any Redis-protocol server
+- SharedMemoryBackend: fixed-slot table in an mmap'd file, for several
+  workers on a single host without running Redis
+"""
+import hashlib
+import logging
+import mmap
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, List, Optional, Tuple
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """
+    Interface for a shared cache store.
+    Values are opaque bytes; TTLs are in seconds.
+    """
+
+    name = "none"
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        """Return (value, remaining ttl) or None when missing or expired."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def keys(self, prefix: str) -> List[str]:
+        """Live keys starting with prefix."""
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        """Atomically increment an integer counter and return the new value."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend(CacheBackend):
+    """
+    Synchronous Redis-protocol (RESP2) backend.
+    Keeps one persistent connection with a short socket timeout; the cache
+    treats any backend error as a miss. After the server can't be reached,
+    calls fail at once for `cooldown` seconds instead of each paying the
+    connect timeout again.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "mamasafe:", timeout: float = 0.25, cooldown: float = 5.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self._down_until = 0.0
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        full_key = self.prefix + key
+        value, pttl = self._execute(("GET", full_key), ("PTTL", full_key))
+        if value is None:
+            return None
+        return value, (pttl / 1000.0 if pttl >= 0 else None)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._execute(("SET", self.prefix + key, value, "PX", max(1, int(ttl * 1000))))
+
+    def delete(self, key: str) -> bool:
+        (deleted,) = self._execute(("DEL", self.prefix + key))
+        return deleted > 0
+
+    def keys(self, prefix: str) -> List[str]:
+        return [key.decode()[len(self.prefix):] for key in self._scan(self.prefix + prefix)]
+
+    def incr(self, key: str) -> int:
+        (value,) = self._execute(("INCR", self.prefix + key))
+        return value
+
+    def clear(self):
+        keys = self._scan(self.prefix)
+        for i in range(0, len(keys), 500):
+            self._execute(("DEL", *keys[i:i + 500]))
+
+    def _scan(self, prefix: str) -> List[bytes]:
+        found, cursor = [], b"0"
+        while True:
+            (reply,) = self._execute(("SCAN", cursor, "MATCH", prefix + "*", "COUNT", 500))
+            cursor, keys = reply
+            found.extend(keys)
+            if cursor in (b"0", 0):
+                return found
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+        try:
+            if self.password:
+                self._roundtrip([("AUTH", self.password)])
+            if self.db:
+                self._roundtrip([("SELECT", self.db)])
+        except Exception:
+            self._disconnect()
+            raise
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+    def _execute(self, *commands) -> List[Any]:
+        """Send commands as one pipeline and return their replies in order."""
+        with self._lock:
+            if time.monotonic() < self._down_until:
+                raise ConnectionError("Redis unavailable, cooling down")
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._roundtrip(commands)
+                except RedisError:
+                    # An error reply; every reply was read, so the connection is still in step
+                    raise
+                except (OSError, ConnectionError):
+                    self._disconnect()
+                    if attempt:
+                        self._down_until = time.monotonic() + self.cooldown
+                        raise
+                except Exception:
+                    # A reply we couldn't parse leaves the stream in an unknown state
+                    self._disconnect()
+                    raise
+
+    def _roundtrip(self, commands) -> List[Any]:
+        self._sock.sendall(b"".join(self._encode(command) for command in commands))
+        # Read every reply before raising an error one, so none are left unread
+        replies = [self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    @staticmethod
+    def _encode(command) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            if isinstance(arg, bytes):
+                data = arg
+            else:
+                data = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read_reply(self) -> Any:
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            return RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise ValueError(f"Unexpected Redis reply type: {line!r}")
+
+
+class SharedMemoryBackend(CacheBackend):
+    """
+    Fixed-size open-addressed hash table in a memory-mapped file.
+    Every worker on the host maps the same file (by default under /dev/shm)
+    and takes an flock around each operation. Each key probes a handful of
+    slots; when they are all live, the one expiring soonest is replaced, so
+    the file never grows past slots * slot_size bytes.
+    """
+
+    name = "shm"
+
+    MAGIC = b"MSCACHE1"
+    HEADER = struct.Struct("<8sII")  # magic, slot count, slot size
+    SLOT_HEADER = struct.Struct("<QdHI")  # key hash, expires at, key length, value length
+    PROBES = 4
+
+    def __init__(self, path: str, slots: int = 8192, slot_size: int = 4096):
+        if fcntl is None:
+            raise RuntimeError("SharedMemoryBackend requires fcntl (POSIX)")
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self._fd: Optional[int] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        key_bytes = key.encode()
+        key_hash = self._hash(key_bytes)
+        with self._locked(fcntl.LOCK_SH):
+            offset = self._find(key_hash, key_bytes)
+            if offset is None:
+                return None
+            _, expires_at, key_len, value_len = self.SLOT_HEADER.unpack_from(self._mmap, offset)
+            remaining = expires_at - time.time()
+            if remaining <= 0:
+                return None
+            start = offset + self.SLOT_HEADER.size + key_len
+            return bytes(self._mmap[start:start + value_len]), remaining
+
+    def set(self, key: str, value: bytes, ttl: float):
+        key_bytes = key.encode()
+        key_hash = self._hash(key_bytes)
+        fits = self.SLOT_HEADER.size + len(key_bytes) + len(value) <= self.slot_size
+        with self._locked(fcntl.LOCK_EX):
+            offset = self._find(key_hash, key_bytes)
+            if not fits:
+                if offset is not None:
+                    self._clear_slot(offset)
+                return
+            if offset is None:
+                offset = self._choose_slot(key_hash)
+            header = self.SLOT_HEADER.pack(key_hash, time.time() + ttl, len(key_bytes), len(value))
+            end = offset + len(header) + len(key_bytes) + len(value)
+            self._mmap[offset:end] = header + key_bytes + value
+
+    def delete(self, key: str) -> bool:
+        key_bytes = key.encode()
+        with self._locked(fcntl.LOCK_EX):
+            offset = self._find(self._hash(key_bytes), key_bytes)
+            if offset is None:
+                return False
+            self._clear_slot(offset)
+            return True
+
+    def keys(self, prefix: str) -> List[str]:
+        now = time.time()
+        found = []
+        with self._locked(fcntl.LOCK_SH):
+            for index in range(self.slots):
+                offset = self._slot_offset(index)
+                slot_hash, expires_at, key_len, _ = self.SLOT_HEADER.unpack_from(self._mmap, offset)
+                if slot_hash == 0 or expires_at <= now:
+                    continue
+                start = offset + self.SLOT_HEADER.size
+                key = self._mmap[start:start + key_len].decode()
+                if key.startswith(prefix):
+                    found.append(key)
+        return found
+
+    # Counters don't expire on their own
+    COUNTER_TTL = 10 * 365 * 24 * 60 * 60
+
+    def incr(self, key: str) -> int:
+        key_bytes = key.encode()
+        key_hash = self._hash(key_bytes)
+        with self._locked(fcntl.LOCK_EX):
+            value = 0
+            offset = self._find(key_hash, key_bytes)
+            if offset is not None:
+                _, _, key_len, value_len = self.SLOT_HEADER.unpack_from(self._mmap, offset)
+                start = offset + self.SLOT_HEADER.size + key_len
+                value = int(bytes(self._mmap[start:start + value_len]) or 0)
+            else:
+                offset = self._choose_slot(key_hash)
+            value += 1
+            data = str(value).encode()
+            header = self.SLOT_HEADER.pack(key_hash, time.time() + self.COUNTER_TTL, len(key_bytes), len(data))
+            self._mmap[offset:offset + len(header) + len(key_bytes) + len(data)] = header + key_bytes + data
+            return value
+
+    def clear(self):
+        with self._locked(fcntl.LOCK_EX):
+            for index in range(self.slots):
+                self._clear_slot(self._slot_offset(index))
+
+    def close(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                os.close(self._fd)
+            self._mmap = None
+            self._fd = None
+
+    def _open(self):
+        size = self.HEADER.size + self.slots * self.slot_size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(fd, self.HEADER.size, 0)
+            expected = self.HEADER.pack(self.MAGIC, self.slots, self.slot_size)
+            if header != expected or os.fstat(fd).st_size != size:
+                # New file or a different geometry: start from an empty table
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                os.pwrite(fd, expected, 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._mmap = mmap.mmap(fd, size)
+
+    @contextmanager
+    def _locked(self, mode: int):
+        with self._lock:
+            if self._mmap is None:
+                self._open()
+            fcntl.flock(self._fd, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key_bytes: bytes) -> int:
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key_bytes, digest_size=8).digest(), "little") or 1
+
+    def _slot_offset(self, index: int) -> int:
+        return self.HEADER.size + index * self.slot_size
+
+    def _probe_offsets(self, key_hash: int):
+        start = key_hash % self.slots
+        for i in range(min(self.PROBES, self.slots)):
+            yield self._slot_offset((start + i) % self.slots)
+
+    def _find(self, key_hash: int, key_bytes: bytes) -> Optional[int]:
+        for offset in self._probe_offsets(key_hash):
+            slot_hash, _, key_len, _ = self.SLOT_HEADER.unpack_from(self._mmap, offset)
+            if slot_hash != key_hash:
+                continue
+            start = offset + self.SLOT_HEADER.size
+            if self._mmap[start:start + key_len] == key_bytes:
+                return offset
+        return None
+
+    def _choose_slot(self, key_hash: int) -> int:
+        now = time.time()
+        victim, victim_expiry = None, None
+        for offset in self._probe_offsets(key_hash):
+            slot_hash, expires_at, _, _ = self.SLOT_HEADER.unpack_from(self._mmap, offset)
+            if slot_hash == 0 or expires_at <= now:
+                return offset
+            if victim is None or expires_at < victim_expiry:
+                victim, victim_expiry = offset, expires_at
+        return victim
+
+    def _clear_slot(self, offset: int):
+        self._mmap[offset:offset + self.SLOT_HEADER.size] = bytes(self.SLOT_HEADER.size)
+
+
+def create_backend() -> Optional[CacheBackend]:
+    """Build the shared backend selected by settings.CACHE_BACKEND."""
+    kind = settings.CACHE_BACKEND.lower()
+    if kind in ("", "memory", "none"):
+        return None
+    if kind == "redis":
+        return RedisBackend(
+            settings.CACHE_REDIS_URL,
+            timeout=settings.CACHE_BACKEND_TIMEOUT,
+            cooldown=settings.CACHE_BACKEND_COOLDOWN
+        )
+    if kind == "shm":
+        if fcntl is None:
+            logger.warning("Shared-memory cache backend is not supported on this platform, using local cache only")
+            return None
+        path = settings.CACHE_SHM_PATH
+        if not path:
+            shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            path = os.path.join(shm_dir, "mamasafe-cache")
+        return SharedMemoryBackend(path, settings.CACHE_SHM_SLOTS, settings.CACHE_SHM_SLOT_SIZE)
+    logger.warning(f"Unknown CACHE_BACKEND '{settings.CACHE_BACKEND}', using local cache only")
+    return None
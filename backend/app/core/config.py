@@ -13,16 +13,127 @@ class Settings:
     # Dorra EMR API Configuration
     DORRA_API_URL: str = os.getenv("DORRA_API_URL", "https://hackathon-api.aheadafrica.org")
     DORRA_API_KEY: str = os.getenv("DORRA_API_KEY", "")
+    
+    # Dorra HTTP client: one pooled keep-alive client per worker
+    DORRA_MAX_CONNECTIONS: int = int(os.getenv("DORRA_MAX_CONNECTIONS", 50))
+    DORRA_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("DORRA_MAX_KEEPALIVE_CONNECTIONS", 20))
+    DORRA_KEEPALIVE_EXPIRY: float = float(os.getenv("DORRA_KEEPALIVE_EXPIRY", 30))
+    DORRA_HTTP2: bool = os.getenv("DORRA_HTTP2", "false").lower() == "true"  # needs the h2 package
+    DORRA_CONNECT_TIMEOUT: float = float(os.getenv("DORRA_CONNECT_TIMEOUT", 5))
+    DORRA_READ_TIMEOUT: float = float(os.getenv("DORRA_READ_TIMEOUT", 10))
+    DORRA_WRITE_TIMEOUT: float = float(os.getenv("DORRA_WRITE_TIMEOUT", 10))
+    DORRA_AI_TIMEOUT: float = float(os.getenv("DORRA_AI_TIMEOUT", 15))
+    
+    # Dorra resilience: GET retries, per-endpoint circuit breakers, hedged patient lookups
+    DORRA_RETRIES: int = int(os.getenv("DORRA_RETRIES", 2))
+    DORRA_RETRY_BASE_DELAY: float = float(os.getenv("DORRA_RETRY_BASE_DELAY", 0.2))
+    DORRA_RETRY_MAX_DELAY: float = float(os.getenv("DORRA_RETRY_MAX_DELAY", 2))
+    DORRA_BREAKER_FAILURES: int = int(os.getenv("DORRA_BREAKER_FAILURES", 5))
+    DORRA_BREAKER_RESET: float = float(os.getenv("DORRA_BREAKER_RESET", 30))
+    DORRA_HEDGE_DELAY: float = float(os.getenv("DORRA_HEDGE_DELAY", 0.5))  # 0 disables hedging
+    # Add an X-Upstream-Calls header (Dorra calls made) to every response
+    DEBUG_UPSTREAM_CALLS: bool = os.getenv("DEBUG_UPSTREAM_CALLS", "false").lower() == "true"
+    # Dorra client-side rate limits per worker (calls/second, 0 disables): AI EMR writes and everything else
+    DORRA_READ_RATE: float = float(os.getenv("DORRA_READ_RATE", 20))
+    DORRA_READ_BURST: int = int(os.getenv("DORRA_READ_BURST", 40))
+    DORRA_AI_WRITE_RATE: float = float(os.getenv("DORRA_AI_WRITE_RATE", 2))
+    DORRA_AI_WRITE_BURST: int = int(os.getenv("DORRA_AI_WRITE_BURST", 5))
+    # Adaptive (AIMD) limit on concurrent Dorra requests per worker
+    DORRA_CONCURRENCY_INITIAL: int = int(os.getenv("DORRA_CONCURRENCY_INITIAL", 16))
+    DORRA_CONCURRENCY_MIN: int = int(os.getenv("DORRA_CONCURRENCY_MIN", 2))
+    DORRA_CONCURRENCY_MAX: int = int(os.getenv("DORRA_CONCURRENCY_MAX", 64))
+    # Max concurrent Dorra requests per bulk patient fetch
+    DORRA_BULK_CONCURRENCY: int = int(os.getenv("DORRA_BULK_CONCURRENCY", 10))
+    
+    # Per-patient encounter cache: newest ENCOUNTER_CACHE_DEPTH encounters, checked for newer ones after ENCOUNTER_CACHE_REFRESH_AFTER seconds
+    ENCOUNTER_CACHE_DEPTH: int = int(os.getenv("ENCOUNTER_CACHE_DEPTH", 50))
+    ENCOUNTER_CACHE_MAX_PATIENTS: int = int(os.getenv("ENCOUNTER_CACHE_MAX_PATIENTS", 5000))
+    ENCOUNTER_CACHE_REFRESH_AFTER: float = float(os.getenv("ENCOUNTER_CACHE_REFRESH_AFTER", 60))
+    
+    # EMR write-behind outbox: workers send queued encounters to Dorra
+    EMR_OUTBOX_ENABLED: bool = os.getenv("EMR_OUTBOX_ENABLED", "true").lower() == "true"
+    EMR_OUTBOX_WORKERS: int = int(os.getenv("EMR_OUTBOX_WORKERS", 2))
+    EMR_OUTBOX_POLL_INTERVAL: float = float(os.getenv("EMR_OUTBOX_POLL_INTERVAL", 2))
+    EMR_OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("EMR_OUTBOX_MAX_ATTEMPTS", 8))
+    EMR_OUTBOX_RETRY_BASE: float = float(os.getenv("EMR_OUTBOX_RETRY_BASE", 5))
+    EMR_OUTBOX_RETRY_MAX: float = float(os.getenv("EMR_OUTBOX_RETRY_MAX", 600))
+    # Seconds a claimed row is hidden from other workers while it is sent; keep above DORRA_AI_TIMEOUT
+    EMR_OUTBOX_LEASE: float = float(os.getenv("EMR_OUTBOX_LEASE", 60))
+    
+    # Local Postgres replica of the Dorra patient roster (needs the pg_trgm extension)
+    PATIENT_REPLICA_ENABLED: bool = os.getenv("PATIENT_REPLICA_ENABLED", "false").lower() == "true"
+    PATIENT_REPLICA_SYNC_INTERVAL: float = float(os.getenv("PATIENT_REPLICA_SYNC_INTERVAL", 60))
+    PATIENT_REPLICA_FULL_SYNC_INTERVAL: float = float(os.getenv("PATIENT_REPLICA_FULL_SYNC_INTERVAL", 3600))
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    # "gemini" or "fake" (the app/standin model, for load tests)
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "gemini").lower()
+    # Model calls run on a bounded thread pool (or the SDK's async API) with a per-call timeout
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", 64))
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", 20))
+    LLM_ASYNC_SDK: bool = os.getenv("LLM_ASYNC_SDK", "false").lower() == "true"
+    # On-disk store of repeatable model responses, shared by the workers on a host ("" disables it)
+    LLM_STORE_PATH: str = os.getenv("LLM_STORE_PATH", "")
+    LLM_STORE_TTL: float = float(os.getenv("LLM_STORE_TTL", 7 * 24 * 3600))
+    LLM_STORE_MAX_ENTRIES: int = int(os.getenv("LLM_STORE_MAX_ENTRIES", 100000))
+    LLM_STORE_MAX_BYTES: int = int(os.getenv("LLM_STORE_MAX_BYTES", 256 * 1024 * 1024))
+    # Detect, analyse and answer non-English single-drug checks in one model call
+    LLM_FUSED_MULTILINGUAL: bool = os.getenv("LLM_FUSED_MULTILINGUAL", "true").lower() == "true"
+    # Pregnancy drug-safety knowledge base ("" uses the bundled app/data/drug_safety_kb.json);
+    # confident single-drug entries are answered from it without calling Gemini
+    DRUG_KB_PATH: str = os.getenv("DRUG_KB_PATH", "")
+    DRUG_KB_FAST_PATH: bool = os.getenv("DRUG_KB_FAST_PATH", "true").lower() == "true"
+    # Latency budgets (seconds); Twilio gives up on a webhook after 15 s
+    SMS_WEBHOOK_DEADLINE: float = float(os.getenv("SMS_WEBHOOK_DEADLINE", 12))
+    MEDICATION_CHECK_DEADLINE: float = float(os.getenv("MEDICATION_CHECK_DEADLINE", 20))
+    # Return a per-stage timing breakdown with medication checks
+    DEBUG_STAGE_TIMINGS: bool = os.getenv("DEBUG_STAGE_TIMINGS", "false").lower() == "true"
     BASE_URL: str = os.getenv("BASE_URL", "http://localhost:8000")
 
     # Twilio SMS Configuration
     TWILIO_ACCOUNT_SID: str = os.getenv("TWILIO_ACCOUNT_SID", "")
     TWILIO_AUTH_TOKEN: str = os.getenv("TWILIO_AUTH_TOKEN", "")
     TWILIO_PHONE_NUMBER: str = os.getenv("TWILIO_PHONE_NUMBER", "")
+    # "twilio" or "fake" (the app/standin sender, for load tests)
+    SMS_BACKEND: str = os.getenv("SMS_BACKEND", "twilio").lower()
     
     # Termii SMS Configuration
     TERMII_API_KEY: str = os.getenv("TERMII_API_KEY", "")
     TERMII_SENDER_ID: str = os.getenv("TERMII_SENDER_ID", "N-Alert")
 
+    # Cache limits (per tier)
+    CACHE_PREGNANCY_MAX_ENTRIES: int = int(os.getenv("CACHE_PREGNANCY_MAX_ENTRIES", 50000))
+    CACHE_PREGNANCY_MAX_BYTES: int = int(os.getenv("CACHE_PREGNANCY_MAX_BYTES", 16 * 1024 * 1024))
+    CACHE_DRUG_SAFETY_MAX_ENTRIES: int = int(os.getenv("CACHE_DRUG_SAFETY_MAX_ENTRIES", 20000))
+    CACHE_DRUG_SAFETY_MAX_BYTES: int = int(os.getenv("CACHE_DRUG_SAFETY_MAX_BYTES", 64 * 1024 * 1024))
+    CACHE_PATIENT_MAX_ENTRIES: int = int(os.getenv("CACHE_PATIENT_MAX_ENTRIES", 20000))
+    CACHE_PATIENT_MAX_BYTES: int = int(os.getenv("CACHE_PATIENT_MAX_BYTES", 32 * 1024 * 1024))
+    CACHE_DEFAULT_MAX_ENTRIES: int = int(os.getenv("CACHE_DEFAULT_MAX_ENTRIES", 10000))
+    CACHE_DEFAULT_MAX_BYTES: int = int(os.getenv("CACHE_DEFAULT_MAX_BYTES", 16 * 1024 * 1024))
+
+    # Max seconds a cache miss may spend filling (shared by coalesced callers)
+    CACHE_PREGNANCY_FILL_TIMEOUT: float = float(os.getenv("CACHE_PREGNANCY_FILL_TIMEOUT", 15))
+    CACHE_DRUG_SAFETY_FILL_TIMEOUT: float = float(os.getenv("CACHE_DRUG_SAFETY_FILL_TIMEOUT", 60))
+
+    # Stale-while-revalidate: seconds past expiry an entry may still be served
+    # while one background task refreshes it (0 disables it for the tier)
+    CACHE_PREGNANCY_STALE_GRACE: int = int(os.getenv("CACHE_PREGNANCY_STALE_GRACE", 0))
+    CACHE_DRUG_SAFETY_STALE_GRACE: int = int(os.getenv("CACHE_DRUG_SAFETY_STALE_GRACE", 0))
+    CACHE_REFRESH_CONCURRENCY: int = int(os.getenv("CACHE_REFRESH_CONCURRENCY", 4))
+
+    # Warm-start snapshot of the cache ("" disables it)
+    CACHE_SNAPSHOT_PATH: str = os.getenv("CACHE_SNAPSHOT_PATH", "")
+    CACHE_SNAPSHOT_INTERVAL: float = float(os.getenv("CACHE_SNAPSHOT_INTERVAL", 300))
+
+    # Shared cache backend: "memory" (per worker only), "redis" or "shm"
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_BACKEND_TIMEOUT: float = float(os.getenv("CACHE_BACKEND_TIMEOUT", 0.25))
+    # After a backend connection failure, skip it for this many seconds
+    CACHE_BACKEND_COOLDOWN: float = float(os.getenv("CACHE_BACKEND_COOLDOWN", 5))
+    CACHE_REDIS_URL: str = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_SHM_PATH: str = os.getenv("CACHE_SHM_PATH", "")
+    CACHE_SHM_SLOTS: int = int(os.getenv("CACHE_SHM_SLOTS", 8192))
+    CACHE_SHM_SLOT_SIZE: int = int(os.getenv("CACHE_SHM_SLOT_SIZE", 4096))
+    # How often workers pick up invalidations published by other workers
+    CACHE_INVALIDATION_POLL_INTERVAL: float = float(os.getenv("CACHE_INVALIDATION_POLL_INTERVAL", 2))
+
 settings = Settings()
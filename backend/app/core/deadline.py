@@ -0,0 +1,82 @@
+"""
+Request deadlines.
+
+An endpoint opens a latency budget with `deadline(seconds)` or the
+`with_deadline` decorator. Everything it awaits, including tasks it
+spawns, sees the same deadline through a ContextVar. Upstream calls clamp
+their own timeouts to what is left with `clamp()`, and optional work is
+skipped once `expired()`. Code running outside a deadline (background
+workers, scripts) is unaffected. Work shared between requests is started
+`detached()` from the deadline of the request that happened to start it.
+"""
+import asyncio
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request's latency budget is spent."""
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Give the enclosed work at most `seconds`; an enclosing, earlier deadline still wins."""
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def detached() -> Iterator[None]:
+    """
+    Clear the deadline for the enclosed code, e.g. while starting a task
+    whose work is shared with other requests and must not be bound by the
+    budget of whichever one started it.
+    """
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current deadline (may be negative), or None without one."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def expired(reserve: float = 0.0) -> bool:
+    """Whether less than `reserve` seconds are left."""
+    left = remaining()
+    return left is not None and left <= reserve
+
+
+def clamp(timeout: float) -> float:
+    """The timeout to use for a call: at most what's left. Raises DeadlineExceeded if nothing is."""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(timeout, left)
+
+
+def with_deadline(seconds: float) -> Callable:
+    """Decorator running an async endpoint under deadline(seconds)."""
+    def decorate(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with deadline(seconds):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
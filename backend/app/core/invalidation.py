@@ -0,0 +1,121 @@
+"""
+Invalidation bus for cached patient and drug data.
+PharmaVigilance webhooks and our own EMR writes publish what changed (a
+patient id and/or drug names); caches subscribe and drop affected keys.
+
+With a shared cache backend, events are also appended to a log in that
+backend and every worker polls it, so a webhook delivered to one worker
+reaches the local caches of all of them. Local caches are cleared as soon
+as an event is published; the shared backend and the log are updated in a
+worker thread, since that is blocking I/O.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.core.cache_backends import CacheBackend
+
+logger = logging.getLogger(__name__)
+
+# Identifies this worker process in the shared event log
+INSTANCE_ID = uuid.uuid4().hex
+
+# An event is {"patient_id": int | None, "drugs": [lower-case names], "reason": str, "origin": str}
+InvalidationHandler = Callable[[Dict[str, Any], bool], None]
+SharedInvalidationHandler = Callable[[Dict[str, Any]], None]
+
+
+class BackendInvalidationLog:
+    """Numbered event log kept in a shared cache backend."""
+
+    SEQ_KEY = "invalidation_seq"
+    EVENT_TTL = 60 * 60  # Workers further behind than this resync from scratch
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._last_seen: Optional[int] = None
+
+    def send(self, event: Dict[str, Any]):
+        seq = self.backend.incr(self.SEQ_KEY)
+        self.backend.set(f"invalidation_{seq}", json.dumps(event).encode(), self.EVENT_TTL)
+
+    def receive(self) -> List[Dict[str, Any]]:
+        found = self.backend.get(self.SEQ_KEY)
+        current = int(found[0]) if found else 0
+        if self._last_seen is None or current < self._last_seen:
+            # First poll, or the counter was reset: start from here
+            self._last_seen = current
+            return []
+        events = []
+        for seq in range(self._last_seen + 1, current + 1):
+            found = self.backend.get(f"invalidation_{seq}")
+            if found is not None:
+                event = json.loads(found[0])
+                # Our own events were applied when they were published
+                if event.get("origin") != INSTANCE_ID:
+                    events.append(event)
+        self._last_seen = current
+        return events
+
+
+class InvalidationBus:
+    def __init__(self):
+        self._handlers: List[InvalidationHandler] = []
+        self._shared_handlers: List[SharedInvalidationHandler] = []
+        self.transport: Optional[BackendInvalidationLog] = None
+
+    def subscribe(self, handler: InvalidationHandler):
+        """handler(event, local) is called for every event; local is False for events from other workers."""
+        self._handlers.append(handler)
+
+    def subscribe_shared(self, handler: SharedInvalidationHandler):
+        """handler(event) cleans shared storage; called once per event, by the publishing worker, in a worker thread."""
+        self._shared_handlers.append(handler)
+
+    async def publish(self, patient_id: Optional[int] = None, drugs: Optional[Iterable[str]] = None, reason: str = ""):
+        event = {
+            "patient_id": patient_id,
+            "drugs": sorted({d.strip().lower() for d in (drugs or []) if d and d.strip()}),
+            "reason": reason,
+            "origin": INSTANCE_ID,
+        }
+        if event["patient_id"] is None and not event["drugs"]:
+            return
+        logger.info(f"Invalidating cached data: {event}")
+        self._dispatch(event, True)
+        if self._shared_handlers or self.transport is not None:
+            await asyncio.to_thread(self._share, event)
+
+    def _share(self, event: Dict[str, Any]):
+        for handler in self._shared_handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(f"Shared invalidation handler failed for {event}: {e}")
+        if self.transport is not None:
+            try:
+                self.transport.send(event)
+            except Exception as e:
+                logger.warning(f"Failed to share invalidation with other workers: {e}")
+
+    def _dispatch(self, event: Dict[str, Any], local: bool):
+        for handler in self._handlers:
+            try:
+                handler(event, local)
+            except Exception as e:
+                logger.error(f"Invalidation handler failed for {event}: {e}")
+
+    async def listen(self, interval: float):
+        """Apply events published by other workers until cancelled."""
+        while True:
+            try:
+                for event in await asyncio.to_thread(self.transport.receive):
+                    self._dispatch(event, False)
+            except Exception as e:
+                logger.warning(f"Polling shared invalidations failed: {e}")
+            await asyncio.sleep(interval)
+
+
+invalidation_bus = InvalidationBus()
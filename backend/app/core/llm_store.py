@@ -0,0 +1,133 @@
+"""
+Content-addressed store for model responses.
+
+Responses are keyed by sha256(model name + prompt) in a local SQLite
+database (WAL mode), so every worker on the host shares them and they
+survive restarts. Entries expire after a TTL; once the store grows past
+its entry or byte cap the least recently used entries are dropped.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at);
+"""
+
+
+def response_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMResponseStore:
+    # Reads refresh accessed_at at most this often, so hits rarely write
+    TOUCH_INTERVAL = 60.0
+    # Enforce the caps every this many puts
+    PRUNE_EVERY = 64
+
+    def __init__(self, path: str, ttl: float, max_entries: int, max_bytes: int, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # One connection per process, used from the event loop and the LLM pool
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        """The stored response for this model and prompt, or None."""
+        key = response_key(model, prompt)
+        now = self.clock()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, accessed_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if now - row[1] > self.TOUCH_INTERVAL:
+                self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, model: str, prompt: str, response: str, ttl: Optional[float] = None):
+        now = self.clock()
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (response_key(model, prompt), model, response, len(response.encode("utf-8")), now, now + ttl, now)
+            )
+            self._puts += 1
+            if self._puts % self.PRUNE_EVERY == 0:
+                self._prune(now)
+
+    def prune(self) -> int:
+        """Drop expired entries, then the least recently used ones over the caps."""
+        with self._lock:
+            return self._prune(self.clock())
+
+    def _prune(self, now: float) -> int:
+        removed = self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,)).rowcount
+        count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return removed
+        # Walk from the least recently used entry until both caps are met
+        cutoff = None
+        for accessed_at, entry_size in self._db.execute("SELECT accessed_at, size FROM responses ORDER BY accessed_at"):
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            count -= 1
+            size -= entry_size
+            cutoff = accessed_at
+        if cutoff is not None:
+            removed += self._db.execute("DELETE FROM responses WHERE accessed_at <= ?", (cutoff,)).rowcount
+        logger.info(f"LLM response store pruned {removed} entries")
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "path": self.path,
+            "entries": count,
+            "bytes": size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
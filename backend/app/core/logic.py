@@ -10,3 +10,24 @@ def calculate_gestational_week(lmp: date) -> int:
     delta = today - lmp
     weeks = delta.days // 7
     return max(0, weeks)
+
+# Week ranges where pregnancy drug-safety guidance changes: organogenesis,
+# early second trimester, NSAID/oligohydramnios risk from week 20, ductus
+# arteriosus risk from week 28, and term.
+GESTATIONAL_BANDS = [
+    (1, 13, "t1"),
+    (14, 19, "t2-early"),
+    (20, 27, "t2-late"),
+    (28, 36, "t3"),
+    (37, 45, "term"),
+]
+
+def gestational_band(week: int) -> str:
+    """
+    Maps a gestational week to the band used for sharing safety answers.
+    Week 0 means the week is unknown.
+    """
+    for start, end, band in GESTATIONAL_BANDS:
+        if start <= week <= end:
+            return band
+    return "unknown" if week <= 0 else "post-term"
@@ -0,0 +1,83 @@
+"""
+Small dependency-graph executor for request pipelines.
+
+Stages are async callables that receive the results of the stages run so
+far. Each starts as soon as the stages it depends on have finished, so
+independent stages overlap and the pipeline takes as long as its longest
+chain rather than the sum of its stages.
+
+Per-stage timings are recorded relative to the outermost pipeline; a
+pipeline run inside a stage of another (even in a task spawned by it)
+adds its stages under its own name, e.g. "multi_drug.encounter".
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+StageFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+# {"origin": perf_counter at the outermost start, "stages": {name: timing}}
+_trace: ContextVar[Optional[Dict[str, Any]]] = ContextVar("pipeline_trace", default=None)
+
+
+class Pipeline:
+    def __init__(self, name: Optional[str] = None, clock=time.perf_counter):
+        self.name = name
+        self.clock = clock
+        self.stages: Dict[str, Tuple[StageFunc, Tuple[str, ...]]] = {}
+        self.timings: Dict[str, Any] = {}
+
+    def stage(self, name: str, func: StageFunc, after: Tuple[str, ...] = ()) -> "Pipeline":
+        """Add a stage; it may only depend on stages added before it, so the graph can't cycle."""
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        missing = [dep for dep in after if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages: {missing}")
+        self.stages[name] = (func, tuple(after))
+        return self
+
+    async def run(self, on_stage: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """
+        Run every stage and return {stage name: result}. If a stage raises,
+        the stages still running are cancelled and the error propagates.
+        on_stage(name, result) is called as each stage finishes.
+        """
+        trace = _trace.get()
+        token = None
+        if trace is None:
+            trace = {"origin": self.clock(), "stages": {}}
+            token = _trace.set(trace)
+        prefix = f"{self.name}." if self.name else ""
+        results: Dict[str, Any] = {}
+        tasks: Dict[str, asyncio.Future] = {}
+
+        async def run_stage(name: str, func: StageFunc, after: Tuple[str, ...]):
+            if after:
+                await asyncio.gather(*(tasks[dep] for dep in after))
+            started = self.clock()
+            try:
+                results[name] = await func(results)
+                if on_stage is not None:
+                    on_stage(name, results[name])
+            finally:
+                trace["stages"][prefix + name] = {
+                    "start_ms": round((started - trace["origin"]) * 1000, 1),
+                    "duration_ms": round((self.clock() - started) * 1000, 1),
+                }
+
+        for name, (func, after) in self.stages.items():
+            tasks[name] = asyncio.ensure_future(run_stage(name, func, after))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            if token is not None:
+                _trace.reset(token)
+                self.timings = {
+                    "total_ms": round((self.clock() - trace["origin"]) * 1000, 1),
+                    "stages": trace["stages"],
+                }
+        return results
@@ -0,0 +1,90 @@
+"""
+Request-scoped memo for upstream reads.
+
+RequestMemoMiddleware gives every HTTP request its own RequestMemo through a
+ContextVar. DorraEMRService memoizes reads (patient, encounters,
+interactions) in it for the life of the request, so repeated lookups from
+different layers cost one round trip, and counts every upstream call made.
+"""
+import asyncio
+import logging
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMemo:
+    def __init__(self):
+        self._results: Dict[Hashable, asyncio.Task] = {}
+        self.upstream_calls = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Run loader once per key; concurrent and later callers share its result."""
+        task = self._results.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._results[key] = task
+        return await asyncio.shield(task)
+
+    def forget(self, *keys: Hashable):
+        for key in keys:
+            self._results.pop(key, None)
+
+
+_current: ContextVar[Optional[RequestMemo]] = ContextVar("request_memo", default=None)
+
+
+def current_memo() -> Optional[RequestMemo]:
+    """The memo of the request being handled, or None outside a request."""
+    return _current.get()
+
+
+async def memoized(key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+    memo = _current.get()
+    if memo is None:
+        return await loader()
+    return await memo.get_or_load(key, loader)
+
+
+def forget(*keys: Hashable):
+    memo = _current.get()
+    if memo is not None:
+        memo.forget(*keys)
+
+
+def count_upstream_call():
+    memo = _current.get()
+    if memo is not None:
+        memo.upstream_calls += 1
+
+
+class RequestMemoMiddleware:
+    """ASGI middleware: one RequestMemo per HTTP request, optionally reporting upstream calls in a header."""
+
+    HEADER = b"x-upstream-calls"
+
+    def __init__(self, app, debug_header: bool = False):
+        self.app = app
+        self.debug_header = debug_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        memo = RequestMemo()
+        token = _current.set(memo)
+
+        async def send_with_count(message):
+            if self.debug_header and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((self.HEADER, str(memo.upstream_calls).encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _current.reset(token)
+            logger.debug(f"{scope.get('method')} {scope.get('path')} made {memo.upstream_calls} upstream call(s)")
@@ -0,0 +1,257 @@
+"""
+Resilience helpers for upstream calls: circuit breakers, jittered
+exponential backoff, hedged requests, token-bucket rate limiting and
+AIMD adaptive concurrency.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker: after `failure_threshold` failures in a row
+    calls fail fast for `reset_timeout` seconds, then a single probe call is
+    let through (half-open) to decide whether to close again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if self.clock() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit {self.name} closed")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit {self.name} opened after {self.consecutive_failures} failures")
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+
+    def release(self):
+        """Give back a call allow() admitted that ended without an outcome, e.g. our own deadline ran out."""
+        self._probe_in_flight = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+async def hedged(call: Callable[[], Awaitable[Any]], delay: float) -> Any:
+    """
+    Run call(); if it hasn't finished after `delay` seconds start a second
+    copy and return whichever succeeds first. The loser is cancelled.
+    """
+    first = asyncio.ensure_future(call())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    pending = {first, asyncio.ensure_future(call())}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def retry_after_seconds(value: Optional[str], cap: float = 60.0) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date), capped at cap seconds."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), cap)
+
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second with bursts of up to `burst`. Callers
+    reserve a token and sleep until it is theirs, so waiters go out in
+    order. A rate of 0 disables the bucket.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, clock=time.monotonic):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.paused_until = 0.0
+        self.throttled = 0
+
+    def reserve(self) -> float:
+        """Take a token; returns how long to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        # Negative tokens are owed to callers already waiting
+        wait = max(0.0, -self.tokens / self.rate, self.paused_until - now)
+        if wait > 0:
+            self.throttled += 1
+        return wait
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold every call for seconds, e.g. after a 429 with Retry-After."""
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 2),
+            "paused_for": round(max(0.0, self.paused_until - self.clock()), 2),
+            "throttled": self.throttled,
+        }
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: each success raises the limit by 1/limit (about
+    +1 per round of calls), an overload signal (429, 503, timeout) halves
+    it, at most once per `cooldown` seconds so one burst counts once.
+    Use as `async with limiter:` around a call and report the outcome.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, decrease: float = 0.5, cooldown: float = 1.0, clock=time.monotonic):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.clock = clock
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = float("-inf")
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self):
+        # Drop waiters that gave up (or whose event loop is gone)
+        while self._waiters and (self._waiters[0].done() or self._waiters[0].get_loop().is_closed()):
+            self._waiters.popleft()
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The slot may have been handed to us just as we were cancelled
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done() or waiter.get_loop().is_closed():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_overload(self):
+        now = self.clock()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        self.decreases += 1
+        logger.warning(f"Upstream overloaded, concurrency limit now {int(self.limit)}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "decreases": self.decreases,
+        }
@@ -1,9 +1,12 @@
 import asyncio
 import logging
-from sqlalchemy import select
+from sqlalchemy import select, text
 from app.db.session import engine, SessionLocal
 from app.db.base import Base
 from app.models.user import User
+from app.models.audit import AuditLog
+from app.models.patient import PatientReplica
+from app.models.outbox import EmrOutbox
 from app.core.security import get_password_hash
 
 logging.basicConfig(level=logging.INFO)
@@ -11,6 +14,8 @@ logger = logging.getLogger(__name__)
 
 async def init_db():
     async with engine.begin() as conn:
+        # Trigram index on patient names
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         # Create all tables
         await conn.run_sync(Base.metadata.create_all)
     
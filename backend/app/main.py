@@ -1,4 +1,6 @@
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+import asyncio
 import os
 
 # Load environment variables from .env file
@@ -7,13 +9,72 @@ load_dotenv()
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.cache import cache
+from app.core.invalidation import invalidation_bus
+from app.core.request_memo import RequestMemoMiddleware
+from app.services.dorra_emr import dorra_emr
+from app.services.patient_replica import patient_replica
+from app.services.emr_outbox import emr_outbox
+from app.services import llm
 from app.api.api import api_router
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared keep-alive connection pool for every Dorra call
+    await dorra_emr.startup()
+
+    # Warm-start the cache from the last snapshot and keep saving it
+    snapshot_task = None
+    if settings.CACHE_SNAPSHOT_PATH:
+        cache.load_snapshot(settings.CACHE_SNAPSHOT_PATH)
+        snapshot_task = asyncio.create_task(
+            cache.run_snapshots(settings.CACHE_SNAPSHOT_PATH, settings.CACHE_SNAPSHOT_INTERVAL)
+        )
+
+    # Apply cache invalidations published by other workers
+    invalidation_task = None
+    if invalidation_bus.transport is not None:
+        invalidation_task = asyncio.create_task(
+            invalidation_bus.listen(settings.CACHE_INVALIDATION_POLL_INTERVAL)
+        )
+
+    # Keep the local patient replica in sync with Dorra (one worker at a time does the sync)
+    replica_task = None
+    if patient_replica.enabled:
+        replica_task = asyncio.create_task(
+            patient_replica.run(settings.PATIENT_REPLICA_SYNC_INTERVAL, settings.PATIENT_REPLICA_FULL_SYNC_INTERVAL)
+        )
+
+    # Send queued EMR records to Dorra
+    outbox_task = None
+    if emr_outbox.enabled:
+        outbox_task = asyncio.create_task(
+            emr_outbox.run(settings.EMR_OUTBOX_WORKERS, settings.EMR_OUTBOX_POLL_INTERVAL)
+        )
+
+    yield
+
+    if outbox_task:
+        outbox_task.cancel()
+    if replica_task:
+        replica_task.cancel()
+    if invalidation_task:
+        invalidation_task.cancel()
+    if snapshot_task:
+        snapshot_task.cancel()
+        cache.save_snapshot(settings.CACHE_SNAPSHOT_PATH)
+    await dorra_emr.shutdown()
+    llm.shutdown()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
+# Per-request memo of Dorra reads
+app.add_middleware(RequestMemoMiddleware, debug_header=settings.DEBUG_UPSTREAM_CALLS)
+
 # Set all CORS enabled origins
 app.add_middleware(
     CORSMiddleware,
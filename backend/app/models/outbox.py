@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class EmrOutbox(Base):
+    """An EMR write waiting to be sent to Dorra by the outbox workers."""
+    id = Column(Integer, primary_key=True, index=True)
+    patient_id = Column(Integer, nullable=False)
+    prompt = Column(Text, nullable=False)  # sent to POST /v1/ai/emr
+    source = Column(String)  # "medication_check", "visit_log", "encounter_update"
+    status = Column(String, nullable=False, default="pending")  # pending, done, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String)
+    dorra_id = Column(Integer)  # id of the record Dorra created
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_emroutbox_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_emroutbox_patient_status", "patient_id", "status", "id"),
+    )
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from app.db.base import Base
+
+class PatientReplica(Base):
+    """Local copy of a Dorra EMR patient, kept fresh by PatientReplicaService."""
+    id = Column(Integer, primary_key=True, autoincrement=False)  # Dorra patient id
+    first_name = Column(String, default="")
+    last_name = Column(String, default="")
+    full_name = Column(String, default="")
+    phone_number = Column(String, default="")
+    phone_normalized = Column(String, default="")  # digits only, 234 country code
+    email = Column(String, default="")
+    data = Column(JSONB, nullable=False)  # the full Dorra record
+    updated_at = Column(DateTime(timezone=True), index=True)  # Dorra's updated_at
+    synced_at = Column(DateTime(timezone=True), index=True)
+
+    __table_args__ = (
+        # Substring/fuzzy name search (requires the pg_trgm extension)
+        Index(
+            "ix_patientreplica_full_name_trgm", "full_name",
+            postgresql_using="gin", postgresql_ops={"full_name": "gin_trgm_ops"}
+        ),
+        # Prefix search on phone numbers
+        Index(
+            "ix_patientreplica_phone_normalized", "phone_normalized",
+            postgresql_ops={"phone_normalized": "text_pattern_ops"}
+        ),
+    )
@@ -14,4 +14,5 @@ class EncounterUpdateRequest(BaseModel):
 class EncounterUpdateResponse(BaseModel):
     success: bool
     encounter_id: Optional[int] = None
+    outbox_id: Optional[int] = None  # set when the update was queued rather than sent
     message: str
\ No newline at end of file
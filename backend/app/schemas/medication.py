@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 class MedicationCheckRequest(BaseModel):
@@ -8,7 +8,7 @@ class MedicationCheckRequest(BaseModel):
     manual_gestational_week: Optional[int] = None
     override_lmp: Optional[str] = None  # ISO format YYYY-MM-DD
     symptoms: Optional[List[str]] = []
-    language: Optional[str] = "en"  # "en", "yo", "ig", "ha"
+    language: Optional[str] = "en"  # "en", "yo", "ig", "ha" or "auto"
 
 class MedicationCheckResponse(BaseModel):
     drug_name: str
@@ -22,6 +22,9 @@ class MedicationCheckResponse(BaseModel):
     personalized_notes: Optional[str] = None
     risk_score: Optional[int] = None
     analysis_type: Optional[str] = "single-drug"  # "single-drug" or "multi-drug"
+    cache_status: Optional[str] = None  # "hit", "miss", "coalesced", "stale" or "bypass"
+    language: Optional[str] = None  # Language the message is written in
+    timings: Optional[Dict[str, Any]] = None  # Per-stage breakdown with DEBUG_STAGE_TIMINGS
 
 class VisitLogRequest(BaseModel):
     patient_id: str
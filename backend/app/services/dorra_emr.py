@@ -1,10 +1,24 @@
+import asyncio
 import httpx
 import logging
-from typing import Optional, Dict, Any
+import re
+from contextlib import aclosing
+from typing import Optional, Dict, Any, List, AsyncIterator
+from app.core.cache import cache
 from app.core.config import settings
+from app.core.invalidation import invalidation_bus
+from app.core import deadline, request_memo
+from app.core.deadline import DeadlineExceeded
+from app.core.resilience import (
+    AdaptiveLimiter, CircuitBreaker, CircuitOpenError, TokenBucket, backoff_delay, hedged, retry_after_seconds
+)
+from app.services.encounter_cache import EncounterCache
 
 logger = logging.getLogger(__name__)
 
+class DorraAPIError(Exception):
+    """Dorra answered with an unexpected status code."""
+
 class DorraEMRService:
     def __init__(self):
         self.base_url = settings.DORRA_API_URL
@@ -13,30 +27,233 @@ class DorraEMRService:
             "Authorization": f"Token {self.api_key}",
             "Content-Type": "application/json"
         }
+        
+        # Per-endpoint timeouts (seconds)
+        self.read_timeout = settings.DORRA_READ_TIMEOUT
+        self.write_timeout = settings.DORRA_WRITE_TIMEOUT
+        self.ai_timeout = settings.DORRA_AI_TIMEOUT
+        
+        # One keep-alive connection pool shared by every call, opened in the
+        # FastAPI lifespan (or lazily for scripts) and closed on shutdown
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client_closer: Optional[asyncio.Task] = None
+        
+        # One circuit breaker per endpoint, e.g. "GET /v1/patients/{id}"
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.counters = {"retries": 0, "hedged_requests": 0}
+        
+        # Client-side rate limits and adaptive concurrency, shared by every call
+        self.buckets = {
+            "read": TokenBucket("read", settings.DORRA_READ_RATE, settings.DORRA_READ_BURST),
+            "ai_write": TokenBucket("ai_write", settings.DORRA_AI_WRITE_RATE, settings.DORRA_AI_WRITE_BURST),
+        }
+        self.limiter = AdaptiveLimiter(
+            settings.DORRA_CONCURRENCY_INITIAL, settings.DORRA_CONCURRENCY_MIN, settings.DORRA_CONCURRENCY_MAX
+        )
+        
+        # Newest encounters per patient, refreshed incrementally
+        self.encounters = EncounterCache(
+            self.iter_encounters,
+            depth=settings.ENCOUNTER_CACHE_DEPTH,
+            max_patients=settings.ENCOUNTER_CACHE_MAX_PATIENTS,
+            refresh_after=settings.ENCOUNTER_CACHE_REFRESH_AFTER
+        )
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        http2 = settings.DORRA_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("DORRA_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+                http2 = False
+        
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.DORRA_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.DORRA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.DORRA_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(self.read_timeout, connect=settings.DORRA_CONNECT_TIMEOUT)
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        The shared client; recreated if closed or if we're on a different
+        event loop (scripts, tests). A client is closed on its own loop,
+        when that loop shuts down or, if it is still running elsewhere,
+        as soon as it is replaced.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            if self._client is not None and not self._client.is_closed and self._client_loop.is_running():
+                # Still running in another thread: its connections can only be closed there
+                asyncio.run_coroutine_threadsafe(self._client.aclose(), self._client_loop)
+            self._client = self._create_client()
+            self._client_loop = loop
+            self._client_closer = loop.create_task(self._close_on_loop_exit(self._client))
+        return self._client
+
+    @staticmethod
+    async def _close_on_loop_exit(client: httpx.AsyncClient):
+        # asyncio.run cancels every pending task before closing its loop
+        try:
+            await asyncio.get_running_loop().create_future()
+        finally:
+            if not client.is_closed:
+                await client.aclose()
+    
+    async def startup(self):
+        """Open the connection pool (FastAPI lifespan startup)."""
+        self.client
+        logger.info(f"Dorra EMR client ready: {self.base_url}")
+    
+    async def shutdown(self):
+        """Close the connection pool once in-flight requests are done (lifespan shutdown)."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        if self._client_closer is not None and self._client_loop is asyncio.get_running_loop():
+            self._client_closer.cancel()
+        self._client = None
+        self._client_loop = None
+        self._client_closer = None
+    
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        if endpoint not in self.breakers:
+            self.breakers[endpoint] = CircuitBreaker(
+                endpoint, settings.DORRA_BREAKER_FAILURES, settings.DORRA_BREAKER_RESET
+            )
+        return self.breakers[endpoint]
+    
+    async def _request(self, method: str, path: str, timeout: float, **kwargs) -> httpx.Response:
+        """
+        Every Dorra call goes through here and the shared client.
+        Calls wait for a token (separate buckets for AI writes and everything
+        else) and a slot under the adaptive concurrency limit. GETs are
+        retried with jittered backoff on network errors and 5xx/429,
+        honouring Retry-After; raises CircuitOpenError without calling Dorra
+        while the endpoint's breaker is open. Timeouts are clamped to the
+        request deadline (app.core.deadline); DeadlineExceeded is raised
+        once it has passed.
+        """
+        # Pagination links are absolute URLs; breakers are keyed by route only
+        route = re.sub(r'/[0-9]+', '/{id}', httpx.URL(path).path)
+        endpoint = f"{method} {route}"
+        breaker = self._breaker(endpoint)
+        bucket = self.buckets["ai_write" if route.startswith("/v1/ai/") else "read"]
+        attempts = 1 + (settings.DORRA_RETRIES if method == "GET" else 0)
+        
+        for attempt in range(attempts):
+            deadline.clamp(timeout)
+            if not breaker.allow():
+                raise CircuitOpenError(f"Dorra circuit open for {endpoint}")
+            
+            retry_after = None
+            try:
+                await bucket.acquire()
+                async with self.limiter:
+                    call_timeout = deadline.clamp(timeout)
+                    request_memo.count_upstream_call()
+                    try:
+                        response = await self.client.request(method, path, timeout=call_timeout, **kwargs)
+                    except httpx.TransportError as e:
+                        if isinstance(e, httpx.TimeoutException) and call_timeout < timeout:
+                            # Our budget ran out, which says nothing about Dorra's health
+                            raise DeadlineExceeded(f"Request deadline exceeded during {endpoint}") from e
+                        breaker.record_failure()
+                        if isinstance(e, httpx.TimeoutException):
+                            self.limiter.on_overload()
+                        if attempt == attempts - 1:
+                            raise
+                    else:
+                        if response.status_code < 500 and response.status_code != 429:
+                            breaker.record_success()
+                            self.limiter.on_success()
+                            return response
+                        if response.status_code in (429, 503):
+                            self.limiter.on_overload()
+                            retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                            if retry_after:
+                                bucket.pause(retry_after)
+                        # Being rate limited doesn't mean Dorra is unhealthy
+                        if response.status_code != 429:
+                            breaker.record_failure()
+                        if attempt == attempts - 1:
+                            return response
+            except BaseException:
+                # Cancelled (e.g. a losing hedge), out of budget or an unexpected
+                # error: give back a half-open probe slot that has no outcome
+                breaker.release()
+                raise
+            
+            self.counters["retries"] += 1
+            delay = backoff_delay(attempt, settings.DORRA_RETRY_BASE_DELAY, settings.DORRA_RETRY_MAX_DELAY)
+            if deadline.expired(delay):
+                raise DeadlineExceeded(f"No time left to retry {endpoint}")
+            # The bucket pause already holds the next attempt for Retry-After
+            if not retry_after:
+                await asyncio.sleep(delay)
+    
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Breaker state per endpoint, rate limits, concurrency limit and retry/hedge counters."""
+        return {
+            "breakers": {name: breaker.to_dict() for name, breaker in self.breakers.items()},
+            "rate_limits": {name: bucket.to_dict() for name, bucket in self.buckets.items()},
+            "concurrency": self.limiter.to_dict(),
+            **self.counters,
+        }
+    
+    async def _fetch_patient(self, patient_id: int) -> Optional[Dict[str, Any]]:
+        """
+        GET /v1/patients/{id}, hedged. Returns None if the patient doesn't
+        exist and raises on any other failure.
+        """
+        calls = 0
+        
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            if calls > 1:
+                self.counters["hedged_requests"] += 1
+            return await self._request("GET", f"/v1/patients/{patient_id}", timeout=self.read_timeout)
+        
+        # Patient lookups are on every hot path: race a second request if the first is slow
+        if settings.DORRA_HEDGE_DELAY > 0:
+            response = await hedged(fetch, settings.DORRA_HEDGE_DELAY)
+        else:
+            response = await fetch()
+        
+        if response.status_code == 200:
+            return response.json()
+        elif response.status_code == 404:
+            return None
+        raise DorraAPIError(f"{response.status_code} - {response.text}")
     
     async def get_patient(self, patient_id: int) -> Optional[Dict[str, Any]]:
         """
         Retrieve patient data from Dorra EMR.
         GET /v1/patients/{id}
+        Memoized for the current request.
         """
+        return await request_memo.memoized(("patient", patient_id), lambda: self._load_patient(patient_id))
+    
+    async def _load_patient(self, patient_id: int) -> Optional[Dict[str, Any]]:
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/v1/patients/{patient_id}",
-                    headers=self.headers,
-                    timeout=10.0
-                )
+            patient = await self._fetch_patient(patient_id)
+            if patient is None:
+                logger.warning(f"Patient {patient_id} not found")
+            else:
+                logger.info(f"Successfully retrieved patient {patient_id}")
+            return patient
                 
-                if response.status_code == 200:
-                    logger.info(f"Successfully retrieved patient {patient_id}")
-                    return response.json()
-                elif response.status_code == 404:
-                    logger.warning(f"Patient {patient_id} not found")
-                    return None
-                else:
-                    logger.error(f"Error retrieving patient {patient_id}: {response.status_code} - {response.text}")
-                    return None
-                    
+        except DorraAPIError as e:
+            logger.error(f"Error retrieving patient {patient_id}: {str(e)}")
+            return None
         except httpx.HTTPError as e:
             logger.error(f"HTTP error retrieving patient {patient_id}: {str(e)}")
             return None
@@ -44,28 +261,59 @@ class DorraEMRService:
             logger.error(f"Unexpected error retrieving patient {patient_id}: {str(e)}")
             return None
     
+    async def get_patients_bulk(self, patient_ids: List[int]) -> Dict[str, Any]:
+        """
+        Fetch many patients at once. Ids are deduplicated, cached patients are
+        served from the patient cache tier and the rest are fetched
+        concurrently, at most DORRA_BULK_CONCURRENCY at a time.
+        Returns {"patients": {id: patient}, "errors": {id: reason}}.
+        """
+        patients: Dict[int, Any] = {}
+        errors: Dict[int, str] = {}
+        semaphore = asyncio.Semaphore(settings.DORRA_BULK_CONCURRENCY)
+        
+        async def get_one(patient_id: int):
+            try:
+                patient = await cache.peek_patient(patient_id)
+                if patient is None:
+                    # Wait for a slot before the cache fill starts, so queueing
+                    # doesn't count against its fill timeout
+                    async with semaphore:
+                        patient, _ = await cache.fetch_patient(patient_id, lambda: self._fetch_patient(patient_id))
+            except Exception as e:
+                errors[patient_id] = str(e) or type(e).__name__
+                return
+            if patient is None:
+                errors[patient_id] = "not found"
+            else:
+                patients[patient_id] = patient
+        
+        await asyncio.gather(*(get_one(patient_id) for patient_id in dict.fromkeys(patient_ids)))
+        logger.info(f"Bulk patient fetch: {len(patients)} found, {len(errors)} failed")
+        return {"patients": patients, "errors": errors}
+    
     async def create_patient(self, patient_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Create a new patient in Dorra EMR.
         POST /v1/patients/create
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/v1/patients/create",
-                    headers=self.headers,
-                    json=patient_data,
-                    timeout=10.0
-                )
+            response = await self._request(
+                "POST",
+                "/v1/patients/create",
+                json=patient_data,
+                timeout=self.write_timeout
+            )
+            
+            if response.status_code == 201:
+                result = response.json()
+                logger.info(f"Successfully created patient, ID: {result.get('id')}")
+                await invalidation_bus.publish(patient_id=result.get("id"), reason="patient_created")
+                return result
+            else:
+                logger.error(f"Error creating patient: {response.status_code} - {response.text}")
+                return None
                 
-                if response.status_code == 201:
-                    result = response.json()
-                    logger.info(f"Successfully created patient, ID: {result.get('id')}")
-                    return result
-                else:
-                    logger.error(f"Error creating patient: {response.status_code} - {response.text}")
-                    return None
-                    
         except httpx.HTTPError as e:
             logger.error(f"HTTP error creating patient: {str(e)}")
             return None
@@ -79,22 +327,22 @@ class DorraEMRService:
         POST /v1/ai/patient
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/v1/ai/patient",
-                    headers=self.headers,
-                    json={"prompt": prompt},
-                    timeout=15.0
-                )
+            response = await self._request(
+                "POST",
+                "/v1/ai/patient",
+                json={"prompt": prompt},
+                timeout=self.ai_timeout
+            )
+            
+            if response.status_code == 201:
+                result = response.json()
+                logger.info(f"Successfully created patient via AI, ID: {result.get('id')}")
+                await invalidation_bus.publish(patient_id=result.get("id"), reason="patient_created")
+                return result
+            else:
+                logger.error(f"Error creating patient via AI: {response.status_code} - {response.text}")
+                return None
                 
-                if response.status_code == 201:
-                    result = response.json()
-                    logger.info(f"Successfully created patient via AI, ID: {result.get('id')}")
-                    return result
-                else:
-                    logger.error(f"Error creating patient via AI: {response.status_code} - {response.text}")
-                    return None
-                    
         except httpx.HTTPError as e:
             logger.error(f"HTTP error creating patient via AI: {str(e)}")
             return None
@@ -108,22 +356,25 @@ class DorraEMRService:
         POST /v1/ai/emr
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/v1/ai/emr",
-                    headers=self.headers,
-                    json={"patient": patient_id, "prompt": prompt},
-                    timeout=15.0
-                )
+            response = await self._request(
+                "POST",
+                "/v1/ai/emr",
+                json={"patient": patient_id, "prompt": prompt},
+                timeout=self.ai_timeout
+            )
+            
+            if response.status_code == 201:
+                result = response.json()
+                logger.info(f"Successfully created EMR record for patient {patient_id}: {result.get('resource')}")
+                # A new encounter changes what this request would read back
+                request_memo.forget(("encounters", patient_id), ("interactions", patient_id))
+                self.encounters.record_created(patient_id)
+                await invalidation_bus.publish(patient_id=patient_id, reason="emr_record_created")
+                return result
+            else:
+                logger.error(f"Error creating AI EMR: {response.status_code} - {response.text}")
+                return None
                 
-                if response.status_code == 201:
-                    result = response.json()
-                    logger.info(f"Successfully created EMR record for patient {patient_id}: {result.get('resource')}")
-                    return result
-                else:
-                    logger.error(f"Error creating AI EMR: {response.status_code} - {response.text}")
-                    return None
-                    
         except httpx.HTTPError as e:
             logger.error(f"HTTP error creating AI EMR: {str(e)}")
             return None
@@ -137,22 +388,23 @@ class DorraEMRService:
         PATCH /v1/patients/{id}
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.patch(
-                    f"{self.base_url}/v1/patients/{patient_id}",
-                    headers=self.headers,
-                    json=patient_data,
-                    timeout=10.0
-                )
+            response = await self._request(
+                "PATCH",
+                f"/v1/patients/{patient_id}",
+                json=patient_data,
+                timeout=self.write_timeout
+            )
+            
+            if response.status_code == 201:
+                result = response.json()
+                logger.info(f"Successfully updated patient {patient_id}")
+                request_memo.forget(("patient", patient_id))
+                await invalidation_bus.publish(patient_id=patient_id, reason="patient_updated")
+                return result
+            else:
+                logger.error(f"Error updating patient {patient_id}: {response.status_code} - {response.text}")
+                return None
                 
-                if response.status_code == 201:
-                    result = response.json()
-                    logger.info(f"Successfully updated patient {patient_id}")
-                    return result
-                else:
-                    logger.error(f"Error updating patient {patient_id}: {response.status_code} - {response.text}")
-                    return None
-                    
         except httpx.HTTPError as e:
             logger.error(f"HTTP error updating patient {patient_id}: {str(e)}")
             return None
@@ -164,29 +416,59 @@ class DorraEMRService:
         """
         Get patient encounters for risk assessment.
         GET /v1/encounters?patient_id={patient_id}
+        Memoized for the current request.
         """
+        return await request_memo.memoized(("encounters", patient_id), lambda: self._load_patient_encounters(patient_id))
+    
+    async def _load_patient_encounters(self, patient_id: int) -> Optional[list]:
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/v1/encounters",
-                    headers=self.headers,
-                    params={"search": str(patient_id)},
-                    timeout=10.0
-                )
+            response = await self._request(
+                "GET",
+                "/v1/encounters",
+                params={"search": str(patient_id)},
+                timeout=self.read_timeout
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                encounters = result.get("results", [])
+                logger.info(f"Retrieved {len(encounters)} encounters for patient {patient_id}")
+                return encounters
+            else:
+                logger.error(f"Error retrieving encounters: {response.status_code} - {response.text}")
+                return []
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    encounters = result.get("results", [])
-                    logger.info(f"Retrieved {len(encounters)} encounters for patient {patient_id}")
-                    return encounters
-                else:
-                    logger.error(f"Error retrieving encounters: {response.status_code} - {response.text}")
-                    return []
-                    
         except Exception as e:
             logger.error(f"Error retrieving encounters for patient {patient_id}: {str(e)}")
             return []
 
+    async def get_drug_interactions(self, patient_id: int) -> Optional[list]:
+        """
+        Get PharmaVigilance drug interactions for a patient, newest first.
+        GET /v1/pharmavigilance/interactions?search={patient_id}
+        Returns None if the API call failed. Memoized for the current request.
+        """
+        return await request_memo.memoized(("interactions", patient_id), lambda: self._load_drug_interactions(patient_id))
+    
+    async def _load_drug_interactions(self, patient_id: int) -> Optional[list]:
+        try:
+            response = await self._request(
+                "GET",
+                "/v1/pharmavigilance/interactions",
+                params={"search": str(patient_id)},
+                timeout=self.read_timeout
+            )
+            
+            if response.status_code == 200:
+                return response.json().get("results", [])
+            else:
+                logger.warning(f"PharmaVigilance API returned {response.status_code}")
+                return None
+                
+        except Exception as e:
+            logger.error(f"PharmaVigilance API error: {e}")
+            return None
+
     async def get_patients(self, search: str = None) -> Optional[Dict[str, Any]]:
         """
         List all patients in your team.
@@ -197,22 +479,21 @@ class DorraEMRService:
             if search:
                 params["search"] = search
                 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/v1/patients",
-                    headers=self.headers,
-                    params=params,
-                    timeout=10.0
-                )
+            response = await self._request(
+                "GET",
+                "/v1/patients",
+                params=params,
+                timeout=self.read_timeout
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                logger.info(f"Successfully retrieved patients list")
+                return result
+            else:
+                logger.error(f"Error retrieving patients: {response.status_code} - {response.text}")
+                return {"results": []}
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    logger.info(f"Successfully retrieved patients list")
-                    return result
-                else:
-                    logger.error(f"Error retrieving patients: {response.status_code} - {response.text}")
-                    return {"results": []}
-                    
         except httpx.HTTPError as e:
             logger.error(f"HTTP error retrieving patients: {str(e)}")
             return {"results": []}
@@ -220,6 +501,65 @@ class DorraEMRService:
             logger.error(f"Unexpected error retrieving patients: {str(e)}")
             return {"results": []}
 
+    async def _iter_pages(self, path: str, params: Optional[Dict[str, str]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield every result of a paginated list endpoint, following the `next`
+        links. The next page is requested while the current one is being
+        consumed. Raises if a page can't be fetched.
+        """
+        async def fetch_page(url: str, params: Optional[Dict[str, str]]) -> Dict[str, Any]:
+            response = await self._request("GET", url, params=params, timeout=self.read_timeout)
+            if response.status_code != 200:
+                raise DorraAPIError(f"{response.status_code} - {response.text}")
+            return response.json()
+        
+        page_task = asyncio.ensure_future(fetch_page(path, params or None))
+        pages = 0
+        try:
+            while page_task is not None:
+                page = await page_task
+                pages += 1
+                next_url = page.get("next")
+                # The query string of `next` already carries our params
+                page_task = asyncio.ensure_future(fetch_page(next_url, None)) if next_url else None
+                for item in page.get("results", []):
+                    yield item
+        finally:
+            if page_task is not None:
+                page_task.cancel()
+            logger.info(f"Read {pages} page(s) of {path}")
+
+    async def iter_patients(self, search: str = None, ordering: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every patient in the team (GET /v1/patients, all pages)."""
+        params = {}
+        if search:
+            params["search"] = search
+        if ordering:
+            params["ordering"] = ordering
+        async with aclosing(self._iter_pages("/v1/patients", params)) as patients:
+            async for patient in patients:
+                yield patient
+
+    async def iter_encounters(self, patient_id: int) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield a patient's encounters newest first (GET /v1/encounters, all pages).
+        Stop iterating early to avoid reading older pages.
+        """
+        params = {"search": str(patient_id), "ordering": "-created_at"}
+        async with aclosing(self._iter_pages("/v1/encounters", params)) as encounters:
+            async for encounter in encounters:
+                # search matches on any field, e.g. patient 1 also finds patient 11
+                owner = encounter.get("patient")
+                if isinstance(owner, dict):
+                    owner = owner.get("id")
+                if owner is not None and str(owner) != str(patient_id):
+                    continue
+                yield encounter
+
+    async def get_recent_encounters(self, patient_id: int, limit: Optional[int] = 10) -> list:
+        """The patient's newest encounters, newest first, from the encounter cache."""
+        return await self.encounters.get(patient_id, limit)
+
     async def log_visit(self, visit_data: Dict[str, Any]) -> bool:
         """
         Log a visit using AI EMR endpoint.
@@ -236,4 +576,5 @@ class DorraEMRService:
         return result is not None
 
 dorra_emr = DorraEMRService()
+invalidation_bus.subscribe(dorra_emr.encounters.handle_invalidation)
 
@@ -0,0 +1,138 @@
+"""
+Offline pregnancy drug-safety knowledge base.
+
+Loaded once from a versioned JSON file (app/data/drug_safety_kb.json unless
+DRUG_KB_PATH says otherwise). Each generic drug has a default answer and
+optional overrides per gestational band (app.core.logic), plus pairwise
+cautions between drugs. Answers are resolved for every band at load time,
+so a lookup is a dictionary read. Entries marked "confident" are complete
+enough to answer a single-drug check without Gemini. A name only matches
+exactly (generic name or alias, optionally followed by a strength or
+form); combinations like "tramadol/paracetamol" are not known.
+"""
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logic import GESTATIONAL_BANDS, gestational_band
+
+logger = logging.getLogger(__name__)
+
+# Risk categories from least to most restrictive
+RISK_HIERARCHY = {"Safe": 0, "Caution": 1, "High Risk": 2, "Contraindicated": 3}
+
+BUNDLED_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "drug_safety_kb.json")
+
+# Trailing strengths and dosage forms, e.g. " 500mg tablet" or " 125 mg/5ml suspension"
+_STRENGTH_OR_FORM = re.compile(
+    r"(?:[\s,]+(?:\d+(?:\.\d+)?\s*(?:mg|mcg|g|ml|iu|units?|%)?(?:\s*/\s*\d*(?:\.\d+)?\s*(?:ml|l))?"
+    r"|tablets?|tabs?|caplets?|capsules?|caps?|syrup|suspension|solution|injection|inj|drops"
+    r"|cream|gel|ointment|suppositor(?:y|ies)|pessar(?:y|ies)|inhaler|sachets?|oral))+$"
+)
+
+
+class DrugKnowledgeBase:
+    def __init__(self, data: Dict[str, Any]):
+        """Build from the parsed file; raises ValueError if an entry is malformed."""
+        self.version = str(data["version"])
+        self.source = f"Drug safety knowledge base v{self.version}"
+        # Lowercased generic name or alias -> {band: answer}
+        self._answers: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._interactions: Dict[frozenset, Dict[str, Any]] = {}
+
+        for name, entry in data.get("drugs", {}).items():
+            answers = {"default": self._answer(name, entry, entry["default"])}
+            for band, override in entry.get("bands", {}).items():
+                answers[band] = self._answer(name, entry, {**entry["default"], **override})
+            for _, _, band in GESTATIONAL_BANDS:
+                answers.setdefault(band, answers["default"])
+            answers["post-term"] = answers["term"]
+            # An unknown week gets the most restrictive answer across bands
+            answers["unknown"] = max(answers.values(), key=lambda a: RISK_HIERARCHY[a["risk_category"]])
+            for key in [name] + entry.get("aliases", []):
+                self._answers[key.lower()] = answers
+
+        for interaction in data.get("interactions", []):
+            drug_a, drug_b = (d.lower() for d in interaction["drugs"])
+            if interaction["risk_category"] not in RISK_HIERARCHY:
+                raise ValueError(f"Unknown risk category for {drug_a}/{drug_b}: {interaction['risk_category']}")
+            self._interactions[frozenset((self._canonical(drug_a), self._canonical(drug_b)))] = {
+                "drugs": list(interaction["drugs"]),
+                "risk_category": interaction["risk_category"],
+                "message": interaction["message"],
+            }
+
+    @staticmethod
+    def _answer(name: str, entry: Dict[str, Any], fields: Dict[str, Any]) -> Dict[str, Any]:
+        if fields.get("risk_category") not in RISK_HIERARCHY:
+            raise ValueError(f"Unknown risk category for {name}: {fields.get('risk_category')}")
+        return {
+            "name": name,
+            "risk_category": fields["risk_category"],
+            "message": fields["message"],
+            "alternatives": list(fields.get("alternatives", [])),
+            "is_safe": fields["risk_category"] == "Safe",
+            "confident": bool(entry.get("confident", False)),
+        }
+
+    @classmethod
+    def load(cls, path: str) -> "DrugKnowledgeBase":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _find(self, drug_name: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        drug_lower = (drug_name or "").lower().strip()
+        if not drug_lower:
+            return None
+        answers = self._answers.get(drug_lower)
+        if answers is None:
+            # Names with a strength or form attached, e.g. "paracetamol 500mg"
+            answers = self._answers.get(_STRENGTH_OR_FORM.sub("", drug_lower))
+        return answers
+
+    def _canonical(self, drug_name: str) -> str:
+        answers = self._find(drug_name)
+        return answers["default"]["name"].lower() if answers else drug_name.lower().strip()
+
+    def lookup(self, drug_name: str, gestational_week: int = 0) -> Optional[Dict[str, Any]]:
+        """
+        The answer for a drug at this week: name, risk_category, message,
+        alternatives, is_safe and confident. None if the drug isn't known.
+        """
+        answers = self._find(drug_name)
+        if answers is None:
+            return None
+        answer = answers.get(gestational_band(gestational_week), answers["default"])
+        return dict(answer, alternatives=list(answer["alternatives"]))
+
+    def interactions(self, drug_names: List[str]) -> List[Dict[str, Any]]:
+        """Known cautions between any two of the drugs, as {drugs, risk_category, message}."""
+        names = list(dict.fromkeys(self._canonical(d) for d in drug_names if d))
+        found = []
+        for i, drug_a in enumerate(names):
+            for drug_b in names[i + 1:]:
+                caution = self._interactions.get(frozenset((drug_a, drug_b)))
+                if caution is not None:
+                    found.append(dict(caution))
+        return found
+
+    def __len__(self) -> int:
+        return len({id(answers) for answers in self._answers.values()})
+
+
+def load_knowledge_base(path: Optional[str] = None) -> DrugKnowledgeBase:
+    """The configured knowledge base, or an empty one (everything goes to Gemini) if it can't be read."""
+    path = path or settings.DRUG_KB_PATH or BUNDLED_PATH
+    try:
+        kb = DrugKnowledgeBase.load(path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.error(f"Drug safety knowledge base unavailable at {path}: {e}")
+        return DrugKnowledgeBase({"version": "empty"})
+    logger.info(f"Loaded drug safety knowledge base v{kb.version} ({len(kb)} drugs)")
+    return kb
+
+
+drug_knowledge = load_knowledge_base()
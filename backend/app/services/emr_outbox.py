@@ -0,0 +1,152 @@
+"""
+Write-behind outbox for EMR records.
+
+Endpoints add an EmrOutbox row in their own database session and respond
+straight away; background workers send the rows to Dorra's AI EMR
+endpoint. Rows for the same patient are sent in the order they were
+queued, failed sends are retried with exponential backoff and rows that
+keep failing are marked dead. A worker claims a row by leasing it (pushing
+next_attempt_at out by EMR_OUTBOX_LEASE) in a short transaction, so no
+row lock or transaction is held while Dorra answers; if the worker dies
+mid-send the lease runs out and the row is sent again.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.outbox import EmrOutbox
+from app.services.dorra_emr import dorra_emr
+
+logger = logging.getLogger(__name__)
+
+
+def claim_next_statement():
+    """
+    The oldest due pending row whose patient has no earlier pending row,
+    locked for this worker; rows being claimed by other workers are skipped.
+    """
+    earlier = aliased(EmrOutbox)
+    return (
+        select(EmrOutbox)
+        .where(
+            EmrOutbox.status == "pending",
+            EmrOutbox.next_attempt_at <= func.now(),
+            ~exists().where(
+                earlier.patient_id == EmrOutbox.patient_id,
+                earlier.status == "pending",
+                earlier.id < EmrOutbox.id,
+            ),
+        )
+        .order_by(EmrOutbox.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def record_result(row: EmrOutbox, result: Optional[Dict[str, Any]], now: datetime):
+    """Mark a row done, or schedule its retry / dead-letter it after a failed send."""
+    row.attempts = (row.attempts or 0) + 1
+    if result is not None:
+        row.status = "done"
+        # /v1/ai/emr answers with a PropmtResponse, which names what it created
+        row.dorra_id = result.get("resource_id")
+        row.completed_at = now
+        row.last_error = None
+        return
+    row.last_error = "Dorra AI EMR request failed"
+    if row.attempts >= settings.EMR_OUTBOX_MAX_ATTEMPTS:
+        row.status = "dead"
+        logger.error(f"EMR outbox row {row.id} for patient {row.patient_id} dead after {row.attempts} attempts")
+    else:
+        delay = min(settings.EMR_OUTBOX_RETRY_MAX, settings.EMR_OUTBOX_RETRY_BASE * 2 ** (row.attempts - 1))
+        row.next_attempt_at = now + timedelta(seconds=delay)
+
+
+class EmrOutboxService:
+    def __init__(self):
+        self.enabled = settings.EMR_OUTBOX_ENABLED
+        self._wake = asyncio.Event()
+
+    async def enqueue(self, db: AsyncSession, patient_id: int, prompt: str, source: str) -> EmrOutbox:
+        """Add a row to db; it is sent once the caller commits."""
+        row = EmrOutbox(patient_id=patient_id, prompt=prompt, source=source, status="pending", attempts=0)
+        db.add(row)
+        await db.flush()
+        return row
+
+    async def submit(self, db: AsyncSession, patient_id: int, prompt: str, source: str) -> Dict[str, Any]:
+        """
+        Queue an EMR record and commit. If the outbox is disabled or the
+        database is unavailable the record is written to Dorra inline.
+        Returns {"queued": bool, "outbox_id": int | None, "result": Dorra response | None}.
+        """
+        if self.enabled:
+            try:
+                row = await self.enqueue(db, patient_id, prompt, source)
+                await db.commit()
+                self._wake.set()
+                return {"queued": True, "outbox_id": row.id, "result": None}
+            except Exception as e:
+                await db.rollback()
+                logger.warning(f"EMR outbox unavailable, writing to Dorra inline: {e}")
+        result = await dorra_emr.create_ai_emr(patient_id, prompt)
+        return {"queued": False, "outbox_id": None, "result": result}
+
+    async def claim_next(self) -> Optional[Tuple[int, int, str]]:
+        """Lease the next due row; returns (id, patient_id, prompt), or None if nothing is due."""
+        async with SessionLocal() as db:
+            row = (await db.execute(claim_next_statement())).scalars().first()
+            if row is None:
+                return None
+            # Still pending, so the patient's later rows keep waiting behind it
+            row.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=settings.EMR_OUTBOX_LEASE)
+            claimed = (row.id, row.patient_id, row.prompt)
+            await db.commit()
+            return claimed
+
+    async def process_next(self) -> bool:
+        """Send one due row to Dorra. Returns False if there was nothing to send."""
+        claimed = await self.claim_next()
+        if claimed is None:
+            return False
+        row_id, patient_id, prompt = claimed
+        result = await dorra_emr.create_ai_emr(patient_id, prompt)
+        async with SessionLocal() as db:
+            row = await db.get(EmrOutbox, row_id)
+            if row is not None:
+                record_result(row, result, datetime.now(timezone.utc))
+                await db.commit()
+        return True
+
+    async def _worker(self, name: int, poll_interval: float):
+        while True:
+            try:
+                if await self.process_next():
+                    continue
+            except Exception as e:
+                logger.error(f"EMR outbox worker {name} failed: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, workers: int, poll_interval: float):
+        """Drain the outbox with a pool of workers until cancelled."""
+        await asyncio.gather(*(self._worker(i, poll_interval) for i in range(workers)))
+
+    async def stats(self) -> Dict[str, int]:
+        """Row counts per status."""
+        async with SessionLocal() as db:
+            rows = await db.execute(select(EmrOutbox.status, func.count(EmrOutbox.id)).group_by(EmrOutbox.status))
+            return {status: count for status, count in rows.all()}
+
+
+emr_outbox = EmrOutboxService()
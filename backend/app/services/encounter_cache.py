@@ -0,0 +1,102 @@
+"""
+Per-patient cache of the newest encounters.
+
+Each patient keeps a bounded newest-first deque. A refresh reads Dorra
+newest-first and stops at the first encounter it already holds, so it
+costs one short page however long the history is. Creating an encounter
+only marks the patient stale: Dorra's /v1/ai/emr answers with a summary
+(resource, resource_id, message), not the encounter itself, so the next
+read fetches it like any other new one.
+"""
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
+
+from app.core.cache import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+NEVER = float("-inf")  # checked_at of a history that must be re-checked
+
+EncounterSource = Callable[[int], AsyncIterator[Dict[str, Any]]]
+
+
+class _History:
+    __slots__ = ("encounters", "checked_at")
+
+    def __init__(self, depth: int):
+        self.encounters: Deque[Dict[str, Any]] = deque(maxlen=depth)  # newest first
+        self.checked_at = NEVER
+
+
+class EncounterCache:
+    def __init__(self, source: EncounterSource, depth: int, max_patients: int, refresh_after: float, clock=time.time):
+        self.source = source
+        self.depth = depth
+        self.max_patients = max_patients
+        self.refresh_after = refresh_after
+        self.clock = clock
+        self._patients: "OrderedDict[int, _History]" = OrderedDict()  # LRU order
+        self._flights = SingleFlight()
+
+    def __len__(self) -> int:
+        return len(self._patients)
+
+    async def get(self, patient_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Newest-first encounters, checking Dorra for newer ones if the copy is older than refresh_after."""
+        history = self._patients.get(patient_id)
+        if history is None or self.clock() - history.checked_at >= self.refresh_after:
+            try:
+                await self._flights.do(f"encounters_{patient_id}", lambda: self._refresh(patient_id))
+            except Exception as e:
+                logger.error(f"Error refreshing encounters for patient {patient_id}: {e}")
+            history = self._patients.get(patient_id)
+        if history is None:
+            return []
+        self._patients.move_to_end(patient_id)
+        encounters = list(history.encounters)
+        return encounters[:limit] if limit is not None else encounters
+
+    async def _refresh(self, patient_id: int):
+        history = self._patients.get(patient_id)
+        known = {e.get("id") for e in history.encounters if e.get("id") is not None} if history else set()
+
+        newer = []
+        async with aclosing(self.source(patient_id)) as encounters:
+            async for encounter in encounters:
+                if encounter.get("id") in known or len(newer) >= self.depth:
+                    break
+                newer.append(encounter)
+
+        if history is None or len(newer) >= self.depth:
+            # New patient, or the gap is bigger than what we keep
+            history = _History(self.depth)
+            history.encounters.extend(newer)
+        else:
+            history.encounters.extendleft(reversed(newer))
+        history.checked_at = self.clock()
+        self._store(patient_id, history)
+        logger.info(f"Encounter cache: {len(newer)} new encounter(s) for patient {patient_id}")
+
+    def _store(self, patient_id: int, history: _History):
+        self._patients[patient_id] = history
+        self._patients.move_to_end(patient_id)
+        while len(self._patients) > self.max_patients:
+            self._patients.popitem(last=False)
+
+    def record_created(self, patient_id: int):
+        """We just created a record for this patient: the next read checks Dorra."""
+        history = self._patients.get(patient_id)
+        if history is not None:
+            history.checked_at = NEVER
+
+    def handle_invalidation(self, event: Dict[str, Any], local: bool):
+        # Webhooks, other workers and our own writes: check Dorra on next read
+        patient_id = event.get("patient_id")
+        if patient_id in self._patients:
+            self._patients[patient_id].checked_at = NEVER
+
+    def clear(self):
+        self._patients.clear()
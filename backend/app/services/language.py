@@ -1,18 +1,17 @@
-import google.generativeai as genai
-from typing import Dict, Optional
-from app.core.config import settings
+import asyncio
+from typing import List
+from app.core import deadline
+from app.services.llm import create_model, generate
+
+LANGUAGE_NAMES = {"en": "English", "yo": "Yoruba", "ig": "Igbo", "ha": "Hausa"}
 
 class LanguageService:
     def __init__(self):
-        if settings.GEMINI_API_KEY:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
-        else:
-            self.model = None
+        self.model = create_model()
 
-    def detect_language(self, text: str) -> str:
+    async def detect_language(self, text: str) -> str:
         """Detect if text is in Yoruba, Igbo, Hausa, or English"""
-        if not self.model:
+        if not self.model or deadline.expired():
             return "en"
         
         prompt = f"""Detect the language of this text: "{text}"
@@ -26,45 +25,44 @@ class LanguageService:
         Return only the language code, nothing else."""
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip().lower()
-        except:
+            return (await generate(self.model, prompt)).strip().lower()
+        except Exception:
             return "en"
 
-    def translate_to_english(self, text: str, source_lang: str) -> str:
+    async def translate_to_english(self, text: str, source_lang: str) -> str:
         """Translate from local language to English"""
-        if source_lang == "en" or not self.model:
+        if source_lang == "en" or not self.model or deadline.expired():
             return text
             
-        lang_names = {"yo": "Yoruba", "ig": "Igbo", "ha": "Hausa"}
-        lang_name = lang_names.get(source_lang, "the local language")
+        lang_name = LANGUAGE_NAMES.get(source_lang, "the local language")
         
         prompt = f"""Translate this {lang_name} text to English: "{text}"
         
         Return only the English translation, nothing else."""
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except:
+            return (await generate(self.model, prompt, store_if=bool)).strip()
+        except Exception:
             return text
 
-    def translate_from_english(self, text: str, target_lang: str) -> str:
+    async def translate_many_from_english(self, texts: List[str], target_lang: str) -> List[str]:
+        """Translate several texts concurrently, keeping their order"""
+        return list(await asyncio.gather(*(self.translate_from_english(t, target_lang) for t in texts)))
+
+    async def translate_from_english(self, text: str, target_lang: str) -> str:
         """Translate from English to local language"""
-        if target_lang == "en" or not self.model:
+        if target_lang == "en" or not self.model or deadline.expired():
             return text
             
-        lang_names = {"yo": "Yoruba", "ig": "Igbo", "ha": "Hausa"}
-        lang_name = lang_names.get(target_lang, "the local language")
+        lang_name = LANGUAGE_NAMES.get(target_lang, "the local language")
         
         prompt = f"""Translate this English text to {lang_name}: "{text}"
         
         Return only the {lang_name} translation, nothing else."""
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except:
+            return (await generate(self.model, prompt, store_if=bool)).strip()
+        except Exception:
             return text
 
 language_service = LanguageService()
\ No newline at end of file
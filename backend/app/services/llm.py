@@ -0,0 +1,153 @@
+"""
+Generative model construction and non-blocking calls.
+
+LLM_BACKEND=fake swaps Gemini for the stand-in model in app/standin so
+load tests don't spend tokens. `generate` runs a call off the event loop
+(on a bounded thread pool, or the SDK's async API with LLM_ASYNC_SDK)
+with a per-call timeout, so slow model calls don't stall other requests.
+Callers whose prompts repeat can opt in to the on-disk response store
+(app.core.llm_store, enabled by LLM_STORE_PATH).
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import google.generativeai as genai
+
+from app.core import deadline
+from app.core.config import settings
+from app.core.llm_store import LLMResponseStore
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini-2.5-flash"
+
+# One fake shared by every service, so its rate limit acts like a per-key quota
+_fake_model = None
+
+_executor: Optional[ThreadPoolExecutor] = None
+_store: Optional[LLMResponseStore] = None
+_store_disabled = False  # set once the store failed to open, so it isn't retried on every call
+
+counters: Dict[str, int] = {"calls": 0, "in_flight": 0, "timeouts": 0, "errors": 0, "store_hits": 0}
+
+
+def create_model(model_name: str = MODEL_NAME) -> Optional[Any]:
+    """The configured model, or None if no LLM backend is configured."""
+    global _fake_model
+    if settings.LLM_BACKEND == "fake":
+        if _fake_model is None:
+            from app.standin.fakes import FakeGenerativeModel
+            _fake_model = FakeGenerativeModel(model_name)
+        return _fake_model
+    if not settings.GEMINI_API_KEY:
+        return None
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    return genai.GenerativeModel(model_name)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+    return _executor
+
+
+def get_store() -> Optional[LLMResponseStore]:
+    """The shared response store, or None if LLM_STORE_PATH isn't set or it can't be opened."""
+    global _store, _store_disabled
+    if _store is None and settings.LLM_STORE_PATH and not _store_disabled:
+        try:
+            _store = LLMResponseStore(
+                settings.LLM_STORE_PATH,
+                ttl=settings.LLM_STORE_TTL,
+                max_entries=settings.LLM_STORE_MAX_ENTRIES,
+                max_bytes=settings.LLM_STORE_MAX_BYTES
+            )
+        except Exception as e:
+            logger.error(f"LLM response store unavailable at {settings.LLM_STORE_PATH}: {e}")
+            _store_disabled = True
+    return _store
+
+
+def model_name(model: Any) -> str:
+    return getattr(model, "model_name", None) or type(model).__name__
+
+
+async def generate(model: Any, prompt: str, timeout: Optional[float] = None, store_if: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Run model.generate_content(prompt) without blocking the event loop and
+    return the response text. Raises asyncio.TimeoutError after `timeout`
+    seconds (LLM_TIMEOUT by default), or sooner if the request deadline
+    comes first. A call still queued for the pool is dropped when its
+    caller is cancelled or times out; one already running finishes in its
+    thread but its result is discarded.
+
+    With store_if the response store is read first, and a fresh response
+    is saved to it if store_if(text) is true. Store reads and writes run
+    in a worker thread, since SQLite may wait on another process's lock.
+    """
+    store = get_store() if store_if is not None else None
+    if store is not None:
+        try:
+            text = await asyncio.to_thread(store.get, model_name(model), prompt)
+        except Exception as e:
+            logger.warning(f"LLM response store read failed: {e}")
+            text = None
+        if text is not None:
+            counters["store_hits"] += 1
+            return text
+
+    text = await _call(model, prompt, timeout)
+    if store is not None and store_if(text):
+        try:
+            await asyncio.to_thread(store.put, model_name(model), prompt, text)
+        except Exception as e:
+            logger.warning(f"LLM response store write failed: {e}")
+    return text
+
+
+async def _call(model: Any, prompt: str, timeout: Optional[float]) -> str:
+    # Never wait past the request deadline; raises DeadlineExceeded once it has passed
+    timeout = deadline.clamp(settings.LLM_TIMEOUT if timeout is None else timeout)
+    if settings.LLM_ASYNC_SDK and hasattr(model, "generate_content_async"):
+        call = model.generate_content_async(prompt)
+    else:
+        call = asyncio.get_running_loop().run_in_executor(_get_executor(), model.generate_content, prompt)
+
+    counters["calls"] += 1
+    counters["in_flight"] += 1
+    try:
+        response = await asyncio.wait_for(call, timeout)
+        return response.text
+    except asyncio.TimeoutError:
+        counters["timeouts"] += 1
+        logger.warning(f"LLM call timed out after {timeout}s")
+        raise
+    except Exception:
+        counters["errors"] += 1
+        raise
+    finally:
+        counters["in_flight"] -= 1
+
+
+def llm_stats() -> Dict[str, Any]:
+    store = get_store()
+    return {
+        **counters,
+        "max_concurrency": settings.LLM_MAX_CONCURRENCY,
+        "timeout": settings.LLM_TIMEOUT,
+        "store": store.stats() if store is not None else None,
+    }
+
+
+def shutdown():
+    """Stop the thread pool, dropping calls that haven't started, and close the store."""
+    global _executor, _store
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    if _store is not None:
+        _store.close()
+        _store = None
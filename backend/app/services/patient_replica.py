@@ -0,0 +1,290 @@
+"""
+Local Postgres replica of the Dorra EMR patient roster.
+
+A periodic job pulls patients changed since the newest `updated_at` we hold
+(and does a full resync every PATIENT_REPLICA_FULL_SYNC_INTERVAL, which also
+drops patients that disappeared from Dorra). Every worker runs the job, but
+a Postgres advisory lock lets only one of them sync at a time. Dorra is
+read first and the rows written in one short transaction afterwards. Our own
+writes publish on the invalidation bus and refresh the affected row
+straight away.
+Roster reads and search run locally; callers fall back to Dorra when the
+replica is disabled, not populated yet or unreachable.
+"""
+import asyncio
+import logging
+import re
+import time
+from contextlib import aclosing
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from sqlalchemy import Select, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.invalidation import invalidation_bus
+from app.db.session import SessionLocal, engine
+from app.models.patient import PatientReplica
+from app.services.dorra_emr import dorra_emr
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_phone(phone: Optional[str]) -> str:
+    """
+    Digits only, Nigerian numbers in international form: "0803 123 4567" ->
+    "2348031234567". Partial numbers are converted the same way ("0803" ->
+    "234803") so they can be matched as prefixes.
+    """
+    digits = re.sub(r"\D", "", phone or "")
+    if digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0"):
+        digits = "234" + digits[1:]
+    return digits
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def replica_row(patient: Dict[str, Any], synced_at: datetime) -> Dict[str, Any]:
+    """Column values for a Dorra patient record."""
+    first_name = patient.get("first_name") or ""
+    last_name = patient.get("last_name") or ""
+    return {
+        "id": int(patient["id"]),
+        "first_name": first_name,
+        "last_name": last_name,
+        "full_name": patient.get("full_name") or f"{first_name} {last_name}".strip(),
+        "phone_number": patient.get("phone_number") or "",
+        "phone_normalized": normalize_phone(patient.get("phone_number")),
+        "email": patient.get("email") or "",
+        "data": patient,
+        "updated_at": _parse_time(patient.get("updated_at")),
+        "synced_at": synced_at,
+    }
+
+
+class PatientReplicaService:
+    UPSERT_BATCH = 500
+    # pg_try_advisory_lock key held by the worker that is syncing
+    SYNC_LOCK_ID = 0x4D534652
+
+    def __init__(self):
+        self.enabled = settings.PATIENT_REPLICA_ENABLED
+        # Reads are served locally once the replica holds data
+        self.ready = False
+        self.last_sync: Optional[float] = None
+        self._refreshes: Dict[int, asyncio.Task] = {}
+
+    async def _upsert(self, db, rows: List[Dict[str, Any]]):
+        stmt = insert(PatientReplica).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PatientReplica.id],
+            set_={column: stmt.excluded[column] for column in rows[0] if column != "id"}
+        )
+        await db.execute(stmt)
+
+    async def sync(self, full: bool = False) -> int:
+        """
+        Pull changed patients from Dorra into the replica. Incremental syncs
+        read newest-first and stop at the newest updated_at already stored
+        (see _read_dorra). Dorra is read before any write, so the upsert
+        is one short transaction. Returns the number of patients written;
+        0 if another worker is syncing right now.
+        """
+        async with engine.connect() as lock_conn:
+            # A session-level lock on this otherwise idle connection: no
+            # transaction stays open while Dorra is read, and the lock goes
+            # with the connection if the worker dies
+            locked = await lock_conn.scalar(select(func.pg_try_advisory_lock(self.SYNC_LOCK_ID)))
+            await lock_conn.commit()
+            if not locked:
+                async with SessionLocal() as db:
+                    self.ready = self.ready or bool(await db.scalar(select(func.count(PatientReplica.id))))
+                logger.info("Patient replica sync skipped, another worker is syncing")
+                return 0
+            try:
+                written = await self._sync_locked(full)
+            finally:
+                await lock_conn.scalar(select(func.pg_advisory_unlock(self.SYNC_LOCK_ID)))
+                await lock_conn.commit()
+
+        self.last_sync = time.time()
+        logger.info(f"Patient replica {'full' if full else 'incremental'} sync wrote {written} patients")
+        return written
+
+    async def _sync_locked(self, full: bool) -> int:
+        started = datetime.now(timezone.utc)
+        watermark = None
+        if not full:
+            async with SessionLocal() as db:
+                watermark = await db.scalar(select(func.max(PatientReplica.updated_at)))
+
+        rows = await self._read_dorra(watermark, started)
+
+        async with SessionLocal() as db:
+            for i in range(0, len(rows), self.UPSERT_BATCH):
+                await self._upsert(db, rows[i:i + self.UPSERT_BATCH])
+            if full:
+                # Every patient still in Dorra was just touched
+                await db.execute(delete(PatientReplica).where(PatientReplica.synced_at < started))
+            await db.commit()
+            self.ready = self.ready or bool(rows) or bool(await db.scalar(select(func.count(PatientReplica.id))))
+        return len(rows)
+
+    async def _read_dorra(self, watermark: Optional[datetime], started: datetime) -> List[Dict[str, Any]]:
+        """
+        Replica rows for every patient, or with a watermark only those
+        changed since. The incremental read asks for newest-first and stops
+        at the first older patient, but only while what it has read is in
+        that order; if Dorra ignored the ordering it reads every page.
+        """
+        rows: Dict[int, Dict[str, Any]] = {}  # by id: a patient may move pages mid-read
+        in_order = True
+        previous = None
+        patients = dorra_emr.iter_patients(ordering=None if watermark is None else "-updated_at")
+        # aclosing stops the prefetch of the next page when we stop early
+        async with aclosing(patients):
+            async for patient in patients:
+                if not patient.get("id"):
+                    continue
+                row = replica_row(patient, started)
+                updated_at = row["updated_at"]
+                if watermark is not None and updated_at is not None:
+                    if previous is not None and updated_at > previous:
+                        in_order = False
+                    if in_order and previous is not None and updated_at < watermark:
+                        break
+                    previous = updated_at
+                rows[row["id"]] = row
+        if not in_order:
+            logger.warning("Dorra did not order patients by updated_at, incremental sync read every page")
+        return list(rows.values())
+
+    async def refresh_patient(self, patient_id: int):
+        """Re-read one patient from Dorra, e.g. right after we changed it."""
+        patient = await dorra_emr.get_patient(patient_id)
+        if patient is None:
+            return
+        async with SessionLocal() as db:
+            await self._upsert(db, [replica_row({"id": patient_id, **patient}, datetime.now(timezone.utc))])
+            await db.commit()
+
+    def handle_invalidation(self, event: Dict[str, Any], local: bool):
+        # Workers share the database, so only the worker that made the change refreshes
+        patient_id = event.get("patient_id")
+        if not self.enabled or not local or patient_id is None or patient_id in self._refreshes:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        async def refresh():
+            try:
+                await self.refresh_patient(patient_id)
+            except Exception as e:
+                logger.warning(f"Replica refresh failed for patient {patient_id}: {e}")
+            finally:
+                self._refreshes.pop(patient_id, None)
+
+        self._refreshes[patient_id] = loop.create_task(refresh())
+
+    async def run(self, interval: float, full_interval: float):
+        """Sync every interval seconds (full resync every full_interval) until cancelled."""
+        last_full = 0.0
+        while True:
+            full = time.time() - last_full >= full_interval
+            try:
+                await self.sync(full=full)
+                if full:
+                    last_full = time.time()
+            except Exception as e:
+                logger.error(f"Patient replica sync failed: {e}")
+                if not self.ready:
+                    # Dorra may be down: still serve whatever an earlier run stored
+                    try:
+                        async with SessionLocal() as db:
+                            self.ready = bool(await db.scalar(select(func.count(PatientReplica.id))))
+                    except Exception:
+                        pass
+            await asyncio.sleep(interval)
+
+    @property
+    def serving(self) -> bool:
+        return self.enabled and self.ready
+
+    async def get_patient(self, patient_id: int) -> Optional[Dict[str, Any]]:
+        """The replica's copy of a patient, or None if we don't hold it."""
+        async with SessionLocal() as db:
+            return await db.scalar(select(PatientReplica.data).where(PatientReplica.id == patient_id))
+
+    def search_statement(self, search: Optional[str] = None) -> Select:
+        """
+        The roster, or the patients matching search: a phone prefix when the
+        query is a local or international number, a phone substring for
+        other digits, otherwise a trigram name match.
+        """
+        stmt = select(PatientReplica.data)
+        if not search:
+            return stmt.order_by(PatientReplica.id)
+        phone = normalize_phone(search)
+        if phone and not re.search(r"[A-Za-z]", search):
+            if phone.startswith("234"):
+                match = PatientReplica.phone_normalized.startswith(phone)
+            else:
+                match = PatientReplica.phone_normalized.contains(phone)
+            return stmt.where(match).order_by(PatientReplica.id)
+        # autoescape: % and _ in the query are matched literally
+        return stmt.where(PatientReplica.full_name.icontains(search, autoescape=True)).order_by(
+            func.similarity(PatientReplica.full_name, search).desc()
+        )
+
+    async def iter_patients(self, search: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the roster, or the patients matching search (see search_statement)."""
+        stmt = self.search_statement(search)
+        async with SessionLocal() as db:
+            result = await db.stream_scalars(stmt.execution_options(yield_per=self.UPSERT_BATCH))
+            async for data in result:
+                yield data
+
+    async def lookup_patient(self, patient_id: int) -> Optional[Dict[str, Any]]:
+        """A patient from the replica when it's serving, otherwise (or if missing) from Dorra."""
+        if self.serving:
+            try:
+                patient = await self.get_patient(patient_id)
+                if patient is not None:
+                    return patient
+            except Exception as e:
+                logger.warning(f"Patient replica unavailable, reading patient {patient_id} from Dorra: {e}")
+        return await dorra_emr.get_patient(patient_id)
+
+    async def iter_roster(self, search: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """The roster (or search results) from the replica when it's serving, otherwise from Dorra."""
+        if self.serving:
+            yielded = 0
+            try:
+                async for patient in self.iter_patients(search):
+                    yielded += 1
+                    yield patient
+                return
+            except Exception as e:
+                # Only switch source if nothing was sent yet
+                if yielded:
+                    raise
+                logger.warning(f"Patient replica unavailable, reading roster from Dorra: {e}")
+        async for patient in dorra_emr.iter_patients(search=search):
+            yield patient
+
+
+patient_replica = PatientReplicaService()
+invalidation_bus.subscribe(patient_replica.handle_invalidation)
@@ -1,152 +1,486 @@
+import asyncio
 import logging
-import httpx
 import json
-import google.generativeai as genai
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Tuple
+from app.core import deadline
+from app.core.cache import cache
 from app.core.config import settings
+from app.core.logic import gestational_band
+from app.core.pipeline import Pipeline
+from app.services.drug_knowledge import RISK_HIERARCHY, drug_knowledge
 from app.services.normalization import drug_normalization
-from app.services.language import language_service
+from app.services.language import LANGUAGE_NAMES, language_service
 from app.services.risk_scoring import risk_scoring_service
 from app.services.dorra_emr import dorra_emr
+from app.services.llm import create_model, generate
 
 logger = logging.getLogger(__name__)
 
+
+def _parse_model_json(text: str) -> Any:
+    return json.loads(text.replace('```json', '').replace('```', '').strip())
+
+
+def _is_model_json(text: str) -> bool:
+    """Whether a response parses as a JSON object, i.e. is worth keeping in the response store"""
+    try:
+        return isinstance(_parse_model_json(text), dict)
+    except ValueError:
+        return False
+
 class HybridSafetyService:
     def __init__(self):
-        self.dorra_api_url = settings.DORRA_API_URL
         self.dorra_api_key = settings.DORRA_API_KEY
-        self.headers = {
-            "Authorization": f"Token {self.dorra_api_key}",
-            "Content-Type": "application/json"
-        }
         
         # Initialize Gemini AI
-        if settings.GEMINI_API_KEY:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            self.gemini_model = genai.GenerativeModel('gemini-2.5-flash')
-        else:
-            self.gemini_model = None
+        self.gemini_model = create_model()
 
-    async def check_medication(self, drug_name: str, gestational_week: int, symptoms: Optional[List[str]] = None, patient_id: Optional[int] = None, language: str = "en", additional_drugs: Optional[List[str]] = None) -> Dict[str, Any]:
+    async def check_medication(self, drug_name: str, gestational_week: int, symptoms: Optional[List[str]] = None, patient_id: Optional[int] = None, language: str = "en", additional_drugs: Optional[List[str]] = None, on_stage: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
         """
         HYBRID MEDICATION SAFETY CHECK:
         1. PharmaVigilance API for real drug interaction data
         2. Gemini 2.5 Flash for AI-powered clinical analysis
         3. Combined intelligence for ultimate safety assessment
+
+        The patient-independent part of the answer is cached in the drug
+        safety tier; "cache_status" on the result is hit, miss, coalesced,
+        stale or bypass.
+
+        language may be "auto" to detect it from the request. With
+        LLM_FUSED_MULTILINGUAL a single-drug check that isn't known to be
+        English is detected, analysed and answered in one model call;
+        otherwise (or if that call fails) the request is translated,
+        analysed in English and the answer translated back. "language" on
+        the result is the language it is written in.
+
+        With DRUG_KB_FAST_PATH, single-drug checks the offline knowledge
+        base (app.services.drug_knowledge) is confident about are answered
+        from it, even without Dorra or Gemini configured. Drug names are
+        looked up as given, so no translation is needed to find them;
+        English (or "auto" without symptoms to detect from) is answered
+        without calling Gemini, other languages get the answer translated.
+
+        Stages run as a dependency graph (app.core.pipeline); with
+        DEBUG_STAGE_TIMINGS the result carries a per-stage "timings" breakdown.
+        on_stage(name, result) is called as "analysis", "risk_profile" and
+        "personalize" finish.
+
+        Within a request deadline (app.core.deadline) each upstream call
+        gets what is left of the budget, optional steps are skipped once it
+        runs out, and if the analysis can't finish in time the rule-based
+        answer from _default_safety_analysis is returned.
         """
-        # 1. Handle Multi-Language Input
-        if language != "en":
-            drug_name = language_service.translate_to_english(drug_name, language)
-            if symptoms:
-                symptoms = [language_service.translate_to_english(s, language) for s in symptoms]
-        
-        # 2. Normalize Drug Name
-        normalized_name = drug_normalization.normalize(drug_name)
-        
-        if not self.dorra_api_key:
+        # The knowledge base needs neither Dorra nor Gemini, so it goes first
+        known = self._knowledge_answer(drug_normalization.normalize(drug_name), gestational_week, additional_drugs)
+        if not self.dorra_api_key and known is None:
+            english_name, _, _ = await self._translate_request(drug_name, symptoms, language)
             return {
-                "name": normalized_name,
+                "name": drug_normalization.normalize(english_name),
                 "risk_category": "Unknown",
                 "message": "PharmaVigilance Service Unavailable. Please consult a doctor.",
                 "alternatives": [],
                 "is_safe": False
             }
 
+        if deadline.expired():
+            return self._deadline_fallback(drug_name, gestational_week, additional_drugs)
+
+        async def analysis(results: Dict[str, Any]) -> Dict[str, Any]:
+            if known is None and self._can_fuse(language, additional_drugs):
+                fused = await self._check_fused(drug_name, gestational_week, symptoms, language)
+                if fused is not None:
+                    return fused
+                logger.warning(f"Fused check for {drug_name} failed, using separate model calls")
+            return await self._check_multi_call(drug_name, gestational_week, symptoms, patient_id, language, additional_drugs)
+
+        # The drug analysis and the patient's risk profile don't depend on
+        # each other, so they run side by side
+        pipeline = Pipeline().stage("analysis", analysis)
+        if patient_id:
+            pipeline.stage("risk_profile", lambda results: self._get_risk_profile(patient_id))
+            pipeline.stage(
+                "personalize",
+                lambda results: self._personalize(results["analysis"], results["risk_profile"], gestational_week),
+                after=("analysis", "risk_profile")
+            )
+
         try:
-            # Check if multiple drugs - use PharmaVigilance for drug interactions
-            if additional_drugs and len(additional_drugs) > 0:
-                # Multiple drugs - create encounter and use PharmaVigilance + AI
-                encounter_result = await self._create_medication_encounter(
-                    patient_id, normalized_name, gestational_week, symptoms, additional_drugs
-                )
-                
-                if encounter_result and encounter_result.get("id"):
-                    # STEP 1: Get PharmaVigilance drug-drug interactions
-                    pharma_data = await self._get_drug_interactions(patient_id, encounter_result.get("id"), normalized_name)
-                    
-                    # STEP 2: Get Gemini AI analysis with multi-drug context
-                    ai_analysis = await self._get_gemini_analysis(normalized_name, gestational_week, symptoms, pharma_data, additional_drugs)
-                    
-                    # STEP 3: Combine both sources
-                    result = self._combine_analyses(pharma_data, ai_analysis, normalized_name)
-                else:
-                    # Fallback to AI-only analysis for multiple drugs
-                    logger.warning("Encounter creation failed, using AI-only for multiple drugs")
-                    pharma_data = self._default_safety_analysis(normalized_name)
-                    ai_analysis = await self._get_gemini_analysis(normalized_name, gestational_week, symptoms, pharma_data, additional_drugs)
-                    result = self._combine_analyses(pharma_data, ai_analysis, normalized_name)
-            else:
-                # Single drug - use AI analysis only (no need for PharmaVigilance)
-                logger.info(f"Single drug analysis for {normalized_name} - using AI only")
-                pharma_data = self._default_safety_analysis(normalized_name)
-                ai_analysis = await self._get_gemini_analysis(normalized_name, gestational_week, symptoms, pharma_data)
-                result = self._combine_analyses(pharma_data, ai_analysis, normalized_name)
-            
+            results = await asyncio.wait_for(pipeline.run(on_stage), deadline.remaining())
+        except asyncio.TimeoutError:
+            logger.warning(f"Safety check for {drug_name} ran out of time, using the rule-based answer")
+            return self._deadline_fallback(drug_name, gestational_week, additional_drugs)
+        except Exception as e:
+            logger.error(f"PharmaVigilance API Error: {e}")
+            return {
+                "name": drug_normalization.normalize(drug_name),
+                "risk_category": "Error",
+                "message": "Unable to verify safety at this time. Consult a specialist.",
+                "alternatives": [],
+                "is_safe": False
+            }
+
+        result = results.get("personalize", results["analysis"])
+        if settings.DEBUG_STAGE_TIMINGS:
+            result = dict(result, timings=pipeline.timings)
+        return result
+
+    async def check_medication_stream(self, drug_name: str, gestational_week: int, symptoms: Optional[List[str]] = None, patient_id: Optional[int] = None, language: str = "en", additional_drugs: Optional[List[str]] = None, budget: Optional[float] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        check_medication as a series of (event, result) answers, each one
+        better than the last: "preliminary" (rule-based, straight away),
+        "refined" once the drug analysis is done and, for a known patient,
+        "personalized". The last one is what check_medication returns.
+        The check runs under a deadline of `budget` seconds if given, and
+        is cancelled if the consumer stops reading.
+        """
+        yield "preliminary", self._rule_based_result(drug_name, gestational_week, additional_drugs, "Rule-based (preliminary)")
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def on_stage(name: str, result: Any):
+            # Without a patient the analysis is the final answer
+            if name == "analysis" and patient_id:
+                queue.put_nowait(("refined", result))
+
+        async def run():
+            try:
+                result = await self.check_medication(drug_name, gestational_week, symptoms, patient_id, language, additional_drugs, on_stage)
+                queue.put_nowait(("personalized" if patient_id else "refined", result))
+            finally:
+                queue.put_nowait(None)
+
+        if budget is None:
+            task = asyncio.ensure_future(run())
+        else:
+            # The task takes its own copy of the deadline, so it applies however this generator is driven
+            with deadline.deadline(budget):
+                task = asyncio.ensure_future(run())
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+            await task
+        finally:
+            task.cancel()
+
+    def _deadline_fallback(self, drug_name: str, gestational_week: int, additional_drugs: Optional[List[str]]) -> Dict[str, Any]:
+        """Rule-based answer for when the request's time budget has run out"""
+        return self._rule_based_result(drug_name, gestational_week, additional_drugs, "Rule-based (time budget exhausted)")
+
+    def _rule_based_result(self, drug_name: str, gestational_week: int, additional_drugs: Optional[List[str]], data_sources: str) -> Dict[str, Any]:
+        name = drug_normalization.normalize(drug_name)
+        return dict(
+            self._default_safety_analysis(name, gestational_week, additional_drugs),
+            name=name,
+            language="en",
+            additional_drugs=additional_drugs or [],
+            analysis_type="multi-drug" if additional_drugs else "single-drug",
+            data_sources=data_sources,
+            cache_status="bypass"
+        )
+
+    async def _translate_request(self, drug_name: str, symptoms: Optional[List[str]], language: str) -> Tuple[str, Optional[List[str]], str]:
+        """Detect ("auto") and translate the request to English; returns (drug, symptoms, language)"""
+        if language == "auto":
+            language = await language_service.detect_language(" ".join([drug_name] + list(symptoms or [])))
+        if language != "en":
+            translated = await asyncio.gather(
+                language_service.translate_to_english(drug_name, language),
+                *(language_service.translate_to_english(s, language) for s in symptoms or [])
+            )
+            drug_name = translated[0]
+            if symptoms:
+                symptoms = list(translated[1:])
+        return drug_name, symptoms, language
+
+    async def _check_multi_call(self, drug_name: str, gestational_week: int, symptoms: Optional[List[str]], patient_id: Optional[int], language: str, additional_drugs: Optional[List[str]]) -> Dict[str, Any]:
+        """Translate the request, analyse it in English (cached) and translate the answer back"""
+        normalized_name = drug_normalization.normalize(drug_name)
+        known = self._knowledge_answer(normalized_name, gestational_week, additional_drugs)
+        if known is not None:
+            # A known drug name needs no translating, and the answer doesn't
+            # depend on the symptoms; they only say which language to use
+            if language == "auto":
+                language = await language_service.detect_language(" ".join(symptoms)) if symptoms else "en"
+            symptoms = None
+        else:
+            # 1. Handle Multi-Language Input
+            drug_name, symptoms, language = await self._translate_request(drug_name, symptoms, language)
+
+            # 2. Normalize Drug Name
+            normalized_name = drug_normalization.normalize(drug_name)
+            known = self._knowledge_answer(normalized_name, gestational_week, additional_drugs)
+
+        if known is not None and language == "en":
+            # Deterministic and microseconds away, so not worth caching
+            return dict(known, name=normalized_name, language=language, additional_drugs=[], cache_status="bypass")
+
+        # Multi-drug checks for a known patient read that patient's
+        # PharmaVigilance interactions, so they are never shared
+        cache_key = None
+        if not (additional_drugs and patient_id):
+            cache_key = self._safety_cache_key(normalized_name, gestational_week, symptoms, language, additional_drugs)
+
+        async def load_base_result() -> Dict[str, Any]:
+            result = known or await self._analyze(normalized_name, gestational_week, symptoms, patient_id, additional_drugs)
             base_result = {
-                "name": normalized_name,
                 "risk_category": result.get("risk_category", "Unknown"),
                 "message": result.get("message", "Analysis failed."),
                 "alternatives": result.get("alternatives", []),
                 "is_safe": result.get("is_safe", False),
-                "additional_drugs": additional_drugs or [],
-                "analysis_type": "multi-drug" if additional_drugs else "single-drug"
+                "analysis_type": "multi-drug" if additional_drugs else "single-drug",
+                "data_sources": result.get("data_sources", "")
             }
             
-            # 4. Enhanced Risk Scoring with Patient History
-            if patient_id:
-                try:
-                    patient_profile = await risk_scoring_service.get_patient_risk_profile(patient_id)
-                    base_result = risk_scoring_service.calculate_medication_risk(base_result, patient_profile, gestational_week)
-                except Exception as e:
-                    logger.warning(f"Risk scoring failed: {e}")
-            
-            # 5. Translate Response Back to Local Language
+            # 3. Translate Response Back to Local Language
             if language != "en":
-                base_result["message"] = language_service.translate_from_english(base_result["message"], language)
-                base_result["alternatives"] = [language_service.translate_from_english(alt, language) for alt in base_result["alternatives"]]
-                if "personalized_notes" in base_result:
-                    base_result["personalized_notes"] = language_service.translate_from_english(base_result["personalized_notes"], language)
-            
+                if deadline.expired():
+                    # No time to translate: answer in English and don't cache it under this language
+                    return dict(base_result, untranslated=True)
+                translated = await language_service.translate_many_from_english(
+                    [base_result["message"]] + base_result["alternatives"], language
+                )
+                base_result["message"], base_result["alternatives"] = translated[0], translated[1:]
             return base_result
 
+        if cache_key:
+            # Concurrent identical checks share one analysis. Only
+            # AI-backed and translated knowledge base answers are kept; the
+            # rule-based fallback is cheap and may just mean Gemini was down
+            base_result, cache_status = await cache.fetch_drug_safety(
+                cache_key, load_base_result,
+                should_cache=lambda r: (
+                    ("Gemini" in r.get("data_sources", "") or r.get("data_sources") == drug_knowledge.source)
+                    and not r.get("untranslated")
+                )
+            )
+        else:
+            base_result, cache_status = await load_base_result(), "bypass"
+
+        if base_result.pop("untranslated", False):
+            language = "en"
+        return dict(
+            base_result,
+            name=normalized_name,
+            language=language,
+            additional_drugs=additional_drugs or [],
+            cache_status=cache_status
+        )
+
+    def _knowledge_answer(self, normalized_name: str, gestational_week: int, additional_drugs: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+        """The knowledge base's answer for a single-drug check, if it is confident about the drug"""
+        if not settings.DRUG_KB_FAST_PATH or additional_drugs:
+            return None
+        known = drug_knowledge.lookup(normalized_name, gestational_week)
+        if known is None or not known["confident"]:
+            return None
+        return {
+            "risk_category": known["risk_category"],
+            "message": known["message"],
+            "alternatives": known["alternatives"],
+            "is_safe": known["is_safe"],
+            "analysis_type": "single-drug",
+            "data_sources": drug_knowledge.source
+        }
+
+    async def _get_risk_profile(self, patient_id: int) -> Optional[Dict[str, Any]]:
+        if deadline.expired():
+            return None
+        try:
+            return await risk_scoring_service.get_patient_risk_profile(patient_id)
         except Exception as e:
-            logger.error(f"PharmaVigilance API Error: {e}")
+            logger.warning(f"Risk scoring failed: {e}")
+            return None
+
+    async def _personalize(self, base_result: Dict[str, Any], patient_profile: Optional[Dict[str, Any]], gestational_week: int) -> Dict[str, Any]:
+        """4. Enhanced Risk Scoring with Patient History"""
+        if patient_profile is None:
+            return base_result
+        try:
+            personalized = risk_scoring_service.calculate_medication_risk(base_result, patient_profile, gestational_week)
+            language = base_result.get("language", "en")
+            if language != "en":
+                personalized = await self._translate_personalization(base_result, personalized, language)
+            return personalized
+        except Exception as e:
+            logger.warning(f"Risk scoring failed: {e}")
+            return base_result
+
+    def _can_fuse(self, language: str, additional_drugs: Optional[List[str]]) -> bool:
+        return bool(
+            settings.LLM_FUSED_MULTILINGUAL
+            and self.gemini_model is not None
+            and self.dorra_api_key
+            and language != "en"
+            and not additional_drugs
+        )
+
+    async def _check_fused(self, drug_name: str, gestational_week: int, symptoms: Optional[List[str]], language: str) -> Optional[Dict[str, Any]]:
+        """
+        Single-drug check in one model call that also detects the language
+        and answers in it. Cached like the multi-call path, keyed on the
+        untranslated request; the entry's "name" is the generic English
+        name, which is what drug invalidations match it by. Returns None if
+        the model's answer is unusable.
+        """
+        guess = drug_normalization.normalize(drug_name)
+        cache_key = self._safety_cache_key(guess, gestational_week, symptoms, language)
+
+        async def load_base_result() -> Optional[Dict[str, Any]]:
+            answer = await self._get_fused_analysis(drug_name, gestational_week, symptoms, language, self._default_safety_analysis(guess, gestational_week))
+            if answer is None:
+                return None
+            name = drug_normalization.normalize(answer["drug_name"]) or guess
+            # Never report less risk than the rule-based reference
+            reference_risk = self._default_safety_analysis(name, gestational_week)["risk_category"]
+            final_risk = answer["risk_category"]
+            if RISK_HIERARCHY.get(reference_risk, 0) > RISK_HIERARCHY[final_risk]:
+                final_risk = reference_risk
             return {
-                "name": normalized_name,
-                "risk_category": "Error",
-                "message": "Unable to verify safety at this time. Consult a specialist.",
-                "alternatives": [],
-                "is_safe": False
+                "name": name,
+                "language": answer["language"],
+                "risk_category": final_risk,
+                "message": answer["message"],
+                "alternatives": answer["alternatives"],
+                "is_safe": final_risk == "Safe",
+                "analysis_type": "single-drug",
+                "data_sources": "PharmaVigilance API + Gemini 2.5 Flash AI (fused)"
             }
-    
-    async def _get_drug_interactions(self, patient_id: int, encounter_id: int, drug_name: str = "") -> Dict[str, Any]:
-        """Get drug interactions directly from PharmaVigilance API"""
+
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.dorra_api_url}/v1/pharmavigilance/interactions",
-                    headers=self.headers,
-                    params={"search": str(patient_id)},
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    logger.warning(f"PharmaVigilance API returned {response.status_code}")
-                    return self._default_safety_analysis(drug_name)
-                
-                interactions_data = response.json()
-                interactions = interactions_data.get("results", [])
-                
-                if not interactions:
-                    return self._default_safety_analysis(drug_name)
-                
-                # Process the most recent interaction
-                latest_interaction = interactions[0]
-                return self._process_interaction_data(latest_interaction)
-                
+            base_result, cache_status = await cache.fetch_drug_safety(
+                cache_key, load_base_result,
+                should_cache=lambda r: "Gemini" in r.get("data_sources", "")
+            )
+        except Exception as e:
+            logger.error(f"Fused safety check failed: {e}")
+            return None
+        if base_result is None:
+            return None
+
+        # An explicit-language entry may have been filled by the multi-call path
+        return dict(
+            base_result,
+            name=base_result.get("name", guess),
+            language=base_result.get("language", language),
+            additional_drugs=[],
+            cache_status=cache_status
+        )
+
+    async def _get_fused_analysis(self, drug_name: str, gestational_week: int, symptoms: Optional[List[str]], language: str, reference: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Ask Gemini to detect, analyse and answer in the request's language as one JSON object"""
+        symptoms_str = ", ".join(symptoms) if symptoms else "None"
+        answer_in = "the language of the request" if language == "auto" else LANGUAGE_NAMES.get(language, "the local language")
+        prompt = f"""A pregnant patient at {gestational_week} weeks asks whether a medication is safe. The request may be in English, Yoruba, Igbo or Hausa.
+
+Medication: "{drug_name}"
+Symptoms: "{symptoms_str}"
+Reference guidance: {reference.get("message", "")}
+
+Return only JSON with:
+- "language": code of the request's language ("en", "yo", "ig" or "ha")
+- "drug_name": the medication's generic English name
+- "risk_category": Safe, Caution, High Risk or Contraindicated
+- "is_safe": boolean
+- "message": 2-3 sentences of advice written in {answer_in}
+- "alternatives": array of safer alternatives written in {answer_in}"""
+
+        try:
+            # The prompt depends only on the request, so repeats come from the response store
+            text = await generate(self.gemini_model, prompt, store_if=_is_model_json)
+            answer = _parse_model_json(text)
         except Exception as e:
-            logger.error(f"PharmaVigilance API error: {e}")
+            logger.error(f"Fused Gemini analysis failed: {e}")
+            return None
+
+        if not isinstance(answer, dict) or answer.get("risk_category") not in RISK_HIERARCHY or not answer.get("message") or not answer.get("drug_name"):
+            logger.warning("Fused Gemini analysis returned an unexpected answer")
+            return None
+        detected = str(answer.get("language", "")).strip().lower() if language == "auto" else language
+        if detected not in LANGUAGE_NAMES:
+            logger.warning(f"Fused Gemini analysis detected an unsupported language: {detected}")
+            return None
+        alternatives = answer.get("alternatives") or []
+        return {
+            "language": detected,
+            "drug_name": str(answer["drug_name"]),
+            "risk_category": answer["risk_category"],
+            "message": str(answer["message"]),
+            "alternatives": [str(a) for a in alternatives if a] if isinstance(alternatives, list) else []
+        }
+
+    async def _analyze(self, normalized_name: str, gestational_week: int, symptoms: Optional[List[str]], patient_id: Optional[int], additional_drugs: Optional[List[str]]) -> Dict[str, Any]:
+        """Run PharmaVigilance and Gemini and combine them into one assessment"""
+        # Check if multiple drugs - use PharmaVigilance for drug interactions
+        if additional_drugs and len(additional_drugs) > 0:
+            # Multiple drugs - create encounter and use PharmaVigilance + AI.
+            # The Gemini prompt doesn't use the PharmaVigilance data, so it
+            # runs while the encounter is created and its interactions read
+            async def interactions(results: Dict[str, Any]) -> Dict[str, Any]:
+                encounter_result = results["encounter"]
+                if encounter_result and encounter_result.get("id"):
+                    return await self._get_drug_interactions(patient_id, encounter_result.get("id"), normalized_name)
+                # Fallback to AI-only analysis for multiple drugs
+                logger.warning("Encounter creation failed, using AI-only for multiple drugs")
+                return self._default_safety_analysis(normalized_name, gestational_week, additional_drugs)
+
+            pipeline = (
+                Pipeline("multi_drug")
+                .stage("encounter", lambda results: self._create_medication_encounter(
+                    patient_id, normalized_name, gestational_week, symptoms, additional_drugs
+                ))
+                .stage("interactions", interactions, after=("encounter",))
+                .stage("gemini", lambda results: self._get_gemini_analysis(
+                    normalized_name, gestational_week, symptoms, {}, additional_drugs
+                ))
+            )
+            results = await pipeline.run()
+            return self._combine_analyses(results["interactions"], results["gemini"], normalized_name)
+        else:
+            # Single drug - use AI analysis only (no need for PharmaVigilance)
+            logger.info(f"Single drug analysis for {normalized_name} - using AI only")
+            pharma_data = self._default_safety_analysis(normalized_name, gestational_week)
+            ai_analysis = await self._get_gemini_analysis(normalized_name, gestational_week, symptoms, pharma_data)
+            return self._combine_analyses(pharma_data, ai_analysis, normalized_name)
+
+    def _safety_cache_key(self, normalized_name: str, gestational_week: int, symptoms: Optional[List[str]], language: str, additional_drugs: Optional[List[str]] = None) -> str:
+        """
+        Canonical drug safety cache key: normalized drug set, gestational
+        band, symptoms and response language. Order and case don't matter.
+        """
+        drugs = {normalized_name.lower()}
+        drugs.update(drug_normalization.normalize(d).lower() for d in (additional_drugs or []) if d)
+        symptom_set = sorted({s.strip().lower() for s in (symptoms or []) if s and s.strip()})
+        return "|".join([
+            "+".join(sorted(drugs)),
+            gestational_band(gestational_week),
+            ",".join(symptom_set) or "-",
+            language or "en"
+        ])
+
+    async def _translate_personalization(self, base_result: Dict[str, Any], personalized: Dict[str, Any], language: str) -> Dict[str, Any]:
+        """Translate what risk scoring added on top of an already translated result"""
+        personalized = personalized.copy()
+        base_message = base_result.get("message", "")
+        message = personalized.get("message", "")
+        if message != base_message and message.startswith(base_message):
+            added = message[len(base_message):].strip()
+            personalized["message"] = f"{base_message} {await language_service.translate_from_english(added, language)}"
+        if "personalized_notes" in personalized:
+            personalized["personalized_notes"] = await language_service.translate_from_english(personalized["personalized_notes"], language)
+        return personalized
+    
+    async def _get_drug_interactions(self, patient_id: int, encounter_id: int, drug_name: str = "") -> Dict[str, Any]:
+        """Get drug interactions from the PharmaVigilance API"""
+        interactions = await dorra_emr.get_drug_interactions(patient_id)
+        if not interactions:
             return self._default_safety_analysis(drug_name)
+        
+        # Process the most recent interaction
+        latest_interaction = interactions[0]
+        return self._process_interaction_data(latest_interaction)
     
     async def _create_medication_encounter(self, patient_id: int, drug_name: str, gestational_week: int, symptoms: List[str], additional_drugs: Optional[List[str]] = None):
         """Create encounter with medication to trigger PharmaVigilance analysis"""
@@ -178,38 +512,35 @@ class HybridSafetyService:
             logger.error(f"Exception during encounter creation for patient {patient_id}: {str(e)}")
             return None
     
-    def _default_safety_analysis(self, drug_name: str = "") -> Dict[str, Any]:
-        """Default safety analysis when no interactions found"""
-        drug_lower = drug_name.lower()
-        
-        if "paracetamol" in drug_lower or "acetaminophen" in drug_lower:
-            return {
-                "risk_category": "Safe",
-                "message": "Paracetamol is considered safe throughout pregnancy at recommended doses for pain and fever relief.",
-                "alternatives": [],
-                "is_safe": True
-            }
-        elif "ibuprofen" in drug_lower:
-            return {
-                "risk_category": "Contraindicated",
-                "message": "NSAIDs like Ibuprofen should be avoided in pregnancy, especially after 28 weeks, due to risk of ductus arteriosus closure.",
-                "alternatives": ["Paracetamol"],
-                "is_safe": False
-            }
-        elif "aspirin" in drug_lower:
-            return {
-                "risk_category": "Caution",
-                "message": "Low-dose aspirin may be used under medical supervision. High doses should be avoided due to bleeding risks.",
-                "alternatives": ["Paracetamol"],
-                "is_safe": False
-            }
-        else:
-            return {
+    def _default_safety_analysis(self, drug_name: str = "", gestational_week: int = 0, additional_drugs: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Rule-based analysis from the drug safety knowledge base. With
+        additional drugs the most restrictive of the drugs' answers and their
+        known pairwise cautions wins. Week 0 (unknown) takes the most
+        restrictive answer across the pregnancy.
+        """
+        known = drug_knowledge.lookup(drug_name, gestational_week)
+        if known is None:
+            result = {
                 "risk_category": "Caution",
                 "message": "No specific interaction data available. Consult healthcare provider before use during pregnancy.",
                 "alternatives": [],
                 "is_safe": False
             }
+        else:
+            result = {key: known[key] for key in ("risk_category", "message", "alternatives", "is_safe")}
+        if not additional_drugs:
+            return result
+
+        findings = [drug_knowledge.lookup(drug, gestational_week) for drug in additional_drugs]
+        findings = [f for f in findings if f is not None] + drug_knowledge.interactions([drug_name] + list(additional_drugs))
+        for finding in findings:
+            if RISK_HIERARCHY[finding["risk_category"]] > RISK_HIERARCHY[result["risk_category"]]:
+                result["risk_category"] = finding["risk_category"]
+            if finding["risk_category"] != "Safe":
+                result["message"] += f" {finding['message']}"
+        result["is_safe"] = result["risk_category"] == "Safe"
+        return result
 
     def _process_interaction_data(self, interaction: Dict) -> Dict[str, Any]:
         """Process drug interaction data from PharmaVigilance API"""
@@ -268,8 +599,9 @@ Focus on drug-drug interactions during pregnancy. Return JSON with: risk_categor
 Return JSON with: risk_category (Safe/Caution/High Risk/Contraindicated), message (2-3 sentences), alternatives (array), is_safe (boolean)."""
         
         try:
-            response = self.gemini_model.generate_content(prompt)
-            ai_result = json.loads(response.text.replace('```json', '').replace('```', '').strip())
+            # Single-drug prompts depend only on drug, week and symptoms, so repeats come from the response store
+            text = await generate(self.gemini_model, prompt, store_if=None if additional_drugs else _is_model_json)
+            ai_result = _parse_model_json(text)
             ai_result["ai_available"] = True
             return ai_result
         except Exception as e:
@@ -290,11 +622,9 @@ Return JSON with: risk_category (Safe/Caution/High Risk/Contraindicated), messag
             ai_risk = ai_analysis.get("risk_category", "Unknown")
             
             # Use the MORE RESTRICTIVE risk category for safety
-            risk_hierarchy = {"Safe": 0, "Caution": 1, "High Risk": 2, "Contraindicated": 3}
-            
             final_risk = base_risk
-            if ai_risk in risk_hierarchy and base_risk in risk_hierarchy:
-                if risk_hierarchy[ai_risk] > risk_hierarchy[base_risk]:
+            if ai_risk in RISK_HIERARCHY and base_risk in RISK_HIERARCHY:
+                if RISK_HIERARCHY[ai_risk] > RISK_HIERARCHY[base_risk]:
                     final_risk = ai_risk
             
             # Combine messages for comprehensive guidance
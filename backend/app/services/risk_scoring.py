@@ -1,21 +1,19 @@
-import google.generativeai as genai
-from typing import Dict, List, Optional, Any
-from app.core.config import settings
+from typing import Dict, Any
+from app.core import deadline
+from app.services.llm import create_model, generate
 from app.services.dorra_emr import dorra_emr
 
 class RiskScoringService:
     def __init__(self):
-        if settings.GEMINI_API_KEY:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
-        else:
-            self.model = None
+        self.model = create_model()
 
     async def get_patient_risk_profile(self, patient_id: int) -> Dict[str, Any]:
-        """Get patient's historical encounters for risk assessment"""
+        """Get patient's historical encounters for risk assessment (skipped once the request deadline has passed)"""
+        if deadline.expired():
+            return {"risk_factors": [], "risk_score": 0, "recommendations": []}
         try:
-            # Get patient encounters from Dorra EMR
-            encounters = await dorra_emr.get_patient_encounters(patient_id)
+            # Newest 10 encounters (from the encounter cache)
+            encounters = await dorra_emr.get_recent_encounters(patient_id, limit=10)
             
             if not encounters or not self.model:
                 return {"risk_factors": [], "risk_score": 0}
@@ -26,7 +24,7 @@ class RiskScoringService:
                 f"Diagnosis: {enc.get('diagnosis', 'N/A')}, "
                 f"Medications: {enc.get('medications', 'N/A')}, "
                 f"Notes: {enc.get('notes', 'N/A')}"
-                for enc in encounters[-10:]  # Last 10 encounters
+                for enc in encounters
             ])
 
             prompt = f"""Analyze this patient's medical history for pregnancy risk factors:
@@ -40,8 +38,8 @@ Return a JSON object with:
 
 Focus on: previous complications, chronic conditions, medication allergies, high-risk pregnancies."""
 
-            response = self.model.generate_content(prompt)
-            result = response.text.replace('```json', '').replace('```', '').strip()
+            text = await generate(self.model, prompt)
+            result = text.replace('```json', '').replace('```', '').strip()
             
             import json
             return json.loads(result)
@@ -0,0 +1,6 @@
+"""
+Local stand-ins for Dorra EMR, Gemini and Twilio, for load testing
+without spending real quota. See app/standin/__main__.py for how to run.
+"""
+from app.standin.behaviour import LatencyDistribution, UpstreamBehaviour
+from app.standin.fakes import FakeGenerativeModel, FakeTwilioClient
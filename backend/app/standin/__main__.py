@@ -0,0 +1,26 @@
+"""
+Serve the Dorra EMR stand-in:
+
+    STANDIN_DORRA_LATENCY=lognormal:80:0.5 STANDIN_DORRA_ERROR_RATE=0.01 \
+    STANDIN_DORRA_RATE_LIMIT=50 python -m app.standin --port 8100
+
+then run the backend with DORRA_API_URL=http://127.0.0.1:8100,
+LLM_BACKEND=fake and SMS_BACKEND=fake.
+"""
+import argparse
+
+import uvicorn
+
+from app.standin.dorra import create_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dorra EMR stand-in for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+How a stand-in upstream misbehaves: latency distribution, error rate and
+a server-side rate limit. Each upstream reads its own STANDIN_<NAME>_*
+environment variables so the load-test setup can be described in .env.
+"""
+import math
+import os
+import random
+import time
+from typing import Any, Dict, Optional
+
+
+class LatencyDistribution:
+    """
+    Response latency in seconds, parsed from a spec string:
+    "fixed:50", "uniform:20:200", "exponential:80" (mean) or
+    "lognormal:120:0.6" (median, sigma). Numbers are milliseconds.
+    """
+
+    KINDS = ("fixed", "uniform", "exponential", "lognormal")
+
+    def __init__(self, spec: str = "fixed:0", rng: Optional[random.Random] = None):
+        kind, _, params = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(":") if p] or [0.0]
+        self.rng = rng or random.Random()
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            low, high = self.params[0], self.params[-1]
+            ms = self.rng.uniform(low, high)
+        elif self.kind == "exponential":
+            ms = self.rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        else:
+            median = self.params[0]
+            sigma = self.params[1] if len(self.params) > 1 else 0.5
+            ms = self.rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return ms / 1000
+
+    def __str__(self) -> str:
+        return ":".join([self.kind] + [f"{p:g}" for p in self.params])
+
+
+class UpstreamBehaviour:
+    """
+    Per-upstream latency, error rate (0-1) and rate limit. A rate of 0
+    disables the limit; over the limit a call is rejected with a
+    Retry-After rather than queued, like the real services do.
+    """
+
+    def __init__(self, name: str, latency: str = "fixed:0", error_rate: float = 0.0, rate_limit: float = 0.0, burst: int = 0, seed: Optional[int] = None, clock=time.monotonic):
+        self.name = name
+        self.rng = random.Random(seed)
+        self.latency = LatencyDistribution(latency, self.rng)
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst or max(1, int(rate_limit))
+        self.clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    @classmethod
+    def from_env(cls, name: str, **defaults) -> "UpstreamBehaviour":
+        prefix = f"STANDIN_{name.upper()}_"
+        seed = os.getenv("STANDIN_SEED")
+        return cls(
+            name,
+            latency=os.getenv(prefix + "LATENCY", defaults.get("latency", "fixed:0")),
+            error_rate=float(os.getenv(prefix + "ERROR_RATE", defaults.get("error_rate", 0))),
+            rate_limit=float(os.getenv(prefix + "RATE_LIMIT", defaults.get("rate_limit", 0))),
+            burst=int(os.getenv(prefix + "BURST", defaults.get("burst", 0))),
+            seed=int(seed) if seed else None,
+        )
+
+    def retry_after(self) -> Optional[float]:
+        """Take a rate-limit token; returns seconds to wait if there is none."""
+        if self.rate_limit <= 0:
+            return None
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_limit)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return None
+        self.rate_limited += 1
+        return (1 - self._tokens) / self.rate_limit
+
+    def should_fail(self) -> bool:
+        failed = self.error_rate > 0 and self.rng.random() < self.error_rate
+        if failed:
+            self.errors += 1
+        return failed
+
+    def delay(self) -> float:
+        self.calls += 1
+        return self.latency.sample()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency": str(self.latency),
+            "error_rate": self.error_rate,
+            "rate_limit": self.rate_limit,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+        }
@@ -0,0 +1,233 @@
+"""
+In-memory stand-in for the Dorra EMR API: the endpoints DorraEMRService
+calls, DRF-style pagination, search and ordering, plus the latency,
+errors and 429s configured in STANDIN_DORRA_*.
+
+Run with `python -m app.standin` and point DORRA_API_URL at it.
+"""
+import asyncio
+import itertools
+import math
+import os
+import random
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from app.standin.behaviour import UpstreamBehaviour
+
+FIRST_NAMES = ["Amina", "Chioma", "Funke", "Ngozi", "Halima", "Bisi", "Zainab", "Ada", "Kemi", "Hauwa"]
+LAST_NAMES = ["Okafor", "Adeyemi", "Bello", "Eze", "Musa", "Ogunleye", "Ibrahim", "Nwosu", "Lawal", "Obi"]
+DIAGNOSES = ["Routine antenatal visit", "Gestational hypertension", "Iron deficiency anemia", "Gestational diabetes", "Malaria in pregnancy"]
+DRUGS = ["Paracetamol", "Ibuprofen", "Methyldopa", "Ferrous sulfate", "Folic acid", "Metformin", "Artemether"]
+SEVERITIES = ["Minor", "Moderate", "Major"]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class DorraStore:
+    """Patients, encounters and interactions kept in memory."""
+
+    def __init__(self, patients: int = 0, encounters_per_patient: int = 3, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+        self.patients: Dict[int, Dict[str, Any]] = {}
+        self.encounters: List[Dict[str, Any]] = []
+        self.interactions: List[Dict[str, Any]] = []
+        self._patient_ids = itertools.count(1)
+        self._encounter_ids = itertools.count(1)
+        self._interaction_ids = itertools.count(1)
+        for _ in range(patients):
+            patient = self.add_patient(self._random_patient())
+            for _ in range(encounters_per_patient):
+                self.add_encounter(patient["id"], f"{self.rng.choice(DIAGNOSES)}. Medications: {self.rng.choice(DRUGS)}.")
+
+    def _random_patient(self) -> Dict[str, Any]:
+        lmp = date.today() - timedelta(days=self.rng.randint(14, 280))
+        return {
+            "first_name": self.rng.choice(FIRST_NAMES),
+            "last_name": self.rng.choice(LAST_NAMES),
+            "gender": "Female",
+            "age": self.rng.randint(18, 42),
+            "phone_number": f"+23480{self.rng.randint(10000000, 99999999)}",
+            "lmp": lmp.isoformat(),
+        }
+
+    def add_patient(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        stamp = _now()
+        patient = {**data, "id": next(self._patient_ids), "created_at": stamp, "updated_at": stamp}
+        self.patients[patient["id"]] = patient
+        return patient
+
+    def update_patient(self, patient_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        patient = self.patients.get(patient_id)
+        if patient is None:
+            return None
+        data = {k: v for k, v in data.items() if k not in ("id", "created_at")}
+        patient.update(data, updated_at=_now())
+        return patient
+
+    def add_encounter(self, patient_id: int, prompt: str) -> Dict[str, Any]:
+        drugs = [d for d in DRUGS if d.lower() in prompt.lower()]
+        encounter = {
+            "id": next(self._encounter_ids),
+            "resource": "encounter",
+            "patient": patient_id,
+            "date": date.today().isoformat(),
+            "diagnosis": prompt.split(".")[0][:120],
+            "medications": ", ".join(drugs) or "N/A",
+            "notes": prompt[:500],
+            "created_at": _now(),
+        }
+        self.encounters.append(encounter)
+        # Two drugs in one record produce an interaction, as Dorra's AI would
+        if len(drugs) >= 2:
+            self.interactions.append({
+                "id": next(self._interaction_ids),
+                "patient": patient_id,
+                "drug_a": drugs[0],
+                "drug_b": drugs[1],
+                "severity": self.rng.choice(SEVERITIES),
+                "reason": f"{drugs[0]} and {drugs[1]} were recorded together.",
+                "created_at": encounter["created_at"],
+            })
+        return encounter
+
+
+def _matches(record: Dict[str, Any], search: Optional[str]) -> bool:
+    """DRF SearchFilter: case-insensitive substring match on any field."""
+    if not search:
+        return True
+    needle = search.lower()
+    return any(needle in str(value).lower() for value in record.values())
+
+
+def _ordered(records: List[Dict[str, Any]], ordering: Optional[str]) -> List[Dict[str, Any]]:
+    if not ordering:
+        return list(records)
+    field = ordering.lstrip("-")
+    return sorted(records, key=lambda r: (r.get(field) is None, r.get(field) or ""), reverse=ordering.startswith("-"))
+
+
+def _page(request: Request, records: List[Dict[str, Any]], page_size: int) -> Dict[str, Any]:
+    records = _ordered([r for r in records if _matches(r, request.query_params.get("search"))], request.query_params.get("ordering"))
+    try:
+        page = max(1, int(request.query_params.get("page", 1)))
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Invalid page.")
+    start = (page - 1) * page_size
+    if start and start >= len(records):
+        raise HTTPException(status_code=404, detail="Invalid page.")
+    has_next = start + page_size < len(records)
+    return {
+        "count": len(records),
+        "next": str(request.url.include_query_params(page=page + 1)) if has_next else None,
+        "previous": str(request.url.include_query_params(page=page - 1)) if page > 1 else None,
+        "results": records[start:start + page_size],
+    }
+
+
+def create_app(store: Optional[DorraStore] = None, behaviour: Optional[UpstreamBehaviour] = None, page_size: Optional[int] = None) -> FastAPI:
+    """Build the stand-in app; anything not given is read from STANDIN_* env vars."""
+    seed = os.getenv("STANDIN_SEED")
+    store = store or DorraStore(
+        patients=int(os.getenv("STANDIN_PATIENTS", 200)),
+        encounters_per_patient=int(os.getenv("STANDIN_ENCOUNTERS_PER_PATIENT", 3)),
+        seed=int(seed) if seed else None,
+    )
+    behaviour = behaviour or UpstreamBehaviour.from_env("dorra", latency="lognormal:80:0.5")
+    page_size = page_size or int(os.getenv("STANDIN_PAGE_SIZE", 20))
+
+    app = FastAPI(title="Dorra EMR stand-in")
+    app.state.store = store
+    app.state.behaviour = behaviour
+
+    @app.middleware("http")
+    async def misbehave(request: Request, call_next):
+        if not request.url.path.startswith("/v1/"):
+            return await call_next(request)
+        if not request.headers.get("authorization", "").startswith("Token "):
+            return JSONResponse({"detail": "Authentication credentials were not provided."}, status_code=401)
+        wait = behaviour.retry_after()
+        if wait is not None:
+            return JSONResponse(
+                {"detail": "Request was throttled."},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+        await asyncio.sleep(behaviour.delay())
+        if behaviour.should_fail():
+            return JSONResponse({"detail": "Service temporarily unavailable."}, status_code=503)
+        return await call_next(request)
+
+    @app.get("/v1/patients")
+    async def list_patients(request: Request):
+        return _page(request, list(store.patients.values()), page_size)
+
+    @app.post("/v1/patients/create", status_code=201)
+    async def create_patient(data: Dict[str, Any]):
+        return store.add_patient(data)
+
+    @app.get("/v1/patients/{patient_id}")
+    async def get_patient(patient_id: int):
+        patient = store.patients.get(patient_id)
+        if patient is None:
+            raise HTTPException(status_code=404, detail="Not found.")
+        return patient
+
+    # Dorra answers a successful PATCH with 201
+    @app.patch("/v1/patients/{patient_id}", status_code=201)
+    async def update_patient(patient_id: int, data: Dict[str, Any]):
+        patient = store.update_patient(patient_id, data)
+        if patient is None:
+            raise HTTPException(status_code=404, detail="Not found.")
+        return patient
+
+    @app.post("/v1/ai/patient", status_code=201)
+    async def create_patient_ai(data: Dict[str, Any]):
+        patient = store._random_patient()
+        words = str(data.get("prompt", "")).split()
+        if len(words) >= 2:
+            patient.update(first_name=words[0], last_name=words[1])
+        return store.add_patient(patient)
+
+    @app.post("/v1/ai/emr", status_code=201)
+    async def create_ai_emr(data: Dict[str, Any]):
+        try:
+            patient_id = int(data.get("patient"))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="patient is required.")
+        if patient_id not in store.patients:
+            raise HTTPException(status_code=404, detail="Patient not found.")
+        encounter = store.add_encounter(patient_id, str(data.get("prompt", "")))
+        # Dorra answers with a PropmtResponse, not the record it created
+        return {
+            "status": True,
+            "status_code": 201,
+            "message": "Encounter created successfully.",
+            "resource": "Encounter",
+            "resource_id": encounter["id"],
+            "available_pharmacies": [],
+        }
+
+    @app.get("/v1/encounters")
+    async def list_encounters(request: Request):
+        return _page(request, store.encounters, page_size)
+
+    @app.get("/v1/pharmavigilance/interactions")
+    async def list_interactions(request: Request):
+        return _page(request, _ordered(store.interactions, "-created_at"), page_size)
+
+    @app.get("/standin/stats")
+    async def stats():
+        return {
+            "behaviour": behaviour.to_dict(),
+            "patients": len(store.patients),
+            "encounters": len(store.encounters),
+            "interactions": len(store.interactions),
+        }
+
+    return app
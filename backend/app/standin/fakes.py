@@ -0,0 +1,139 @@
+"""
+In-process fakes for Gemini and Twilio with the same call surface the
+services use (`generate_content` / `messages.create`). They sleep, fail
+and rate-limit according to STANDIN_GEMINI_* and STANDIN_TWILIO_*.
+"""
+import asyncio
+import itertools
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from google.api_core import exceptions as google_exceptions
+from twilio.base.exceptions import TwilioRestException
+
+from app.standin.behaviour import UpstreamBehaviour
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Answers the prompts MamaSafe sends with plausible canned output:
+    language codes, echoed translations and JSON safety / risk analyses.
+    """
+
+    def __init__(self, model_name: str = "gemini-2.5-flash", behaviour: Optional[UpstreamBehaviour] = None):
+        self.model_name = model_name
+        self.behaviour = behaviour or UpstreamBehaviour.from_env("gemini", latency="lognormal:900:0.4")
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        """Rate-limit check; returns (latency, whether this call fails)."""
+        with self._lock:
+            wait = self.behaviour.retry_after()
+            if wait is not None:
+                raise google_exceptions.ResourceExhausted(f"Quota exceeded, retry in {wait:.1f}s")
+            return self.behaviour.delay(), self.behaviour.should_fail()
+
+    def generate_content(self, prompt: str, **kwargs) -> FakeResponse:
+        delay, failed = self._admit()
+        # Fail after the latency, as a real overloaded backend does
+        time.sleep(delay)
+        if failed:
+            raise google_exceptions.ServiceUnavailable("The model is overloaded. Please try again later.")
+        return FakeResponse(self.answer(prompt))
+
+    async def generate_content_async(self, prompt: str, **kwargs) -> FakeResponse:
+        delay, failed = self._admit()
+        await asyncio.sleep(delay)
+        if failed:
+            raise google_exceptions.ServiceUnavailable("The model is overloaded. Please try again later.")
+        return FakeResponse(self.answer(prompt))
+
+    @staticmethod
+    def answer(prompt: str) -> str:
+        if "Detect the language" in prompt:
+            return "en"
+        if prompt.lstrip().startswith("Translate"):
+            quoted = re.search(r'"(.*)"', prompt, re.S)
+            return quoted.group(1) if quoted else ""
+        if '"drug_name"' in prompt:
+            # Fused multilingual safety check
+            drug = re.search(r'Medication: "(.*?)"', prompt)
+            return json.dumps({
+                "language": "en",
+                "drug_name": drug.group(1) if drug else "Unknown",
+                "risk_category": "Caution",
+                "is_safe": False,
+                "message": "Use only under medical supervision during pregnancy. Stand-in analysis.",
+                "alternatives": ["Paracetamol"],
+            })
+        if "risk_factors" in prompt:
+            return json.dumps({
+                "risk_factors": ["Previous gestational hypertension"],
+                "risk_score": 35,
+                "recommendations": ["Monitor blood pressure at each visit"],
+            })
+        if "risk_category" in prompt:
+            return "```json\n" + json.dumps({
+                "risk_category": "Caution",
+                "message": "Use only under medical supervision during pregnancy. Stand-in analysis.",
+                "alternatives": ["Paracetamol"],
+                "is_safe": False,
+            }) + "\n```"
+        return "OK"
+
+
+class FakeMessage:
+    def __init__(self, sid: str, body: str, from_: str, to: str):
+        self.sid = sid
+        self.body = body
+        self.from_ = from_
+        self.to = to
+        self.status = "queued"
+
+
+class FakeMessages:
+    def __init__(self, client: "FakeTwilioClient"):
+        self.client = client
+
+    def create(self, body: str, from_: str, to: str, **kwargs) -> FakeMessage:
+        return self.client.send(body, from_, to)
+
+
+class FakeTwilioClient:
+    """Stands in for twilio.rest.Client; sent messages are kept in `sent`."""
+
+    def __init__(self, behaviour: Optional[UpstreamBehaviour] = None, keep: int = 1000):
+        self.behaviour = behaviour or UpstreamBehaviour.from_env("twilio", latency="lognormal:250:0.3")
+        self.messages = FakeMessages(self)
+        self.sent: List[FakeMessage] = []
+        self.keep = keep
+        self._sids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def send(self, body: str, from_: str, to: str) -> FakeMessage:
+        uri = "/2010-04-01/Accounts/ACstandin/Messages.json"
+        with self._lock:
+            wait = self.behaviour.retry_after()
+            if wait is not None:
+                raise TwilioRestException(429, uri, msg="Too Many Requests", code=20429)
+            delay = self.behaviour.delay()
+            failed = self.behaviour.should_fail()
+        time.sleep(delay)
+        if failed:
+            raise TwilioRestException(503, uri, msg="Service Unavailable", code=20503)
+        message = FakeMessage(f"SM{next(self._sids):032d}", body, from_, to)
+        with self._lock:
+            self.sent.append(message)
+            del self.sent[:-self.keep]
+        return message
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"behaviour": self.behaviour.to_dict(), "sent": len(self.sent)}
@@ -7,12 +7,15 @@ from dotenv import load_dotenv
 # Load environment variables first
 load_dotenv()
 
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine
 from app.core.config import settings
 from app.db.base import Base
 # Import all models so they're registered with Base
 from app.models.user import User
 from app.models.audit import AuditLog
+from app.models.patient import PatientReplica
+from app.models.outbox import EmrOutbox
 
 async def create_tables():
     print(f"Creating tables in database:  {settings.DATABASE_URL[:50]}...")
@@ -20,6 +23,8 @@ async def create_tables():
     engine = create_async_engine(str(settings.DATABASE_URL), future=True)
     
     async with engine.begin() as conn:
+        # Trigram index on patient names
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         # Create all tables
         await conn.run_sync(Base.metadata.create_all)
     
@@ -58,3 +58,91 @@ def test_admin_analytics():
     assert response.status_code == 200
     data = response.json()
     assert "total_checks" in data
+
+def test_admin_cache_stats():
+    response = client.get("/api/v1/admin/analytics/cache")
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data["tiers"]) >= {"pregnancy", "drug_safety"}
+    assert "hits" in data["tiers"]["drug_safety"]
+
+def test_patient_roster_streams_ndjson(monkeypatch):
+    import json
+    from app.services.dorra_emr import dorra_emr
+
+    async def fake_iter_patients(search=None):
+        for i in range(3):
+            yield {"id": i, "first_name": "Ada", "last_name": str(i)}
+        raise RuntimeError("page 2 failed")
+
+    monkeypatch.setattr(dorra_emr, "iter_patients", fake_iter_patients)
+
+    response = client.get("/api/v1/patient/all?stream=true")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line.get("id") for line in lines[:3]] == [0, 1, 2]
+    assert "error" in lines[3]
+
+    # Without streaming a partial roster is an error, not a short list
+    for path in ("/api/v1/patient/all", "/api/v1/patient/search?query=ada"):
+        response = client.get(path)
+        assert response.status_code == 502
+        assert "incomplete" in response.json()["detail"]
+
+def test_medication_check_streams_improving_answers(monkeypatch):
+    import json
+    from app.core.cache import cache
+    from app.core.config import settings
+    from app.services.pharmavigilance import pharma_service
+
+    async def fake_analyze(normalized_name, gestational_week, symptoms, patient_id, additional_drugs):
+        return {"risk_category": "Caution", "message": "Take with food.", "alternatives": [], "is_safe": False,
+                "data_sources": "PharmaVigilance API + Gemini 2.5 Flash AI"}
+
+    monkeypatch.setattr(pharma_service, "dorra_api_key", "test-key")
+    monkeypatch.setattr(pharma_service, "_analyze", fake_analyze)
+    monkeypatch.setattr(settings, "DRUG_KB_FAST_PATH", False)
+    cache.clear()
+
+    response = client.post("/api/v1/medications/check/stream", json={"drug_name": "Brufen", "manual_gestational_week": 30})
+    cache.clear()
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["event"] for line in lines] == ["preliminary", "refined"]
+    assert lines[0]["result"]["risk_category"] == "Contraindicated"
+    assert lines[1]["result"]["message"] == "Take with food."
+    assert lines[1]["result"]["gestational_week"] == 30
+
+
+def test_medication_stream_survives_a_logging_failure(monkeypatch):
+    import json
+    from app.api.endpoints import medications
+    from app.core.cache import cache
+    from app.core.config import settings
+    from app.services.pharmavigilance import pharma_service
+
+    async def fake_analyze(normalized_name, gestational_week, symptoms, patient_id, additional_drugs):
+        return {"risk_category": "Caution", "message": "Take with food.", "alternatives": [], "is_safe": False,
+                "data_sources": "PharmaVigilance API + Gemini 2.5 Flash AI"}
+
+    async def no_profile(patient_id):
+        return None
+
+    def broken_session():
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(pharma_service, "dorra_api_key", "test-key")
+    monkeypatch.setattr(pharma_service, "_analyze", fake_analyze)
+    monkeypatch.setattr(pharma_service, "_get_risk_profile", no_profile)
+    monkeypatch.setattr(settings, "DRUG_KB_FAST_PATH", False)
+    monkeypatch.setattr(medications, "SessionLocal", broken_session)
+    cache.clear()
+
+    response = client.post("/api/v1/medications/check/stream",
+                           json={"drug_name": "Brufen", "manual_gestational_week": 30, "patient_id": "7"})
+    cache.clear()
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    # The answers were sent before logging failed, and nothing else follows them
+    assert [line["event"] for line in lines] == ["preliminary", "refined", "personalized"]
+    assert lines[-1]["result"]["message"] == "Take with food."
@@ -0,0 +1,321 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.cache import CachePolicy, LRUTTLStore, TieredCache
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_store(max_entries=3, max_bytes=10_000, ttl=60):
+    clock = FakeClock()
+    store = LRUTTLStore(CachePolicy("test", ttl, max_entries, max_bytes), clock=clock)
+    return store, clock
+
+
+def test_lru_evicts_least_recently_used():
+    store, _ = make_store(max_entries=2)
+    store.set("a", 1)
+    store.set("b", 2)
+    assert store.get("a") == 1  # "b" is now least recently used
+    store.set("c", 3)
+    assert store.get("b") is None
+    assert store.get("a") == 1
+    assert store.get("c") == 3
+    assert len(store) == 2
+
+
+def test_byte_limit_is_enforced():
+    store, _ = make_store(max_entries=100, max_bytes=100)
+    for i in range(20):
+        store.set(f"k{i}", {"payload": "x" * 20})
+    assert store.bytes <= 100
+    assert store.get("k19") is not None
+    assert store.get("k0") is None
+
+
+def test_oversized_value_is_not_stored():
+    store, _ = make_store(max_bytes=50)
+    store.set("big", "x" * 200)
+    assert store.get("big") is None
+    assert store.bytes == 0
+
+
+def test_expired_entries_are_swept_without_being_read():
+    store, clock = make_store(max_entries=1000)
+    for i in range(10):
+        store.set(f"old{i}", i, ttl=10)
+    clock.now += 11
+    store.set("fresh", "v", ttl=10)
+    assert len(store) == 1
+    assert store.get("fresh") == "v"
+
+
+def test_overwrite_keeps_new_expiry():
+    store, clock = make_store()
+    store.set("a", 1, ttl=10)
+    store.set("a", 2, ttl=100)
+    clock.now += 50
+    assert store.sweep() == 0
+    assert store.get("a") == 2
+
+
+def test_tiered_cache_routes_keys_to_tiers():
+    cache = TieredCache({
+        "pregnancy": CachePolicy("pregnancy", 60, 10, 10_000),
+        "drug_safety": CachePolicy("drug_safety", 60, 1, 10_000),
+        "default": CachePolicy("default", 60, 10, 10_000),
+    })
+    cache.set_pregnancy_status(1, {"gestational_week": 20})
+    cache.set_drug_safety("Paracetamol", {"risk_category": "Safe"})
+    cache.set_drug_safety("Ibuprofen", {"risk_category": "Contraindicated"})
+
+    assert cache.get_pregnancy_status(1) == {"gestational_week": 20}
+    assert cache.get_drug_safety("paracetamol") is None
+    assert cache.get_drug_safety("IBUPROFEN") == {"risk_category": "Contraindicated"}
+    assert len(cache.tier("pregnancy")) == 1
+
+
+def make_tiered_cache(fill_timeout=None):
+    return TieredCache({
+        "pregnancy": CachePolicy("pregnancy", 60, 10, 10_000, fill_timeout=fill_timeout),
+        "drug_safety": CachePolicy("drug_safety", 60, 10, 10_000, fill_timeout=fill_timeout),
+        "default": CachePolicy("default", 60, 10, 10_000),
+    })
+
+
+def test_concurrent_misses_share_one_load():
+    cache = make_tiered_cache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"gestational_week": 20}
+
+    async def run():
+        return await asyncio.gather(*[cache.fetch_pregnancy_status(3, loader) for _ in range(20)])
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(value == {"gestational_week": 20} for value, _ in results)
+    statuses = [status for _, status in results]
+    assert statuses.count("miss") == 1
+    assert statuses.count("coalesced") == 19
+    assert asyncio.run(cache.fetch_pregnancy_status(3, loader))[1] == "hit"
+
+
+def test_shared_load_ignores_the_first_callers_deadline():
+    from app.core import deadline
+    from app.core.deadline import DeadlineExceeded, with_deadline
+
+    cache = make_tiered_cache()
+
+    async def loader():
+        await asyncio.sleep(0.1)
+        # Upstream calls clamp to the deadline; the shared load must not have one
+        deadline.clamp(1)
+        return {"gestational_week": 20}
+
+    @with_deadline(0.02)
+    async def impatient():
+        return await cache.fetch_pregnancy_status(3, loader)
+
+    @with_deadline(5)
+    async def patient():
+        return await cache.fetch_pregnancy_status(3, loader)
+
+    async def run():
+        return await asyncio.gather(impatient(), patient(), return_exceptions=True)
+
+    first, second = asyncio.run(run())
+    assert isinstance(first, DeadlineExceeded)
+    assert second == ({"gestational_week": 20}, "coalesced")
+
+
+def test_load_errors_reach_every_waiter_and_are_not_cached():
+    cache = make_tiered_cache()
+    calls = []
+
+    async def failing_loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("dorra down")
+
+    async def run():
+        return await asyncio.gather(
+            *[cache.fetch_drug_safety("paracetamol", failing_loader) for _ in range(5)],
+            return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert cache.get_drug_safety("paracetamol") is None
+
+
+def test_fill_timeout_and_should_cache():
+    cache = make_tiered_cache(fill_timeout=0.01)
+
+    async def slow_loader():
+        await asyncio.sleep(1)
+        return {"risk_category": "Safe"}
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(cache.fetch_drug_safety("slow", slow_loader))
+
+    async def fallback_loader():
+        return {"data_sources": "rules"}
+
+    value, _ = asyncio.run(cache.fetch_drug_safety("x", fallback_loader, should_cache=lambda r: False))
+    assert value == {"data_sources": "rules"}
+    assert cache.get_drug_safety("x") is None
+
+
+def test_stale_entries_are_kept_through_grace_window():
+    clock = FakeClock()
+    store = LRUTTLStore(CachePolicy("test", 10, 10, 10_000, stale_grace=100), clock=clock)
+    store.set("a", 1)
+    clock.now += 50
+    assert store.get("a") is None
+    assert store.lookup("a") == (1, True)
+    clock.now += 100
+    assert store.lookup("a") is None
+    assert len(store) == 0
+
+
+def test_stale_value_is_served_while_refreshing():
+    cache = TieredCache({
+        "pregnancy": CachePolicy("pregnancy", 60, 10, 10_000),
+        "drug_safety": CachePolicy("drug_safety", 60, 10, 10_000, stale_grace=3600),
+        "default": CachePolicy("default", 60, 10, 10_000),
+    })
+    cache.set("drug_paracetamol", {"version": 1}, -1)  # already expired
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"version": 2}
+
+    async def run():
+        first = await cache.fetch_drug_safety("paracetamol", loader)
+        second = await cache.fetch_drug_safety("paracetamol", loader)
+        await asyncio.sleep(0.05)
+        third = await cache.fetch_drug_safety("paracetamol", loader)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first == ({"version": 1}, "stale")
+    assert second == ({"version": 1}, "stale")
+    assert third == ({"version": 2}, "hit")
+    assert len(calls) == 1
+
+
+def test_refresh_concurrency_is_bounded():
+    cache = TieredCache({
+        "pregnancy": CachePolicy("pregnancy", 60, 10, 10_000),
+        "drug_safety": CachePolicy("drug_safety", 60, 100, 100_000, stale_grace=3600),
+        "default": CachePolicy("default", 60, 10, 10_000),
+    })
+    cache.refresh_concurrency = 2
+    for i in range(5):
+        cache.set(f"drug_{i}", {"i": i}, -1)
+    started = []
+
+    async def run():
+        for i in range(5):
+            async def loader(i=i):
+                started.append(i)
+                await asyncio.sleep(0.01)
+                return {"i": i}
+            await cache.fetch_drug_safety(str(i), loader)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert started == [0, 1]
+
+
+def test_stats_count_hits_misses_and_evictions():
+    cache = TieredCache({
+        "pregnancy": CachePolicy("pregnancy", 60, 2, 10_000),
+        "drug_safety": CachePolicy("drug_safety", 60, 10, 10_000),
+        "default": CachePolicy("default", 60, 10, 10_000),
+    })
+
+    async def loader():
+        return {"gestational_week": 12}
+
+    async def run():
+        for patient_id in (1, 2, 3, 3):
+            await cache.fetch_pregnancy_status(patient_id, loader)
+
+    asyncio.run(run())
+    stats = cache.stats()["tiers"]["pregnancy"]
+    assert stats["misses"] == 3
+    assert stats["hits"] == 1
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert stats["bytes"] > 0
+    assert stats["fill_latency_seconds"]["count"] == 3
+    assert stats["fill_latency_seconds"]["buckets"]["+Inf"] == 3
+
+
+def test_snapshot_restores_entries_with_remaining_ttl(tmp_path):
+    path = str(tmp_path / "cache.snapshot")
+    before = make_tiered_cache()
+    before.set_pregnancy_status(1, {"gestational_week": 20})
+    before.set("drug_paracetamol", {"risk_category": "Safe"}, 30)
+    before.set("drug_expired", {"risk_category": "Safe"}, -1)
+    assert before.save_snapshot(path) == 2
+
+    after = make_tiered_cache()
+    assert after.load_snapshot(path) == 2
+    # Nothing is decoded into the tiers until it is read
+    assert len(after.tier("drug_safety")) == 0
+    assert after.get_drug_safety("paracetamol") == {"risk_category": "Safe"}
+    assert len(after.tier("drug_safety")) == 1
+    remaining = after.tier("drug_safety").items()[0][2] - time.time()
+    assert 25 < remaining <= 30
+
+    # Unread entries survive the next snapshot
+    assert after.save_snapshot(path) == 2
+    assert make_tiered_cache().load_snapshot(path) == 2
+
+
+def test_patient_records_stay_out_of_snapshots(tmp_path):
+    path = str(tmp_path / "cache.snapshot")
+    before = TieredCache({
+        "patient": CachePolicy("patient", 60, 10, 10_000, snapshot=False),
+        "default": CachePolicy("default", 60, 10, 10_000),
+    })
+    before.set("patient_1", {"id": 1, "phone_number": "2348012345678"}, 30)
+    before.set("other", 1, 30)
+    assert before.save_snapshot(path) == 1
+    with open(path, encoding="utf-8") as f:
+        assert "2348012345678" not in f.read()
+
+    # Nor are they loaded from a snapshot written before the tier was excluded
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(f'"patient_2"\t{time.time() + 60!r}\t{{"id":2}}\n')
+    after = TieredCache({
+        "patient": CachePolicy("patient", 60, 10, 10_000, snapshot=False),
+        "default": CachePolicy("default", 60, 10, 10_000),
+    })
+    assert after.load_snapshot(path) == 1
+    assert after.get("patient_2") is None
+
+
+def test_missing_or_foreign_snapshot_is_ignored(tmp_path):
+    cache = make_tiered_cache()
+    assert cache.load_snapshot(str(tmp_path / "missing")) == 0
+    path = tmp_path / "garbage"
+    path.write_text("not a snapshot\n")
+    assert cache.load_snapshot(str(path)) == 0
@@ -0,0 +1,196 @@
+import asyncio
+import socketserver
+import threading
+import time
+
+import pytest
+
+from app.core.cache import CachePolicy, TieredCache
+from app.core.cache_backends import RedisBackend, RedisError, SharedMemoryBackend, fcntl
+from app.core.invalidation import BackendInvalidationLog
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Just enough of the Redis protocol for RedisBackend."""
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            name = command[0].upper()
+            args = command[1:]
+            if name in (b"AUTH", b"SELECT", b"PING"):
+                self._reply_simple("OK")
+            elif name == b"GET":
+                item = self._live(store, args[0])
+                self._reply_bulk(item[0] if item else None)
+            elif name == b"PTTL":
+                item = self._live(store, args[0])
+                if item is None:
+                    self._reply_int(-2)
+                else:
+                    self._reply_int(-1 if item[1] == float("inf") else int((item[1] - time.time()) * 1000))
+            elif name == b"SET":
+                store[args[0]] = (args[1], time.time() + int(args[3]) / 1000.0)
+                self._reply_simple("OK")
+            elif name == b"INCR":
+                item = self._live(store, args[0])
+                value = int(item[0]) + 1 if item else 1
+                store[args[0]] = (str(value).encode(), float("inf"))
+                self._reply_int(value)
+            elif name == b"DEL":
+                self._reply_int(sum(1 for key in args if store.pop(key, None) is not None))
+            elif name == b"SCAN":
+                prefix = args[2].rstrip(b"*")
+                keys = [key for key in store if key.startswith(prefix)]
+                self.wfile.write(b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys))
+                for key in keys:
+                    self._reply_bulk(key)
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+    @staticmethod
+    def _live(store, key):
+        item = store.get(key)
+        if item and item[1] <= time.time():
+            del store[key]
+            return None
+        return item
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        parts = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            parts.append(self.rfile.read(length + 2)[:-2])
+        return parts
+
+    def _reply_simple(self, text):
+        self.wfile.write(b"+%s\r\n" % text.encode())
+
+    def _reply_int(self, value):
+        self.wfile.write(b":%d\r\n" % value)
+
+    def _reply_bulk(self, value):
+        if value is None:
+            self.wfile.write(b"$-1\r\n")
+        else:
+            self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+
+
+@pytest.fixture
+def redis_url():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeRedisHandler)
+    server.daemon_threads = True
+    server.store = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+    server.server_close()
+
+
+def make_cache(backend):
+    return TieredCache({
+        "pregnancy": CachePolicy("pregnancy", 60, 10, 10_000),
+        "drug_safety": CachePolicy("drug_safety", 600, 10, 10_000),
+        "default": CachePolicy("default", 60, 10, 10_000),
+    }, backend=backend)
+
+
+def test_redis_backend_roundtrip(redis_url):
+    backend = RedisBackend(redis_url)
+    backend.set("k", b"value", 30)
+    value, ttl = backend.get("k")
+    assert value == b"value"
+    assert 0 < ttl <= 30
+    assert backend.delete("k") is True
+    assert backend.get("k") is None
+    backend.close()
+
+
+def test_workers_share_results_through_redis(redis_url):
+    worker_a = make_cache(RedisBackend(redis_url))
+    worker_b = make_cache(RedisBackend(redis_url))
+
+    worker_a.set_drug_safety("paracetamol", {"risk_category": "Safe"})
+    assert worker_b.get_drug_safety("paracetamol") == {"risk_category": "Safe"}
+
+    worker_b.clear()
+    worker_a.tier("drug_safety").clear()
+    assert worker_a.get_drug_safety("paracetamol") is None
+
+
+def test_unreachable_redis_is_a_miss():
+    backend = RedisBackend("redis://127.0.0.1:1/0", timeout=0.05)
+    cache = make_cache(backend)
+    cache.set_pregnancy_status(1, {"gestational_week": 12})
+    assert cache.get_pregnancy_status(1) == {"gestational_week": 12}
+    cache.tier("pregnancy").clear()
+    assert cache.get_pregnancy_status(1) is None
+    # Further calls fail fast during the cooldown instead of reconnecting
+    backend._connect = lambda: pytest.fail("reconnected during cooldown")
+    assert cache.get_pregnancy_status(1) is None
+
+
+def test_error_reply_mid_pipeline_keeps_connection_in_step(redis_url):
+    backend = RedisBackend(redis_url)
+    backend.set("k", b"value", 30)
+    with pytest.raises(RedisError):
+        backend._execute(("BOGUS",), ("GET", "mamasafe:k"))
+    assert backend.get("k")[0] == b"value"
+    backend.close()
+
+
+def test_corrupt_shared_entry_is_a_miss(redis_url):
+    backend = RedisBackend(redis_url)
+    backend.set("drug_paracetamol", b"not json", 30)
+    cache = make_cache(backend)
+    assert asyncio.run(cache.fetch("drug_paracetamol", lambda: asyncio.sleep(0, {"risk_category": "Safe"}))) == (
+        {"risk_category": "Safe"}, "miss"
+    )
+    assert make_cache(RedisBackend(redis_url)).get_drug_safety("paracetamol") == {"risk_category": "Safe"}
+
+
+def test_invalidation_log_over_redis(redis_url):
+    sender = BackendInvalidationLog(RedisBackend(redis_url))
+    receiver = BackendInvalidationLog(RedisBackend(redis_url))
+    assert receiver.receive() == []
+    sender.send({"type": "patient_updated", "patient_id": 3, "origin": "other-worker"})
+    sender.send({"type": "patient_updated", "patient_id": 4, "origin": "other-worker"})
+    assert [event["patient_id"] for event in receiver.receive()] == [3, 4]
+    assert receiver.receive() == []
+
+
+@pytest.mark.skipif(fcntl is None, reason="requires POSIX file locks")
+def test_shared_memory_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache")
+    worker_a = make_cache(SharedMemoryBackend(path, slots=64, slot_size=512))
+    worker_b = make_cache(SharedMemoryBackend(path, slots=64, slot_size=512))
+
+    worker_a.set_pregnancy_status(7, {"gestational_week": 30})
+    assert worker_b.get_pregnancy_status(7) == {"gestational_week": 30}
+
+    worker_b.delete("preg_7")
+    worker_a.tier("pregnancy").clear()
+    assert worker_a.get_pregnancy_status(7) is None
+
+
+@pytest.mark.skipif(fcntl is None, reason="requires POSIX file locks")
+def test_shared_memory_backend_expiry_and_oversized_values(tmp_path):
+    backend = SharedMemoryBackend(str(tmp_path / "cache"), slots=8, slot_size=128)
+    backend.set("short", b"x", 0.01)
+    time.sleep(0.02)
+    assert backend.get("short") is None
+
+    backend.set("big", b"x" * 500, 60)
+    assert backend.get("big") is None
+
+    for i in range(50):
+        backend.set(f"k{i}", b"v", 60)
+    assert backend.get("k49") == (b"v", pytest.approx(60, abs=1))
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import deadline
+from app.core.cache import cache
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, with_deadline
+from app.services.dorra_emr import DorraEMRService
+from app.services.pharmavigilance import pharma_service
+
+
+def test_clamp_and_nested_deadlines():
+    assert deadline.remaining() is None
+    assert deadline.clamp(5) == 5 and not deadline.expired()
+
+    with deadline.deadline(1):
+        assert deadline.clamp(5) <= 1
+        with deadline.deadline(10):
+            # The outer, earlier deadline still applies
+            assert deadline.remaining() <= 1
+        assert deadline.expired(reserve=2)
+
+    with deadline.deadline(0):
+        assert deadline.expired()
+        with pytest.raises(DeadlineExceeded):
+            deadline.clamp(5)
+    assert deadline.remaining() is None
+
+
+def test_slow_analysis_falls_back_to_rules(monkeypatch):
+    async def slow_analyze(*args):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(pharma_service, "dorra_api_key", "test-key")
+    monkeypatch.setattr(pharma_service, "_analyze", slow_analyze)
+    monkeypatch.setattr(settings, "DRUG_KB_FAST_PATH", False)
+    cache.clear()
+
+    @with_deadline(0.2)
+    async def check():
+        return await pharma_service.check_medication("Ibuprofen", 30)
+
+    result = asyncio.run(check())
+    cache.clear()
+    assert result["data_sources"] == "Rule-based (time budget exhausted)"
+    assert result["risk_category"] == "Contraindicated"
+    assert result["cache_status"] == "bypass"
+
+
+def test_spent_deadline_skips_dorra_without_tripping_the_breaker(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"id": 1})
+
+    service = DorraEMRService()
+    monkeypatch.setattr(service, "_create_client", lambda: httpx.AsyncClient(
+        base_url="https://dorra.test", transport=httpx.MockTransport(handler)))
+
+    @with_deadline(0)
+    async def fetch():
+        return await service._request("GET", "/v1/patients/1", timeout=5)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(fetch())
+    assert not calls
+    assert service.resilience_stats()["breakers"]["GET /v1/patients/{id}"]["state"] == "closed"
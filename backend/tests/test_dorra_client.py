@@ -0,0 +1,149 @@
+import asyncio
+import threading
+
+import httpx
+
+from app.services.dorra_emr import DorraEMRService
+
+
+def make_service(monkeypatch, handler):
+    service = DorraEMRService()
+    created = []
+
+    def create_client():
+        client = httpx.AsyncClient(base_url="https://dorra.test", headers=service.headers,
+                                   transport=httpx.MockTransport(handler))
+        created.append(client)
+        return client
+
+    monkeypatch.setattr(service, "_create_client", create_client)
+    return service, created
+
+
+def test_calls_share_one_client_until_shutdown(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append((request.method, request.url.path, request.headers["Authorization"]))
+        if request.url.path == "/v1/pharmavigilance/interactions":
+            return httpx.Response(200, json={"results": [{"id": 1}]})
+        return httpx.Response(200, json={"id": 7})
+
+    service, created = make_service(monkeypatch, handler)
+
+    async def run():
+        await service.startup()
+        patient = await service.get_patient(7)
+        interactions = await service.get_drug_interactions(7)
+        await service.shutdown()
+        return patient, interactions
+
+    patient, interactions = asyncio.run(run())
+    assert patient == {"id": 7}
+    assert interactions == [{"id": 1}]
+    assert len(created) == 1 and created[0].is_closed
+    assert [path for _, path, _ in seen] == ["/v1/patients/7", "/v1/pharmavigilance/interactions"]
+    assert all(auth.startswith("Token ") for _, _, auth in seen)
+
+
+def test_client_is_recreated_on_a_new_event_loop(monkeypatch):
+    service, created = make_service(monkeypatch, lambda request: httpx.Response(500))
+    assert asyncio.run(service.get_drug_interactions(1)) is None
+    assert asyncio.run(service.get_patient(1)) is None
+    assert len(created) == 2
+    # Each client was closed when its loop shut down
+    assert all(client.is_closed for client in created)
+
+
+def test_client_left_on_a_running_loop_is_closed_there(monkeypatch):
+    service, created = make_service(monkeypatch, lambda request: httpx.Response(200, json={}))
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever)
+    thread.start()
+    try:
+        async def open_client():
+            return service.client
+
+        asyncio.run_coroutine_threadsafe(open_client(), other).result(5)
+
+        async def replace():
+            service.client
+            await asyncio.sleep(0.1)
+
+        asyncio.run(replace())
+        assert len(created) == 2 and created[0].is_closed
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join(5)
+        other.close()
+
+
+def test_bulk_fetch_queueing_does_not_count_against_the_fill_timeout(monkeypatch):
+    from app.core.cache import cache
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "DORRA_BULK_CONCURRENCY", 2)
+    monkeypatch.setattr(cache.tier("patient").policy, "fill_timeout", 0.1)
+    service = DorraEMRService()
+
+    async def slow_fetch(patient_id):
+        await asyncio.sleep(0.04)
+        return {"id": patient_id}
+
+    monkeypatch.setattr(service, "_fetch_patient", slow_fetch)
+    cache.clear()
+    result = asyncio.run(service.get_patients_bulk(list(range(10))))
+    cache.clear()
+    assert not result["errors"]
+    assert len(result["patients"]) == 10
+
+
+def test_bulk_fetch_dedupes_caches_and_reports_errors(monkeypatch):
+    from app.core.cache import cache
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "DORRA_HEDGE_DELAY", 0)
+    monkeypatch.setattr(settings, "DORRA_RETRIES", 0)
+    monkeypatch.setattr(settings, "DORRA_BULK_CONCURRENCY", 2)
+    seen = []
+
+    def handler(request):
+        patient_id = int(request.url.path.rsplit("/", 1)[1])
+        seen.append(patient_id)
+        if patient_id == 404:
+            return httpx.Response(404)
+        if patient_id == 500:
+            return httpx.Response(500, text="boom")
+        return httpx.Response(200, json={"id": patient_id})
+
+    service, _ = make_service(monkeypatch, handler)
+    cache.clear()
+    cache.set("patient_1", {"id": 1, "cached": True}, 60)
+
+    result = asyncio.run(service.get_patients_bulk([1, 2, 3, 2, 404, 500]))
+    cache.clear()
+
+    assert result["patients"] == {1: {"id": 1, "cached": True}, 2: {"id": 2}, 3: {"id": 3}}
+    assert result["errors"][404] == "not found"
+    assert "500" in result["errors"][500]
+    assert sorted(seen) == [2, 3, 404, 500]
+
+
+def test_iter_patients_follows_next_links(monkeypatch):
+    pages = {
+        "1": {"results": [{"id": 1}, {"id": 2}], "next": "https://dorra.test/v1/patients?search=ada&page=2"},
+        "2": {"results": [{"id": 3}], "next": None},
+    }
+    seen = []
+
+    def handler(request):
+        seen.append(dict(request.url.params))
+        return httpx.Response(200, json=pages[request.url.params.get("page", "1")])
+
+    service, _ = make_service(monkeypatch, handler)
+
+    async def run():
+        return [patient["id"] async for patient in service.iter_patients(search="ada")]
+
+    assert asyncio.run(run()) == [1, 2, 3]
+    assert seen == [{"search": "ada"}, {"search": "ada", "page": "2"}]
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import cache
+from app.core.config import settings
+from app.services import pharmavigilance
+from app.services.drug_knowledge import DrugKnowledgeBase, drug_knowledge
+from app.services.pharmavigilance import pharma_service
+
+
+def test_bundled_knowledge_base_answers_by_band():
+    assert drug_knowledge.version != "empty"
+    # The normalizer maps aspirin to its generic name
+    assert drug_knowledge.lookup("Acetylsalicylic acid", 20)["risk_category"] == "Caution"
+    assert drug_knowledge.lookup("paracetamol 500mg", 8)["is_safe"]
+    assert drug_knowledge.lookup("Ibuprofen", 10)["risk_category"] == "High Risk"
+    assert drug_knowledge.lookup("Ibuprofen", 30)["risk_category"] == "Contraindicated"
+    # An unknown week takes the most restrictive answer
+    assert drug_knowledge.lookup("Ibuprofen", 0)["risk_category"] == "Contraindicated"
+    assert drug_knowledge.lookup("Unobtainium", 20) is None
+
+
+def test_only_exact_names_match():
+    assert drug_knowledge.lookup("Paracetamol 500 mg tablet", 30)["name"] == "Paracetamol"
+    assert drug_knowledge.lookup("amoxicillin 125mg/5ml suspension", 30)["name"] == "Amoxicillin"
+    # Combinations go to Gemini rather than to one of their ingredients
+    for combination in ("ibuprofen and paracetamol", "Tramadol/Paracetamol", "paracetamol, ibuprofen", "ibuprofen + codeine"):
+        assert drug_knowledge.lookup(combination, 30) is None
+
+
+def test_pairwise_cautions():
+    found = drug_knowledge.interactions(["aspirin", "Ibuprofen", "Paracetamol"])
+    assert [f["risk_category"] for f in found] == ["High Risk"]
+
+    result = pharma_service._default_safety_analysis("Paracetamol", 20, ["Ibuprofen", "Aspirin"])
+    assert result["risk_category"] == "High Risk"
+    assert "bleeding" in result["message"]
+
+
+def test_malformed_entry_is_rejected():
+    with pytest.raises(ValueError):
+        DrugKnowledgeBase({"version": "1", "drugs": {"X": {"default": {"risk_category": "Fine", "message": ""}}}})
+
+
+def test_known_drug_is_answered_without_gemini(monkeypatch):
+    async def no_analysis(*args):
+        raise AssertionError("known drugs don't need Gemini")
+
+    monkeypatch.setattr(pharma_service, "dorra_api_key", "test-key")
+    monkeypatch.setattr(pharma_service, "_analyze", no_analysis)
+    cache.clear()
+
+    result = asyncio.run(pharma_service.check_medication("Brufen", 30))
+    assert result["name"] == "Ibuprofen"
+    assert result["risk_category"] == "Contraindicated"
+    assert result["data_sources"] == drug_knowledge.source
+    assert result["cache_status"] == "bypass"
+
+
+def test_knowledge_base_answers_without_dorra_or_a_language(monkeypatch):
+    async def no_model_call(*args):
+        raise AssertionError("a known drug name needs no model call")
+
+    monkeypatch.setattr(pharma_service, "dorra_api_key", "")
+    monkeypatch.setattr(pharma_service, "_analyze", no_model_call)
+    monkeypatch.setattr(pharma_service, "_check_fused", no_model_call)
+    monkeypatch.setattr(pharmavigilance.language_service, "detect_language", no_model_call)
+    monkeypatch.setattr(pharmavigilance.language_service, "translate_to_english", no_model_call)
+    monkeypatch.setattr(settings, "LLM_FUSED_MULTILINGUAL", True)
+    cache.clear()
+
+    # SMS checks come in with language="auto"
+    result = asyncio.run(pharma_service.check_medication("Ibuprofen", 30, language="auto"))
+    assert result["risk_category"] == "Contraindicated" and result["language"] == "en"
+    assert result["data_sources"] == drug_knowledge.source
+
+    # Unknown drugs still need Dorra
+    result = asyncio.run(pharma_service.check_medication("Tramadol/Paracetamol", 30, language="en"))
+    assert result["risk_category"] == "Unknown"
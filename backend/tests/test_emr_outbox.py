@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.models.outbox import EmrOutbox
+from app.services import emr_outbox as outbox_module
+from app.services.emr_outbox import claim_next_statement, emr_outbox, record_result
+
+
+def test_claim_skips_locked_rows_and_keeps_patient_order():
+    sql = str(claim_next_statement().compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "NOT (EXISTS" in sql
+    assert "emroutbox_1.id < emroutbox.id" in sql
+
+
+def test_failed_sends_back_off_then_go_dead(monkeypatch):
+    monkeypatch.setattr(settings, "EMR_OUTBOX_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "EMR_OUTBOX_RETRY_BASE", 5)
+    now = datetime.now(timezone.utc)
+    row = EmrOutbox(id=1, patient_id=7, prompt="x", status="pending", attempts=0)
+
+    record_result(row, None, now)
+    assert row.status == "pending" and row.next_attempt_at == now + timedelta(seconds=5)
+    record_result(row, None, now)
+    assert row.next_attempt_at == now + timedelta(seconds=10)
+    record_result(row, None, now)
+    assert row.status == "dead"
+
+    row = EmrOutbox(id=2, patient_id=7, prompt="x", status="pending", attempts=1)
+    record_result(row, {"resource": "Encounter", "resource_id": 99, "message": "Encounter created"}, now)
+    assert (row.status, row.dorra_id, row.attempts) == ("done", 99, 2)
+
+
+class BrokenSession:
+    def __init__(self):
+        self.rolled_back = False
+
+    def add(self, row):
+        pass
+
+    async def flush(self):
+        raise ConnectionError("database down")
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+def test_submit_writes_inline_when_database_is_down(monkeypatch):
+    sent = []
+
+    async def create_ai_emr(patient_id, prompt):
+        sent.append(patient_id)
+        return {"id": 5}
+
+    monkeypatch.setattr(emr_outbox, "enabled", True)
+    monkeypatch.setattr(outbox_module.dorra_emr, "create_ai_emr", create_ai_emr)
+    db = BrokenSession()
+
+    submitted = asyncio.run(emr_outbox.submit(db, 7, "note", "visit_log"))
+    assert submitted == {"queued": False, "outbox_id": None, "result": {"id": 5}}
+    assert db.rolled_back and sent == [7]
+
+
+class FakeResult:
+    def __init__(self, row):
+        self.row = row
+
+    def scalars(self):
+        return self
+
+    def first(self):
+        return self.row
+
+
+class FakeSession:
+    """One row in a table; records when transactions are open."""
+
+    def __init__(self, row, log):
+        self.row, self.log = row, log
+
+    async def __aenter__(self):
+        self.log.append("begin")
+        return self
+
+    async def __aexit__(self, *exc):
+        self.log.append("end")
+
+    async def execute(self, statement):
+        return FakeResult(self.row if self.row.status == "pending" else None)
+
+    async def get(self, model, row_id):
+        return self.row if row_id == self.row.id else None
+
+    async def commit(self):
+        self.log.append("commit")
+
+
+def test_rows_are_leased_not_locked_while_dorra_answers(monkeypatch):
+    log = []
+    row = EmrOutbox(id=3, patient_id=7, prompt="note", status="pending", attempts=0)
+    before = datetime.now(timezone.utc)
+
+    async def create_ai_emr(patient_id, prompt):
+        # The claim is committed, and leased, before Dorra is called
+        assert log == ["begin", "commit", "end"]
+        assert row.next_attempt_at >= before + timedelta(seconds=settings.EMR_OUTBOX_LEASE)
+        log.append("send")
+        return {"resource": "Encounter", "resource_id": 41, "message": "Encounter created"}
+
+    monkeypatch.setattr(outbox_module, "SessionLocal", lambda: FakeSession(row, log))
+    monkeypatch.setattr(outbox_module.dorra_emr, "create_ai_emr", create_ai_emr)
+
+    assert asyncio.run(emr_outbox.process_next())
+    assert log == ["begin", "commit", "end", "send", "begin", "commit", "end"]
+    assert (row.status, row.dorra_id, row.attempts) == ("done", 41, 1)
+    assert not asyncio.run(emr_outbox.process_next())
@@ -0,0 +1,70 @@
+import asyncio
+
+from app.services.encounter_cache import EncounterCache
+
+
+class FakeDorra:
+    def __init__(self, count):
+        self.encounters = [{"id": i} for i in range(count, 0, -1)]  # newest first
+        self.read = 0
+
+    async def iter_encounters(self, patient_id):
+        for encounter in self.encounters:
+            self.read += 1
+            yield encounter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(dorra, depth=5):
+    clock = FakeClock()
+    return EncounterCache(dorra.iter_encounters, depth=depth, max_patients=2, refresh_after=60, clock=clock), clock
+
+
+def test_long_history_costs_the_same_as_a_short_one():
+    dorra = FakeDorra(1000)
+    cache, clock = make_cache(dorra)
+    assert [e["id"] for e in asyncio.run(cache.get(1, limit=3))] == [1000, 999, 998]
+    assert dorra.read == 6  # depth + the one that ends the read
+
+    # Within refresh_after nothing is read
+    asyncio.run(cache.get(1))
+    assert dorra.read == 6
+
+    # Later only the new encounters are pulled
+    dorra.encounters[:0] = [{"id": 1002}, {"id": 1001}]
+    clock.now += 60
+    assert [e["id"] for e in asyncio.run(cache.get(1))] == [1002, 1001, 1000, 999, 998]
+    assert dorra.read == 9
+
+
+def test_created_encounters_are_fetched_back():
+    dorra = FakeDorra(3)
+    cache, _ = make_cache(dorra)
+    asyncio.run(cache.get(1))
+    # Dorra's reply is a summary, not the encounter: it must not be cached
+    dorra.encounters.insert(0, {"id": 4, "diagnosis": "Headache"})
+    cache.record_created(1)
+    encounters = asyncio.run(cache.get(1))
+    assert [e["id"] for e in encounters] == [4, 3, 2, 1]
+    assert encounters[0]["diagnosis"] == "Headache"
+    # Only the new encounter and the known one it stopped at were read
+    assert dorra.read == 5
+
+    # Something changed elsewhere: next read checks Dorra
+    cache.handle_invalidation({"patient_id": 1, "reason": "pharmavigilance_webhook"}, False)
+    dorra.encounters.insert(0, {"id": 5})
+    assert asyncio.run(cache.get(1))[0]["id"] == 5
+
+
+def test_lru_bounds_patients():
+    cache, _ = make_cache(FakeDorra(2))
+    for patient_id in (1, 2, 3):
+        asyncio.run(cache.get(patient_id))
+    assert len(cache) == 2
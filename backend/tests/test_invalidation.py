@@ -0,0 +1,122 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.cache import CachePolicy, TieredCache, cache
+from app.core.cache_backends import SharedMemoryBackend, fcntl
+from app.core.invalidation import BackendInvalidationLog, InvalidationBus
+from app.main import app
+
+
+def make_cache(backend=None):
+    return TieredCache({
+        "pregnancy": CachePolicy("pregnancy", 60, 10, 10_000),
+        "drug_safety": CachePolicy("drug_safety", 60, 10, 10_000),
+        "default": CachePolicy("default", 60, 10, 10_000),
+    }, backend=backend)
+
+
+def test_invalidate_by_patient_and_drug():
+    local = make_cache()
+    local.set_pregnancy_status(7, {"gestational_week": 20})
+    local.set_drug_safety("ibuprofen+paracetamol|t2-late|-|en", {"risk_category": "Caution"})
+    local.set_drug_safety("paracetamol|t1|-|en", {"risk_category": "Safe"})
+    local.set_drug_safety("metformin|t1|-|en", {"risk_category": "Safe"})
+
+    assert local.invalidate(patient_id=7) == 1
+    assert local.get_pregnancy_status(7) is None
+
+    assert local.invalidate(drugs=["paracetamol"]) == 2
+    assert local.get_drug_safety("paracetamol|t1|-|en") is None
+    assert local.get_drug_safety("ibuprofen+paracetamol|t2-late|-|en") is None
+    assert local.get_drug_safety("metformin|t1|-|en") == {"risk_category": "Safe"}
+
+    # Fused checks are keyed on the request as given, and name the drug in the value
+    local.set_drug_safety("ogun iba|t1|-|auto", {"name": "Paracetamol", "risk_category": "Safe"})
+    assert local.invalidate(drugs=["paracetamol"]) == 1
+    assert local.get_drug_safety("ogun iba|t1|-|auto") is None
+
+
+def test_bus_dispatches_to_subscribers():
+    bus = InvalidationBus()
+    seen = []
+    bus.subscribe(lambda event, local: seen.append((event["patient_id"], event["drugs"], local)))
+    asyncio.run(bus.publish(patient_id=3, drugs=["Paracetamol", " "], reason="test"))
+    asyncio.run(bus.publish())  # nothing to invalidate
+    assert seen == [(3, ["paracetamol"], True)]
+
+
+@pytest.mark.skipif(fcntl is None, reason="requires POSIX file locks")
+def test_invalidation_reaches_other_workers(tmp_path):
+    path = str(tmp_path / "cache")
+    worker_a = make_cache(SharedMemoryBackend(path, slots=64, slot_size=512))
+    worker_b = make_cache(SharedMemoryBackend(path, slots=64, slot_size=512))
+    bus_a, bus_b = InvalidationBus(), InvalidationBus()
+    bus_a.transport = BackendInvalidationLog(worker_a.backend)
+    bus_b.transport = BackendInvalidationLog(worker_b.backend)
+    bus_a.subscribe(worker_a.handle_invalidation)
+    bus_a.subscribe_shared(worker_a.handle_shared_invalidation)
+    bus_b.subscribe(worker_b.handle_invalidation)
+    assert bus_b.transport.receive() == []  # start following the log
+
+    worker_a.set_drug_safety("paracetamol|t1|-|en", {"risk_category": "Safe"})
+    assert worker_b.get_drug_safety("paracetamol|t1|-|en") is not None  # now in B's local tier too
+
+    # Both "workers" live in this process; give A its own identity
+    from app.core import invalidation
+    invalidation.INSTANCE_ID, original = "worker-a", invalidation.INSTANCE_ID
+    try:
+        asyncio.run(bus_a.publish(drugs=["paracetamol"], reason="test"))
+    finally:
+        invalidation.INSTANCE_ID = original
+
+    assert worker_a.get_drug_safety("paracetamol|t1|-|en") is None
+    assert worker_b.backend.get("drug_paracetamol|t1|-|en") is None
+    for event in bus_b.transport.receive():
+        bus_b._dispatch(event, False)
+    assert worker_b.get_drug_safety("paracetamol|t1|-|en") is None
+
+
+@pytest.mark.skipif(fcntl is None, reason="requires POSIX file locks")
+def test_shared_invalidation_runs_off_the_event_loop(tmp_path, monkeypatch):
+    worker = make_cache(SharedMemoryBackend(str(tmp_path / "cache"), slots=64, slot_size=512))
+    bus = InvalidationBus()
+    bus.transport = BackendInvalidationLog(worker.backend)
+    bus.subscribe(worker.handle_invalidation)
+    bus.subscribe_shared(worker.handle_shared_invalidation)
+    worker.set_drug_safety("paracetamol|t1|-|en", {"risk_category": "Safe"})
+    worker.set_drug_safety("ogun iba|t1|-|auto", {"name": "Paracetamol", "risk_category": "Safe"})
+
+    threads = []
+    for name in ("keys", "delete", "incr"):
+        method = getattr(worker.backend, name)
+        monkeypatch.setattr(worker.backend, name, lambda *args, _m=method: threads.append(threading.current_thread()) or _m(*args))
+
+    async def publish():
+        await bus.publish(drugs=["paracetamol"], reason="test")
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(publish())
+    assert threads and loop_thread not in threads
+    assert worker.backend.get("drug_paracetamol|t1|-|en") is None
+    assert worker.backend.get("drug_ogun iba|t1|-|auto") is None
+
+
+def test_pharmavigilance_webhook_invalidates_cache():
+    cache.clear()
+    cache.set_drug_safety("ibuprofen+paracetamol|t3|-|en", {"risk_category": "High Risk"})
+    cache.set_pregnancy_status(42, {"gestational_week": 30})
+
+    client = TestClient(app)
+    response = client.post("/api/v1/webhook/pharmavigilance", json={
+        "event": "DrugInteraction",
+        "severity": "Major",
+        "resource_id": 1,
+        "details": {"patient": 42, "drug_a": "Brufen", "drug_b": "Warfarin"},
+    })
+
+    assert response.status_code == 200
+    assert cache.get_drug_safety("ibuprofen+paracetamol|t3|-|en") is None
+    assert cache.get_pregnancy_status(42) is None
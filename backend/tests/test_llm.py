@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import llm
+from app.services.language import LanguageService
+from app.standin.behaviour import UpstreamBehaviour
+from app.standin.fakes import FakeGenerativeModel, FakeResponse
+
+
+class SlowModel:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def generate_content(self, prompt):
+        time.sleep(self.seconds)
+        return FakeResponse(prompt.upper())
+
+
+def test_generate_runs_off_the_event_loop():
+    model = SlowModel(0.2)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tick_task = asyncio.create_task(ticker())
+        started = time.monotonic()
+        texts = await asyncio.gather(*(llm.generate(model, f"p{i}") for i in range(10)))
+        elapsed = time.monotonic() - started
+        tick_task.cancel()
+        return texts, elapsed, ticks
+
+    texts, elapsed, ticks = asyncio.run(run())
+    assert texts == [f"P{i}" for i in range(10)]
+    # Ten 200ms calls overlap, and the loop kept running meanwhile
+    assert elapsed < 1.0
+    assert ticks > 5
+
+
+def test_generate_times_out():
+    timeouts = llm.counters["timeouts"]
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(llm.generate(SlowModel(0.5), "slow", timeout=0.05))
+    assert llm.counters["timeouts"] == timeouts + 1
+
+
+def test_language_service_falls_back_when_the_model_fails():
+    service = LanguageService()
+    service.model = FakeGenerativeModel(behaviour=UpstreamBehaviour("gemini", error_rate=1))
+
+    async def run():
+        return await asyncio.gather(
+            service.detect_language("Bawo ni"),
+            service.translate_from_english("Take with food", "yo"),
+        )
+
+    assert asyncio.run(run()) == ["en", "Take with food"]
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+from app.core.llm_store import LLMResponseStore
+from app.services import llm
+from app.standin.fakes import FakeResponse
+
+
+def make_store(tmp_path, clock, **caps):
+    return LLMResponseStore(str(tmp_path / "llm.sqlite3"), ttl=caps.get("ttl", 60),
+                            max_entries=caps.get("max_entries", 100), max_bytes=caps.get("max_bytes", 10000), clock=clock)
+
+
+def test_responses_are_shared_between_stores_and_expire(tmp_path):
+    now = [1000.0]
+    first = make_store(tmp_path, lambda: now[0])
+    second = make_store(tmp_path, lambda: now[0])
+
+    first.put("gemini", "Translate: hello", "bawo")
+    assert second.get("gemini", "Translate: hello") == "bawo"
+    assert second.get("other-model", "Translate: hello") is None
+
+    now[0] += 61
+    assert first.get("gemini", "Translate: hello") is None
+    assert first.prune() == 1
+
+
+def test_least_recently_used_entries_go_over_the_caps(tmp_path):
+    now = [0.0]
+    store = make_store(tmp_path, lambda: now[0], ttl=3600, max_entries=2)
+    for prompt in ("a", "b", "c"):
+        now[0] += 100
+        store.put("m", prompt, prompt.upper())
+    # Reading "a" makes "b" the least recently used
+    now[0] += 100
+    assert store.get("m", "a") == "A"
+    store.prune()
+    assert store.get("m", "b") is None
+    assert store.get("m", "a") == "A" and store.get("m", "c") == "C"
+
+
+def test_generate_serves_repeats_from_the_store(tmp_path, monkeypatch):
+    class CountingModel:
+        model_name = "counting"
+        calls = 0
+
+        def generate_content(self, prompt):
+            CountingModel.calls += 1
+            return FakeResponse(f"answer to {prompt}")
+
+    monkeypatch.setattr(llm.settings, "LLM_STORE_PATH", str(tmp_path / "store.sqlite3"))
+    monkeypatch.setattr(llm, "_store", None)
+    model = CountingModel()
+
+    async def run():
+        first = await llm.generate(model, "same prompt", store_if=bool)
+        second = await llm.generate(model, "same prompt", store_if=bool)
+        unstored = await llm.generate(model, "same prompt")
+        return first, second, unstored
+
+    try:
+        first, second, unstored = asyncio.run(run())
+    finally:
+        llm.get_store().close()
+    assert first == second == unstored == "answer to same prompt"
+    # The third call didn't opt in to the store
+    assert CountingModel.calls == 2
+
+
+def test_store_is_used_off_the_event_loop(tmp_path, monkeypatch):
+    class Model:
+        model_name = "threads"
+
+        def generate_content(self, prompt):
+            return FakeResponse("answer")
+
+    store = LLMResponseStore(str(tmp_path / "store.sqlite3"), ttl=60, max_entries=10, max_bytes=10_000)
+    threads = []
+    get, put = store.get, store.put
+    monkeypatch.setattr(store, "get", lambda *args: threads.append(threading.current_thread()) or get(*args))
+    monkeypatch.setattr(store, "put", lambda *args: threads.append(threading.current_thread()) or put(*args))
+    monkeypatch.setattr(llm, "get_store", lambda: store)
+
+    async def run():
+        await llm.generate(Model(), "prompt", store_if=bool)
+        return threading.current_thread()
+
+    try:
+        loop_thread = asyncio.run(run())
+    finally:
+        store.close()
+    assert len(threads) == 2 and loop_thread not in threads
+
+
+def test_store_that_cannot_open_is_disabled_without_touching_settings(tmp_path, monkeypatch):
+    (tmp_path / "not-a-directory").write_text("")
+    path = str(tmp_path / "not-a-directory" / "store.sqlite3")
+    monkeypatch.setattr(llm.settings, "LLM_STORE_PATH", path)
+    monkeypatch.setattr(llm, "_store", None)
+    monkeypatch.setattr(llm, "_store_disabled", False)
+
+    assert llm.get_store() is None
+    assert llm._store_disabled and llm.settings.LLM_STORE_PATH == path
+    assert llm.get_store() is None
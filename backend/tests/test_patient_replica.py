@@ -0,0 +1,116 @@
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from app.models.patient import PatientReplica
+from app.services.dorra_emr import dorra_emr
+from app.services.patient_replica import normalize_phone, patient_replica, replica_row
+
+
+def test_normalize_phone():
+    assert normalize_phone("0803 123 4567") == "2348031234567"
+    assert normalize_phone("+234-803-123-4567") == "2348031234567"
+    assert normalize_phone("0803") == "234803"
+    assert normalize_phone("0803-123") == "234803123"
+    assert normalize_phone("8031234") == "8031234"
+    assert normalize_phone(None) == ""
+
+
+def test_replica_row_and_indexes():
+    now = datetime.now(timezone.utc)
+    row = replica_row({"id": "7", "first_name": "Ada", "last_name": "Obi", "phone_number": "08031234567",
+                       "updated_at": "2025-11-20T10:00:00Z"}, now)
+    assert row["id"] == 7
+    assert row["full_name"] == "Ada Obi"
+    assert row["phone_normalized"] == "2348031234567"
+    assert row["updated_at"] == datetime(2025, 11, 20, 10, tzinfo=timezone.utc)
+
+    ddl = [str(CreateIndex(index).compile(dialect=postgresql.dialect())) for index in PatientReplica.__table__.indexes]
+    assert any("USING gin (full_name gin_trgm_ops)" in statement for statement in ddl)
+
+
+def compile_search(search):
+    compiled = patient_replica.search_statement(search).compile(dialect=postgresql.dialect())
+    return str(compiled), list(compiled.params.values())
+
+
+def test_search_by_phone_prefix():
+    sql, params = compile_search("0803 12")
+    assert "phone_normalized LIKE" in sql
+    assert params[0] == "23480312"
+    assert sql.index("phone_normalized") < sql.index("ORDER BY")
+
+    sql, params = compile_search("+234 803")
+    assert params[0] == "234803"
+
+    # Digits without a country or trunk prefix match anywhere in the number
+    sql, params = compile_search("1234567")
+    assert params[0] == "1234567" and "LIKE '%%' ||" in sql
+
+
+def test_search_by_name_escapes_wildcards():
+    sql, params = compile_search("Ada")
+    assert "full_name ILIKE" in sql and "similarity(patientreplica.full_name" in sql
+    assert params[0] == "Ada"
+
+    sql, params = compile_search("50%_off")
+    assert params[0] == "50/%/_off" and "ESCAPE '/'" in sql
+
+
+def test_reads_fall_back_to_dorra_when_replica_fails(monkeypatch):
+    async def broken_roster(search=None):
+        raise ConnectionError("database down")
+        yield
+
+    async def broken_lookup(patient_id):
+        raise ConnectionError("database down")
+
+    async def dorra_patients(search=None):
+        yield {"id": 1}
+
+    async def dorra_patient(patient_id):
+        return {"id": patient_id, "source": "dorra"}
+
+    monkeypatch.setattr(patient_replica, "enabled", True)
+    monkeypatch.setattr(patient_replica, "ready", True)
+    monkeypatch.setattr(patient_replica, "iter_patients", broken_roster)
+    monkeypatch.setattr(patient_replica, "get_patient", broken_lookup)
+    monkeypatch.setattr(dorra_emr, "iter_patients", dorra_patients)
+    monkeypatch.setattr(dorra_emr, "get_patient", dorra_patient)
+
+    async def run():
+        roster = [p async for p in patient_replica.iter_roster()]
+        return roster, await patient_replica.lookup_patient(5)
+
+    roster, patient = asyncio.run(run())
+    assert roster == [{"id": 1}]
+    assert patient == {"id": 5, "source": "dorra"}
+
+
+def test_incremental_read_stops_at_the_watermark_only_when_ordered(monkeypatch):
+    watermark = datetime(2026, 3, 2, tzinfo=timezone.utc)
+    started = datetime.now(timezone.utc)
+    read = []
+
+    def roster(*days):
+        async def iter_patients(search=None, ordering=None):
+            assert ordering == "-updated_at"
+            for i, day in enumerate(days, start=1):
+                read.append(i)
+                yield {"id": i, "updated_at": f"2026-03-{day:02d}T00:00:00Z"}
+        return iter_patients
+
+    # Newest first: stops at the first patient older than the watermark
+    monkeypatch.setattr(dorra_emr, "iter_patients", roster(5, 3, 1, 1))
+    rows = asyncio.run(patient_replica._read_dorra(watermark, started))
+    assert [row["id"] for row in rows] == [1, 2]
+    assert read == [1, 2, 3]
+
+    # Ordering ignored: an older patient comes first, so every page is read
+    read.clear()
+    monkeypatch.setattr(dorra_emr, "iter_patients", roster(2, 5, 1, 4))
+    rows = asyncio.run(patient_replica._read_dorra(watermark, started))
+    assert read == [1, 2, 3, 4]
+    assert {row["id"] for row in rows} == {1, 2, 3, 4}
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.pipeline import Pipeline
+
+
+def sleeper(seconds, value):
+    async def stage(results):
+        await asyncio.sleep(seconds)
+        return value
+    return stage
+
+
+def test_independent_stages_overlap():
+    async def combine(results):
+        return results["a"] + results["b"]
+
+    pipeline = (
+        Pipeline()
+        .stage("a", sleeper(0.1, 1))
+        .stage("b", sleeper(0.1, 2))
+        .stage("sum", combine, after=("a", "b"))
+    )
+    started = time.monotonic()
+    results = asyncio.run(pipeline.run())
+    assert results["sum"] == 3
+    assert time.monotonic() - started < 0.18
+    stages = pipeline.timings["stages"]
+    assert set(stages) == {"a", "b", "sum"}
+    assert stages["sum"]["start_ms"] >= stages["a"]["duration_ms"]
+
+
+def test_nested_pipelines_record_prefixed_timings():
+    async def inner(results):
+        return (await Pipeline("inner").stage("x", sleeper(0, "done")).run())["x"]
+
+    pipeline = Pipeline().stage("outer", inner)
+    assert asyncio.run(pipeline.run()) == {"outer": "done"}
+    assert set(pipeline.timings["stages"]) == {"outer", "inner.x"}
+
+
+def test_failure_cancels_running_stages():
+    cancelled = []
+
+    async def slow(results):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def boom(results):
+        raise RuntimeError("boom")
+
+    pipeline = Pipeline().stage("slow", slow).stage("boom", boom)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await pipeline.run()
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert cancelled == [True]
+
+
+def test_stages_must_depend_on_earlier_stages():
+    with pytest.raises(ValueError):
+        Pipeline().stage("a", sleeper(0, 1), after=("b",))
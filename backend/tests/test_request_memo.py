@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.request_memo import RequestMemoMiddleware, current_memo
+from app.services.dorra_emr import DorraEMRService
+
+
+def make_service(monkeypatch, handler):
+    service = DorraEMRService()
+    monkeypatch.setattr(service, "_create_client", lambda: httpx.AsyncClient(
+        base_url="https://dorra.test", transport=httpx.MockTransport(handler)))
+    return service
+
+
+def test_reads_are_memoized_per_request_and_writes_forget(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, request.url.path))
+        if request.url.path == "/v1/ai/emr":
+            return httpx.Response(201, json={"id": 9, "resource": "encounter"})
+        if request.url.path == "/v1/encounters":
+            return httpx.Response(200, json={"results": [{"id": len(calls)}]})
+        return httpx.Response(200, json={"id": 1})
+
+    service = make_service(monkeypatch, handler)
+    app = FastAPI()
+    app.add_middleware(RequestMemoMiddleware, debug_header=True)
+
+    @app.get("/check")
+    async def check():
+        await asyncio.gather(service.get_patient(1), service.get_patient(1))
+        before = await service.get_patient_encounters(1)
+        assert await service.get_patient_encounters(1) == before
+        await service.create_ai_emr(1, "note")
+        after = await service.get_patient_encounters(1)
+        return {"changed": after != before, "upstream_calls": current_memo().upstream_calls}
+
+    client = TestClient(app)
+    response = client.get("/check")
+    assert response.json() == {"changed": True, "upstream_calls": 4}
+    assert response.headers["x-upstream-calls"] == "4"
+    assert calls.count(("GET", "/v1/patients/1")) == 1
+
+    # A new request starts with an empty memo
+    client.get("/check")
+    assert calls.count(("GET", "/v1/patients/1")) == 2
@@ -0,0 +1,168 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.resilience import AdaptiveLimiter, CircuitBreaker, CircuitOpenError, TokenBucket, hedged
+from app.services.dorra_emr import DorraEMRService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_then_probes_once():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 10
+    assert breaker.allow()  # the probe
+    assert not breaker.allow()  # only one at a time
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+    assert breaker.to_dict()["times_opened"] == 2
+
+
+def test_hedged_returns_the_faster_copy():
+    delays = [1.0, 0.0]
+
+    async def call():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await hedged(call, 0.01)
+        return result, loop.time() - started
+
+    result, elapsed = asyncio.run(run())
+    assert result == 0.0
+    assert elapsed < 0.5
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, "DORRA_RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(settings, "DORRA_HEDGE_DELAY", 0)
+    monkeypatch.setattr(settings, "DORRA_BREAKER_FAILURES", 3)
+    responses = []
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return responses.pop(0) if responses else httpx.Response(503)
+
+    service = DorraEMRService()
+    monkeypatch.setattr(service, "_create_client", lambda: httpx.AsyncClient(
+        base_url="https://dorra.test", transport=httpx.MockTransport(handler)))
+    return service, responses, calls
+
+
+def test_gets_are_retried(service):
+    service, responses, calls = service
+    responses.extend([httpx.Response(503), httpx.Response(200, json={"id": 1})])
+    assert asyncio.run(service.get_patient(1)) == {"id": 1}
+    assert len(calls) == 2
+    assert service.resilience_stats()["retries"] == 1
+
+
+def test_writes_are_not_retried(service):
+    service, _, calls = service
+    assert asyncio.run(service.create_patient({"first_name": "Ada"})) is None
+    assert len(calls) == 1
+
+
+def test_open_breaker_fails_fast(service):
+    service, _, calls = service
+    assert asyncio.run(service.get_patient(1)) is None  # three failed attempts open the breaker
+    assert len(calls) == 3
+    assert asyncio.run(service.get_patient(2)) is None
+    assert len(calls) == 3
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(service._request("GET", "/v1/patients/3", timeout=1))
+    stats = service.resilience_stats()["breakers"]["GET /v1/patients/{id}"]
+    assert stats["state"] == "open"
+    assert stats["rejected"] == 2
+
+
+def test_cancelled_probe_frees_the_half_open_breaker(service):
+    service, _, calls = service
+    assert asyncio.run(service.get_patient(1)) is None  # opens the breaker
+    breaker = service.breakers["GET /v1/patients/{id}"]
+    breaker.opened_at -= breaker.reset_timeout
+
+    async def hang(request):
+        await asyncio.sleep(10)
+
+    service._create_client = lambda: httpx.AsyncClient(base_url="https://dorra.test", transport=httpx.MockTransport(hang))
+
+    async def cancelled_probe():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(service._request("GET", "/v1/patients/1", timeout=5), 0.05)
+
+    asyncio.run(cancelled_probe())
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_token_bucket_spaces_calls_after_burst():
+    clock = FakeClock()
+    bucket = TokenBucket("read", rate=10, burst=2, clock=clock)
+    assert [bucket.reserve() for _ in range(4)] == [0, 0, pytest.approx(0.1), pytest.approx(0.2)]
+    clock.now += 1
+    assert bucket.reserve() == 0
+    bucket.pause(5)
+    assert bucket.reserve() == pytest.approx(5)
+
+
+def test_adaptive_limiter_grows_and_halves():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(initial=4, minimum=1, maximum=8, clock=clock)
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.to_dict()["limit"] == 4 and limiter.limit > 4.9
+    limiter.on_overload()
+    limiter.on_overload()  # same burst, counted once
+    assert limiter.to_dict()["limit"] == 2
+
+
+def test_limiter_bounds_concurrency():
+    limiter = AdaptiveLimiter(initial=2, minimum=1, maximum=2)
+    peak = []
+
+    async def call():
+        async with limiter:
+            peak.append(limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*[call() for _ in range(6)])
+
+    asyncio.run(run())
+    assert max(peak) == 2 and limiter.in_flight == 0
+
+
+def test_rate_limited_get_honours_retry_after(service):
+    service, responses, calls = service
+    responses.extend([httpx.Response(429, headers={"Retry-After": "0.05"}), httpx.Response(200, json={"id": 1})])
+    assert asyncio.run(service.get_patient(1)) == {"id": 1}
+    stats = service.resilience_stats()
+    assert stats["breakers"]["GET /v1/patients/{id}"]["consecutive_failures"] == 0
+    assert stats["concurrency"]["decreases"] == 1
+    assert stats["rate_limits"]["read"]["throttled"] == 1
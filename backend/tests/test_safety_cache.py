@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import cache
+from app.core.config import settings
+from app.core.logic import gestational_band
+from app.services.pharmavigilance import pharma_service
+
+
+@pytest.fixture
+def analysis_calls(monkeypatch):
+    calls = []
+
+    async def fake_analyze(normalized_name, gestational_week, symptoms, patient_id, additional_drugs):
+        calls.append((normalized_name, gestational_week))
+        return {
+            "risk_category": "Safe",
+            "message": f"{normalized_name} is fine.",
+            "alternatives": [],
+            "is_safe": True,
+            "data_sources": "PharmaVigilance API + Gemini 2.5 Flash AI"
+        }
+
+    monkeypatch.setattr(pharma_service, "dorra_api_key", "test-key")
+    monkeypatch.setattr(pharma_service, "_analyze", fake_analyze)
+    # These tests exercise the analysis path, not the knowledge base
+    monkeypatch.setattr(settings, "DRUG_KB_FAST_PATH", False)
+    cache.clear()
+    yield calls
+    cache.clear()
+
+
+def test_gestational_bands():
+    assert gestational_band(0) == "unknown"
+    assert gestational_band(10) == gestational_band(13) == "t1"
+    assert gestational_band(19) != gestational_band(20)
+    assert gestational_band(28) == "t3"
+    assert gestational_band(40) == "term"
+
+
+def test_repeat_check_is_served_from_cache(analysis_calls):
+    first = asyncio.run(pharma_service.check_medication("Panadol", 20, ["Headache"]))
+    second = asyncio.run(pharma_service.check_medication("paracetamol", 24, ["headache "]))
+
+    assert len(analysis_calls) == 1
+    assert first["cache_status"] == "miss"
+    assert second["cache_status"] == "hit"
+    assert second["name"] == "Paracetamol"
+    assert second["message"] == first["message"]
+
+
+def test_cache_key_separates_bands_and_languages(analysis_calls):
+    asyncio.run(pharma_service.check_medication("Paracetamol", 20))
+    asyncio.run(pharma_service.check_medication("Paracetamol", 30))
+    assert len(analysis_calls) == 2
+
+    key_en = pharma_service._safety_cache_key("Paracetamol", 20, None, "en")
+    key_yo = pharma_service._safety_cache_key("Paracetamol", 20, None, "yo")
+    assert key_en != key_yo
+
+
+def test_drug_order_does_not_matter():
+    key_a = pharma_service._safety_cache_key("Paracetamol", 20, None, "en", ["Brufen"])
+    key_b = pharma_service._safety_cache_key("Ibuprofen", 20, None, "en", ["Panadol"])
+    assert key_a == key_b
+
+
+def test_multi_drug_check_for_patient_bypasses_cache(analysis_calls, monkeypatch):
+    async def no_profile(patient_id):
+        return {"risk_factors": [], "risk_score": 0}
+
+    from app.services import pharmavigilance
+    monkeypatch.setattr(pharmavigilance.risk_scoring_service, "get_patient_risk_profile", no_profile)
+
+    for _ in range(2):
+        result = asyncio.run(pharma_service.check_medication("Paracetamol", 20, patient_id=5, additional_drugs=["Ibuprofen"]))
+        assert result["cache_status"] == "bypass"
+    assert len(analysis_calls) == 2
+
+
+class ScriptedModel:
+    def __init__(self, text):
+        self.text = text
+        self.prompts = []
+
+    def generate_content(self, prompt):
+        from app.standin.fakes import FakeResponse
+        self.prompts.append(prompt)
+        return FakeResponse(self.text)
+
+
+def test_fused_multilingual_check_uses_one_model_call(analysis_calls, monkeypatch):
+    import json
+    from app.services import pharmavigilance
+
+    model = ScriptedModel(json.dumps({
+        "language": "yo", "drug_name": "Paracetamol", "risk_category": "Safe", "is_safe": True,
+        "message": "Oogun yii dara fun aboyun.", "alternatives": []
+    }))
+
+    async def no_translation(*args):
+        raise AssertionError("fused checks don't translate separately")
+
+    monkeypatch.setattr(pharma_service, "gemini_model", model)
+    monkeypatch.setattr(pharmavigilance.language_service, "translate_to_english", no_translation)
+    monkeypatch.setattr(pharmavigilance.language_service, "detect_language", no_translation)
+
+    result = asyncio.run(pharma_service.check_medication("Panadol", 20, ["ori fifo"], language="auto"))
+    assert len(model.prompts) == 1 and not analysis_calls
+    assert result["language"] == "yo" and result["name"] == "Paracetamol"
+    assert result["message"] == "Oogun yii dara fun aboyun."
+    assert result["cache_status"] == "miss"
+
+
+def test_fused_check_falls_back_to_separate_calls(analysis_calls, monkeypatch):
+    from app.services import pharmavigilance
+
+    async def detect(text):
+        return "yo"
+
+    async def identity(text, lang):
+        return text
+
+    monkeypatch.setattr(pharma_service, "gemini_model", ScriptedModel("not json"))
+    monkeypatch.setattr(pharmavigilance.language_service, "detect_language", detect)
+    monkeypatch.setattr(pharmavigilance.language_service, "translate_to_english", identity)
+    monkeypatch.setattr(pharmavigilance.language_service, "translate_from_english", identity)
+
+    result = asyncio.run(pharma_service.check_medication("Paracetamol", 20, language="auto"))
+    assert analysis_calls == [("Paracetamol", 20)]
+    assert result["language"] == "yo" and result["message"] == "Paracetamol is fine."
+
+
+def test_risk_profile_overlaps_the_analysis(monkeypatch):
+    import time
+    from app.services import pharmavigilance
+
+    async def slow_analyze(normalized_name, gestational_week, symptoms, patient_id, additional_drugs):
+        await asyncio.sleep(0.2)
+        return {"risk_category": "Safe", "message": "ok", "alternatives": [], "is_safe": True, "data_sources": ""}
+
+    async def slow_profile(patient_id):
+        await asyncio.sleep(0.2)
+        return {"risk_factors": [], "risk_score": 0}
+
+    monkeypatch.setattr(pharma_service, "dorra_api_key", "test-key")
+    monkeypatch.setattr(pharma_service, "_analyze", slow_analyze)
+    monkeypatch.setattr(pharmavigilance.risk_scoring_service, "get_patient_risk_profile", slow_profile)
+    monkeypatch.setattr(settings, "DEBUG_STAGE_TIMINGS", True)
+
+    started = time.monotonic()
+    result = asyncio.run(pharma_service.check_medication("Paracetamol", 20, patient_id=5, additional_drugs=["Ibuprofen"]))
+    assert time.monotonic() - started < 0.35
+    assert {"analysis", "risk_profile", "personalize"} <= set(result["timings"]["stages"])
+
+
+def test_stream_adds_personalization_last(analysis_calls, monkeypatch):
+    from app.services import pharmavigilance
+
+    async def profile(patient_id):
+        return {"risk_factors": [], "risk_score": 0}
+
+    monkeypatch.setattr(pharmavigilance.risk_scoring_service, "get_patient_risk_profile", profile)
+
+    async def collect():
+        return [event async for event in pharma_service.check_medication_stream("Panadol", 20, patient_id=5, budget=5)]
+
+    events = asyncio.run(collect())
+    assert [name for name, _ in events] == ["preliminary", "refined", "personalized"]
+    assert events[0][1]["data_sources"] == "Rule-based (preliminary)"
+    assert events[1][1]["message"] == "Paracetamol is fine."
@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from app.services.dorra_emr import DorraEMRService
+from app.standin.behaviour import LatencyDistribution, UpstreamBehaviour
+from app.standin.dorra import DorraStore, create_app
+from app.standin.fakes import FakeGenerativeModel, FakeTwilioClient
+
+
+def make_service(monkeypatch, app):
+    service = DorraEMRService()
+    monkeypatch.setattr(service, "_create_client", lambda: httpx.AsyncClient(
+        base_url="http://standin", headers=service.headers, transport=httpx.ASGITransport(app=app)))
+    return service
+
+
+def test_dorra_client_runs_against_the_standin(monkeypatch):
+    store = DorraStore(patients=3, encounters_per_patient=0, seed=1)
+    app = create_app(store, UpstreamBehaviour("dorra"), page_size=2)
+    service = make_service(monkeypatch, app)
+
+    async def run():
+        created = await service.create_ai_emr(2, "Headache. Medications: Paracetamol and Ibuprofen.")
+        patient = await service.get_patient(2)
+        missing = await service.get_patient(99)
+        patients = [p async for p in service.iter_patients()]
+        interactions = await service.get_drug_interactions(2)
+        return created, patient, missing, patients, interactions
+
+    created, patient, missing, patients, interactions = asyncio.run(run())
+    assert created["resource"] == "Encounter" and created["resource_id"]
+    assert patient["id"] == 2 and missing is None
+    # Three patients over two pages
+    assert [p["id"] for p in patients] == [1, 2, 3]
+    assert interactions[0]["drug_a"] == "Paracetamol" and interactions[0]["drug_b"] == "Ibuprofen"
+
+
+def test_standin_rate_limits_with_retry_after():
+    clock = [0.0]
+    behaviour = UpstreamBehaviour("dorra", rate_limit=1, burst=1, clock=lambda: clock[0])
+    app = create_app(DorraStore(patients=1), behaviour)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://standin",
+                                     headers={"Authorization": "Token x"}) as client:
+            first = await client.get("/v1/patients/1")
+            second = await client.get("/v1/patients/1")
+            clock[0] += 1
+            third = await client.get("/v1/patients/1")
+            return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first.status_code == 200
+    assert second.status_code == 429 and second.headers["Retry-After"] == "1"
+    assert third.status_code == 200
+    assert behaviour.rate_limited == 1
+
+
+def test_latency_distributions():
+    assert LatencyDistribution("fixed:50").sample() == 0.05
+    uniform = LatencyDistribution("uniform:10:20")
+    assert all(0.01 <= uniform.sample() <= 0.02 for _ in range(100))
+    assert LatencyDistribution("lognormal:100:0.5").sample() > 0
+    with pytest.raises(ValueError):
+        LatencyDistribution("gaussian:10")
+
+
+def test_fake_gemini_and_twilio():
+    model = FakeGenerativeModel(behaviour=UpstreamBehaviour("gemini"))
+    assert model.generate_content('Detect the language of this text: "hello"').text == "en"
+    assert model.generate_content('Translate this English text to Yoruba: "Take with food"').text == "Take with food"
+    assert '"risk_category"' in asyncio.run(model.generate_content_async("Return JSON with: risk_category")).text
+
+    failing = FakeGenerativeModel(behaviour=UpstreamBehaviour("gemini", error_rate=1))
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        failing.generate_content("anything")
+
+    twilio = FakeTwilioClient(UpstreamBehaviour("twilio"))
+    message = twilio.messages.create(body="hi", from_="+1", to="+2348000000000")
+    assert message.sid.startswith("SM") and twilio.sent == [message]